@@ -15,7 +15,8 @@ def retrieve_context(query: str) -> str:
         context_tokens=1500,
         source="knowledge_base",
         project="rag-agent",
-        tags={"query_type": "semantic_search"}
+        tags={"query_type": "semantic_search"},
+        latency_ms=120,
     )
     
     # Simulate retrieval
@@ -58,16 +59,19 @@ def executor_agent(plan: str, context: str) -> str:
 # Main workflow
 user_query = "What are vector databases?"
 
-print("Step 1: Planning...")
-plan = planner_agent(user_query)
-print(f"Plan: {plan}\n")
-
-print("Step 2: Retrieving context...")
-context = retrieve_context(user_query)
-print(f"Context retrieved.\n")
-
-print("Step 3: Generating answer...")
-answer = executor_agent(plan, context)
-print(f"Answer: {answer}")
+# One trace for the whole request: each agent's span is a child of it
+with observe(project="rag-agent", agent="orchestrator", name="answer_query") as trace:
+    print("Step 1: Planning...")
+    plan = planner_agent(user_query)
+    print(f"Plan: {plan}\n")
+    
+    print("Step 2: Retrieving context...")
+    context = retrieve_context(user_query)
+    print(f"Context retrieved.\n")
+    
+    print("Step 3: Generating answer...")
+    answer = executor_agent(plan, context)
+    print(f"Answer: {answer}")
 
 print("\n✅ All steps tracked! Check the dashboard for cost breakdown by agent.")
+print(f"Latency breakdown: GET /traces/{trace.span.trace_id}")
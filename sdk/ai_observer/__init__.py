@@ -5,6 +5,45 @@ Open-source observability layer for agentic systems
 
 from .core import observe, log_event, track_retrieval, traced
 from .config import configure
+from .exporter import flush, shutdown, aflush, ashutdown, get_stats
+from .tracing import current_span, propagate
 
 __version__ = "0.1.0"
-__all__ = ["observe", "log_event", "track_retrieval", "traced", "configure"]
+__all__ = [
+    "observe",
+    "log_event",
+    "track_retrieval",
+    "traced",
+    "configure",
+    "flush",
+    "shutdown",
+    "aflush",
+    "ashutdown",
+    "get_stats",
+    "current_span",
+    "propagate",
+    "instrument",
+    "uninstrument",
+    "scope",
+]
+
+# Loaded on first access so that importing the package stays cheap
+_LAZY = {
+    "instrument": "instrumentation",
+    "uninstrument": "instrumentation",
+    "scope": "instrumentation",
+}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -1,12 +1,89 @@
 """Provider adapters for extracting usage and cost from different LLM providers"""
 
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from abc import ABC, abstractmethod
 
 
+class PricingIndex:
+    """
+    Longest-prefix lookup of model prices
+    
+    Prefixes are bucketed by length, so a lookup is at most one dict probe
+    per distinct prefix length, longest first, whatever the size of the
+    price table: ``gpt-4o-mini-2024-07-18`` matches ``gpt-4o-mini``, not
+    ``gpt-4o`` or ``gpt-4``. Results are memoized per model name.
+    """
+    
+    MAX_CACHED_MODELS = 4096
+    
+    def __init__(self, prices: Dict[str, Dict[str, float]]):
+        self._prices = dict(prices)
+        self._lengths = sorted({len(prefix) for prefix in self._prices}, reverse=True)
+        self._cache: Dict[str, Optional[Dict[str, float]]] = {}
+    
+    def lookup(self, model: str) -> Optional[Dict[str, float]]:
+        """Prices of the longest prefix of ``model`` in the table, or None"""
+        try:
+            return self._cache[model]
+        except KeyError:
+            pass
+        
+        pricing = None
+        for length in self._lengths:
+            if length <= len(model):
+                pricing = self._prices.get(model[:length])
+                if pricing is not None:
+                    break
+        
+        if len(self._cache) >= self.MAX_CACHED_MODELS:
+            self._cache.clear()
+        self._cache[model] = pricing
+        return pricing
+
+
 class ProviderAdapter(ABC):
     """Base class for provider adapters"""
     
+    # Prices per 1M tokens, keyed by model name prefix
+    PRICING: Dict[str, Dict[str, float]] = {}
+    
+    # Fully qualified names of response classes (subclasses included) this
+    # adapter always handles; the registry dispatches them by type alone
+    RESPONSE_TYPES: Tuple[str, ...] = ()
+    
+    _pricing_index: Optional[PricingIndex] = None
+    
+    def price(self, usage: Dict[str, Any], model: str) -> Dict[str, Any]:
+        """
+        Cost of ``usage`` at the ``PRICING`` of the longest matching model prefix
+        
+        Unknown models cost 0. The index is built on first use; call
+        ``reload_pricing()`` after changing ``PRICING``.
+        """
+        index = self._pricing_index
+        if index is None:
+            index = self.reload_pricing()
+        pricing = index.lookup(model) or {"input": 0.0, "output": 0.0}
+        
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        
+        # Cost per million tokens
+        input_cost = (prompt_tokens / 1_000_000) * pricing["input"]
+        output_cost = (completion_tokens / 1_000_000) * pricing["output"]
+        
+        return {
+            "input_cost": round(input_cost, 6),
+            "output_cost": round(output_cost, 6),
+            "total_cost": round(input_cost + output_cost, 6),
+            "currency": "USD",
+        }
+    
+    def reload_pricing(self) -> PricingIndex:
+        """Rebuild the pricing index from ``PRICING``"""
+        self._pricing_index = PricingIndex(self.PRICING)
+        return self._pricing_index
+    
     @abstractmethod
     def extract_usage(self, response: Any) -> Dict[str, Any]:
         """Extract usage information from provider response"""
@@ -37,6 +114,11 @@ class OpenAIAdapter(ProviderAdapter):
         "o1-mini": {"input": 3.00, "output": 12.00},
     }
     
+    RESPONSE_TYPES = (
+        "openai.types.chat.chat_completion.ChatCompletion",
+        "openai.types.completion.Completion",
+    )
+    
     def can_handle(self, response: Any) -> bool:
         """Check if response is from OpenAI"""
         return hasattr(response, 'usage') and hasattr(response, 'model')
@@ -53,29 +135,7 @@ class OpenAIAdapter(ProviderAdapter):
     
     def extract_cost(self, usage: Dict[str, Any], model: str) -> Dict[str, float]:
         """Calculate cost from OpenAI usage"""
-        model_key = model
-        
-        # Handle model versions
-        for key in self.PRICING.keys():
-            if model.startswith(key):
-                model_key = key
-                break
-        
-        pricing = self.PRICING.get(model_key, {"input": 0.0, "output": 0.0})
-        
-        prompt_tokens = usage.get("prompt_tokens", 0)
-        completion_tokens = usage.get("completion_tokens", 0)
-        
-        # Cost per million tokens
-        input_cost = (prompt_tokens / 1_000_000) * pricing["input"]
-        output_cost = (completion_tokens / 1_000_000) * pricing["output"]
-        
-        return {
-            "input_cost": round(input_cost, 6),
-            "output_cost": round(output_cost, 6),
-            "total_cost": round(input_cost + output_cost, 6),
-            "currency": "USD",
-        }
+        return self.price(usage, model)
 
 
 class AnthropicAdapter(ProviderAdapter):
@@ -91,9 +151,16 @@ class AnthropicAdapter(ProviderAdapter):
         "claude-2": {"input": 8.00, "output": 24.00},
     }
     
+    RESPONSE_TYPES = ("anthropic.types.message.Message",)
+    
     def can_handle(self, response: Any) -> bool:
         """Check if response is from Anthropic"""
-        return hasattr(response, 'usage') and hasattr(response, 'model') and 'claude' in str(response.model).lower()
+        return (
+            hasattr(response, 'usage')
+            and hasattr(response, 'model')
+            and hasattr(response.usage, 'input_tokens')
+            and 'claude' in str(response.model).lower()
+        )
     
     def extract_usage(self, response: Any) -> Dict[str, Any]:
         """Extract usage from Anthropic response"""
@@ -107,48 +174,60 @@ class AnthropicAdapter(ProviderAdapter):
     
     def extract_cost(self, usage: Dict[str, Any], model: str) -> Dict[str, float]:
         """Calculate cost from Anthropic usage"""
-        model_key = model
-        
-        for key in self.PRICING.keys():
-            if model.startswith(key):
-                model_key = key
-                break
-        
-        pricing = self.PRICING.get(model_key, {"input": 0.0, "output": 0.0})
-        
-        prompt_tokens = usage.get("prompt_tokens", 0)
-        completion_tokens = usage.get("completion_tokens", 0)
-        
-        input_cost = (prompt_tokens / 1_000_000) * pricing["input"]
-        output_cost = (completion_tokens / 1_000_000) * pricing["output"]
-        
-        return {
-            "input_cost": round(input_cost, 6),
-            "output_cost": round(output_cost, 6),
-            "total_cost": round(input_cost + output_cost, 6),
-            "currency": "USD",
-        }
+        return self.price(usage, model)
 
 
 class AdapterRegistry:
-    """Registry for managing provider adapters"""
+    """
+    Registry for managing provider adapters
+    
+    Responses whose class (or a base class) is listed in an adapter's
+    ``RESPONSE_TYPES`` are dispatched with one dict lookup on their type,
+    cached after the first call. Anything else is offered to each
+    adapter's ``can_handle`` in priority order: custom adapters first, then
+    Anthropic (whose check is stricter) before the generic OpenAI shape.
+    """
+    
+    MAX_CACHED_TYPES = 1024
     
     def __init__(self):
-        self.adapters = [
-            OpenAIAdapter(),
+        self.adapters: List[ProviderAdapter] = [
             AnthropicAdapter(),
+            OpenAIAdapter(),
         ]
+        self._by_type: Dict[type, Optional[ProviderAdapter]] = {}
     
     def get_adapter(self, response: Any) -> Optional[ProviderAdapter]:
         """Get the appropriate adapter for a response"""
+        response_type = type(response)
+        try:
+            adapter = self._by_type[response_type]
+        except KeyError:
+            # Mock and other dynamically created classes must not grow it forever
+            if len(self._by_type) >= self.MAX_CACHED_TYPES:
+                self._by_type = {}
+            adapter = self._by_type[response_type] = self._adapter_for_type(response_type)
+        if adapter is not None:
+            return adapter
+        
         for adapter in self.adapters:
             if adapter.can_handle(response):
                 return adapter
         return None
     
+    def _adapter_for_type(self, response_type: type) -> Optional[ProviderAdapter]:
+        """The adapter claiming ``response_type`` by name, if any"""
+        for cls in response_type.__mro__:
+            name = f"{cls.__module__}.{cls.__qualname__}"
+            for adapter in self.adapters:
+                if name in adapter.RESPONSE_TYPES:
+                    return adapter
+        return None
+    
     def register_adapter(self, adapter: ProviderAdapter):
         """Register a custom adapter"""
         self.adapters.insert(0, adapter)  # Custom adapters take priority
+        self._by_type = {}
 
 
 # Global adapter registry
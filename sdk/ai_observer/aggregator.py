@@ -0,0 +1,161 @@
+"""Client-side pre-aggregation of high-volume LLM calls"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# Prompts above this size are counted separately, matching the collector's
+# daily rollups (services.rollups.LARGE_PROMPT_TOKENS)
+LARGE_PROMPT_TOKENS = 4000
+
+RollupKey = Tuple[str, Optional[str], Optional[str], Optional[str], str, int]
+
+
+class _Rollup:
+    """Running counters for one (endpoint, project, agent, step, model, minute)"""
+
+    __slots__ = (
+        "requests",
+        "prompt_tokens",
+        "completion_tokens",
+        "total_tokens",
+        "input_cost",
+        "output_cost",
+        "total_cost",
+        "latency_sum_ms",
+        "latency_min_ms",
+        "latency_max_ms",
+        "large_prompt_requests",
+        "large_prompt_cost",
+    )
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_tokens = 0
+        self.input_cost = 0.0
+        self.output_cost = 0.0
+        self.total_cost = 0.0
+        self.latency_sum_ms = 0
+        self.latency_min_ms = 0
+        self.latency_max_ms = 0
+        self.large_prompt_requests = 0
+        self.large_prompt_cost = 0.0
+
+
+class Aggregator:
+    """
+    Accumulates LLM calls into per-minute rollups instead of single events
+
+    Calls are summed per (project, agent, step, model, minute). The
+    exporter drains a minute once it is over and ships one ``rollup``
+    payload per key, which the collector merges into its aggregates. Tags
+    and user ids are not kept. Each payload carries a random ``rollup_id``
+    so the collector applies it only once, however often it is sent.
+    """
+
+    def __init__(self):
+        self._rollups: Dict[RollupKey, _Rollup] = {}
+        self._lock = threading.Lock()
+        self._oldest_minute: Optional[int] = None
+
+    def add(
+        self,
+        endpoint_url: str,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        total_tokens: int,
+        latency_ms: int,
+        input_cost: float,
+        output_cost: float,
+        total_cost: float,
+        project: Optional[str],
+        agent: Optional[str],
+        step: Optional[str],
+    ):
+        """Add one call to the rollup for the current minute"""
+        minute = int(time.time() // 60)
+        key = (endpoint_url, project, agent, step, model, minute)
+
+        with self._lock:
+            rollup = self._rollups.get(key)
+            if rollup is None:
+                rollup = self._rollups[key] = _Rollup()
+                rollup.latency_min_ms = latency_ms
+                if self._oldest_minute is None:
+                    self._oldest_minute = minute
+
+            rollup.requests += 1
+            rollup.prompt_tokens += prompt_tokens
+            rollup.completion_tokens += completion_tokens
+            rollup.total_tokens += total_tokens
+            rollup.input_cost += input_cost
+            rollup.output_cost += output_cost
+            rollup.total_cost += total_cost
+            rollup.latency_sum_ms += latency_ms
+            rollup.latency_min_ms = min(rollup.latency_min_ms, latency_ms)
+            rollup.latency_max_ms = max(rollup.latency_max_ms, latency_ms)
+            if prompt_tokens > LARGE_PROMPT_TOKENS:
+                rollup.large_prompt_requests += 1
+                rollup.large_prompt_cost += total_cost
+
+    def after_fork_in_child(self):
+        """Drop the rollups copied from the parent, which ships them itself"""
+        self._rollups = {}
+        self._lock = threading.Lock()
+        self._oldest_minute = None
+
+    def drain(self, include_current: bool = False) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Remove finished rollups and return them as (endpoint_url, payload)
+
+        Only minutes that are over are drained unless ``include_current``
+        is set (on flush and shutdown). A minute drained early and topped
+        up later is simply shipped twice; the collector adds them up.
+        """
+        current = int(time.time() // 60)
+        oldest = self._oldest_minute
+        if oldest is None or (oldest >= current and not include_current):
+            return []
+
+        with self._lock:
+            drained = [
+                key for key in self._rollups
+                if include_current or key[-1] < current
+            ]
+            rollups = [(key, self._rollups.pop(key)) for key in drained]
+            self._oldest_minute = min((key[-1] for key in self._rollups), default=None)
+
+        return [_payload(key, rollup) for key, rollup in rollups]
+
+
+def _payload(key: RollupKey, rollup: _Rollup) -> Tuple[str, Dict[str, Any]]:
+    """Wire format of a rollup, sent through the batch endpoint"""
+    endpoint_url, project, agent, step, model, minute = key
+    payload = {
+        "event_type": "rollup",
+        "rollup_id": os.urandom(16).hex(),
+        "timestamp": datetime.utcfromtimestamp(minute * 60).isoformat(),
+        "model": model,
+        "project": project,
+        "agent": agent,
+        "step": step,
+    }
+    payload.update({name: getattr(rollup, name) for name in _Rollup.__slots__})
+    return endpoint_url, payload
+
+
+# Global aggregator instance
+_aggregator = Aggregator()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_aggregator.after_fork_in_child)
+
+
+def get_aggregator() -> Aggregator:
+    """Get the global aggregator instance"""
+    return _aggregator
@@ -1,7 +1,27 @@
 """Configuration management for AI Observer SDK"""
 
 import os
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional
+
+
+def _parse_rates(value: str) -> Dict[str, float]:
+    """Parse "project=rate,project=rate" into a dict"""
+    rates = {}
+    for item in value.split(","):
+        if "=" in item:
+            project, rate = item.rsplit("=", 1)
+            rates[project.strip()] = float(rate)
+    return rates
+
+
+def _optional_float(value: Optional[str]) -> Optional[float]:
+    return float(value) if value else None
+
+
+# Default of the settings that None switches off, telling "leave as is"
+# apart from an explicit None
+_UNSET: Any = object()
+
 
 class Config:
     """Global configuration for AI Observer SDK"""
@@ -12,6 +32,33 @@ class Config:
         self.enabled = os.getenv("AI_OBSERVER_ENABLED", "true").lower() == "true"
         self.timeout = int(os.getenv("AI_OBSERVER_TIMEOUT", "5"))
         self.batch_size = int(os.getenv("AI_OBSERVER_BATCH_SIZE", "10"))
+        self.flush_interval = float(os.getenv("AI_OBSERVER_FLUSH_INTERVAL", "1.0"))
+        self.max_queue_size = int(os.getenv("AI_OBSERVER_MAX_QUEUE_SIZE", "10000"))
+        self.queue_policy = os.getenv("AI_OBSERVER_QUEUE_POLICY", "drop_newest").lower()
+        self.block_timeout = float(os.getenv("AI_OBSERVER_BLOCK_TIMEOUT", "1.0"))
+        self.connect_timeout = float(os.getenv("AI_OBSERVER_CONNECT_TIMEOUT", "2"))
+        self.pool_size = int(os.getenv("AI_OBSERVER_POOL_SIZE", "10"))
+        self.max_retries = int(os.getenv("AI_OBSERVER_MAX_RETRIES", "3"))
+        self.retry_backoff = float(os.getenv("AI_OBSERVER_RETRY_BACKOFF", "0.5"))
+        self.spool_dir = os.getenv("AI_OBSERVER_SPOOL_DIR") or None
+        self.spool_max_bytes = int(os.getenv("AI_OBSERVER_SPOOL_MAX_BYTES", str(100 * 1024 * 1024)))
+        self.breaker_threshold = int(os.getenv("AI_OBSERVER_BREAKER_THRESHOLD", "5"))
+        self.breaker_backoff = float(os.getenv("AI_OBSERVER_BREAKER_BACKOFF", "1.0"))
+        self.breaker_max_backoff = float(os.getenv("AI_OBSERVER_BREAKER_MAX_BACKOFF", "60.0"))
+        self.aggregate = os.getenv("AI_OBSERVER_AGGREGATE", "false").lower() == "true"
+        self.sample_rate = float(os.getenv("AI_OBSERVER_SAMPLE_RATE", "1.0"))
+        self.project_sample_rates = _parse_rates(os.getenv("AI_OBSERVER_PROJECT_SAMPLE_RATES", ""))
+        self.sample_keep_cost = _optional_float(os.getenv("AI_OBSERVER_SAMPLE_KEEP_COST"))
+        self.sample_keep_latency_ms = _optional_float(os.getenv("AI_OBSERVER_SAMPLE_KEEP_LATENCY_MS"))
+        self.wire_format = os.getenv("AI_OBSERVER_WIRE_FORMAT", "json").lower()
+        self.compression = os.getenv("AI_OBSERVER_COMPRESSION", "none").lower()
+        self.self_metrics_interval = float(os.getenv("AI_OBSERVER_SELF_METRICS_INTERVAL", "0"))
+        self.tracing = os.getenv("AI_OBSERVER_TRACING", "true").lower() == "true"
+        self._enabled_listeners: List[Callable[[bool], None]] = []
+    
+    def on_enabled_change(self, callback: Callable[[bool], None]):
+        """Call ``callback(enabled)`` whenever ``enabled`` is switched"""
+        self._enabled_listeners.append(callback)
         
     def update(
         self,
@@ -19,8 +66,31 @@ class Config:
         api_key: Optional[str] = None,
         enabled: Optional[bool] = None,
         timeout: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        queue_policy: Optional[str] = None,
+        block_timeout: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        pool_size: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        retry_backoff: Optional[float] = None,
+        spool_dir: Optional[str] = _UNSET,
+        spool_max_bytes: Optional[int] = None,
+        breaker_threshold: Optional[int] = None,
+        breaker_backoff: Optional[float] = None,
+        breaker_max_backoff: Optional[float] = None,
+        aggregate: Optional[bool] = None,
+        sample_rate: Optional[float] = None,
+        project_sample_rates: Optional[Dict[str, float]] = None,
+        sample_keep_cost: Optional[float] = _UNSET,
+        sample_keep_latency_ms: Optional[float] = _UNSET,
+        wire_format: Optional[str] = None,
+        compression: Optional[str] = None,
+        self_metrics_interval: Optional[float] = None,
+        tracing: Optional[bool] = None,
     ):
         """Update configuration values"""
+        enabled_changed = enabled is not None and enabled != self.enabled
         if endpoint is not None:
             self.endpoint = endpoint
         if api_key is not None:
@@ -29,6 +99,54 @@ class Config:
             self.enabled = enabled
         if timeout is not None:
             self.timeout = timeout
+        if batch_size is not None:
+            self.batch_size = batch_size
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        if queue_policy is not None:
+            self.queue_policy = queue_policy.lower()
+        if block_timeout is not None:
+            self.block_timeout = block_timeout
+        if connect_timeout is not None:
+            self.connect_timeout = connect_timeout
+        if pool_size is not None:
+            self.pool_size = pool_size
+        if max_retries is not None:
+            self.max_retries = max_retries
+        if retry_backoff is not None:
+            self.retry_backoff = retry_backoff
+        if spool_dir is not _UNSET:
+            self.spool_dir = spool_dir or None
+        if spool_max_bytes is not None:
+            self.spool_max_bytes = spool_max_bytes
+        if breaker_threshold is not None:
+            self.breaker_threshold = breaker_threshold
+        if breaker_backoff is not None:
+            self.breaker_backoff = breaker_backoff
+        if breaker_max_backoff is not None:
+            self.breaker_max_backoff = breaker_max_backoff
+        if aggregate is not None:
+            self.aggregate = aggregate
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        if project_sample_rates is not None:
+            self.project_sample_rates = project_sample_rates
+        if sample_keep_cost is not _UNSET:
+            self.sample_keep_cost = sample_keep_cost
+        if sample_keep_latency_ms is not _UNSET:
+            self.sample_keep_latency_ms = sample_keep_latency_ms
+        if wire_format is not None:
+            self.wire_format = wire_format.lower()
+        if compression is not None:
+            self.compression = compression.lower()
+        if self_metrics_interval is not None:
+            self.self_metrics_interval = self_metrics_interval
+        if tracing is not None:
+            self.tracing = tracing
+        
+        if enabled_changed:
+            for callback in self._enabled_listeners:
+                callback(self.enabled)
 
 
 # Global configuration instance
@@ -40,6 +158,28 @@ def configure(
     api_key: Optional[str] = None,
     enabled: Optional[bool] = None,
     timeout: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    flush_interval: Optional[float] = None,
+    queue_policy: Optional[str] = None,
+    block_timeout: Optional[float] = None,
+    connect_timeout: Optional[float] = None,
+    pool_size: Optional[int] = None,
+    max_retries: Optional[int] = None,
+    retry_backoff: Optional[float] = None,
+    spool_dir: Optional[str] = _UNSET,
+    spool_max_bytes: Optional[int] = None,
+    breaker_threshold: Optional[int] = None,
+    breaker_backoff: Optional[float] = None,
+    breaker_max_backoff: Optional[float] = None,
+    aggregate: Optional[bool] = None,
+    sample_rate: Optional[float] = None,
+    project_sample_rates: Optional[Dict[str, float]] = None,
+    sample_keep_cost: Optional[float] = _UNSET,
+    sample_keep_latency_ms: Optional[float] = _UNSET,
+    wire_format: Optional[str] = None,
+    compression: Optional[str] = None,
+    self_metrics_interval: Optional[float] = None,
+    tracing: Optional[bool] = None,
 ):
     """
     Configure AI Observer SDK globally
@@ -48,7 +188,33 @@ def configure(
         endpoint: Collector API endpoint URL
         api_key: Optional API key for authentication
         enabled: Enable/disable tracking
-        timeout: HTTP request timeout in seconds
+        timeout: HTTP read timeout in seconds
+        batch_size: Number of events sent together by the background exporter
+        flush_interval: Maximum seconds an event waits in the buffer before sending
+        queue_policy: What to do when the buffer is full: "drop_newest",
+            "drop_oldest", "block" (up to block_timeout) or "spill" to spool_dir
+        block_timeout: Longest a caller waits for buffer space with the "block" policy
+        connect_timeout: HTTP connect timeout in seconds
+        pool_size: Number of keep-alive connections kept per collector host
+        max_retries: Retries for failures to connect to the collector
+        retry_backoff: Backoff factor in seconds between retries
+        spool_dir: Directory for spooling events while the collector is unreachable
+            (None turns the spool off)
+        spool_max_bytes: Disk cap for the spool; the oldest events are evicted beyond it
+        breaker_threshold: Consecutive failures that open the circuit to a collector
+        breaker_backoff: Seconds the circuit first stays open; doubles on each failed probe
+        breaker_max_backoff: Upper bound in seconds for the open period
+        aggregate: Ship per-minute rollups instead of one event per LLM call
+        sample_rate: Fraction of LLM call events to keep (1.0 keeps all)
+        project_sample_rates: Per-project overrides of sample_rate
+        sample_keep_cost: Always keep calls costing at least this much (None turns it off)
+        sample_keep_latency_ms: Always keep calls at least this slow (None turns it off)
+        wire_format: Body encoding for batches, "json" or "msgpack"
+        compression: Body compression for batches, "none", "gzip" or "zstd"
+        self_metrics_interval: Seconds between the SDK's own delivery stats sent
+            to the collector as internal events (0 disables them)
+        tracing: Record observe()/@traced blocks as spans and link the events
+            inside them into traces
         
     Example:
         configure(
@@ -57,7 +223,34 @@ def configure(
             enabled=True
         )
     """
-    _config.update(endpoint, api_key, enabled, timeout)
+    _config.update(
+        endpoint=endpoint,
+        api_key=api_key,
+        enabled=enabled,
+        timeout=timeout,
+        batch_size=batch_size,
+        flush_interval=flush_interval,
+        queue_policy=queue_policy,
+        block_timeout=block_timeout,
+        connect_timeout=connect_timeout,
+        pool_size=pool_size,
+        max_retries=max_retries,
+        retry_backoff=retry_backoff,
+        spool_dir=spool_dir,
+        spool_max_bytes=spool_max_bytes,
+        breaker_threshold=breaker_threshold,
+        breaker_backoff=breaker_backoff,
+        breaker_max_backoff=breaker_max_backoff,
+        aggregate=aggregate,
+        sample_rate=sample_rate,
+        project_sample_rates=project_sample_rates,
+        sample_keep_cost=sample_keep_cost,
+        sample_keep_latency_ms=sample_keep_latency_ms,
+        wire_format=wire_format,
+        compression=compression,
+        self_metrics_interval=self_metrics_interval,
+        tracing=tracing,
+    )
 
 
 def get_config() -> Config:
@@ -2,18 +2,53 @@
 
 import time
 import uuid
-import requests
 import functools
-from typing import Any, Dict, Optional, Callable
-from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Optional, Callable
 from datetime import datetime
 
 from .config import get_config
-from .adapters import get_adapter_registry
+from .exporter import get_exporter
+from .sampling import sample_weight
+from .tracing import (
+    NO_SPAN,
+    SpanContext,
+    SpanIds,
+    child_of,
+    current_span,
+    enter_span,
+    exit_span,
+    new_span_id,
+    new_trace_id,
+)
+
+if TYPE_CHECKING:
+    from .adapters import AdapterRegistry
+    from .streaming import StreamUsage
+
+_adapter_registry: Optional["AdapterRegistry"] = None
+
+
+def get_adapter_registry() -> "AdapterRegistry":
+    """Get the global adapter registry, importing the adapters on first use"""
+    global _adapter_registry
+    if _adapter_registry is None:
+        from .adapters import get_adapter_registry as load_registry
+        _adapter_registry = load_registry()
+    return _adapter_registry
 
 
 class ObservationContext:
-    """Context manager for observing LLM calls"""
+    """
+    Context manager for observing LLM calls
+    
+    While tracing is on, the block is a span: a child of the span open
+    when it is entered, or the root of a new trace. The first LLM call it
+    tracks stands for the block itself; nested blocks, retrievals and
+    further events become its children. The block's own span record is
+    only sent when it has children, or when it tracked nothing but is part
+    of a larger trace, so a plain ``observe()`` + ``track_response()``
+    still sends a single event.
+    """
     
     def __init__(
         self,
@@ -23,6 +58,8 @@ class ObservationContext:
         user_id: Optional[str] = None,
         tags: Optional[Dict[str, Any]] = None,
         endpoint: Optional[str] = None,
+        aggregate: Optional[bool] = None,
+        name: Optional[str] = None,
     ):
         self.project = project
         self.agent = agent
@@ -30,21 +67,71 @@ class ObservationContext:
         self.user_id = user_id
         self.tags = tags or {}
         self.endpoint = endpoint
+        self.aggregate = aggregate
+        self.name = name or step or agent or project
         self.start_time = None
         self.event_id = str(uuid.uuid4())
+        self.span: Optional[SpanContext] = None
+        self.parent_span_id: Optional[str] = None
+        self._span_token = None
+        self._span_tracked = False
         
     def __enter__(self):
-        """Start timing"""
+        """Start timing and open the block's span"""
         self.start_time = time.time()
+        
+        config = get_config()
+        aggregate = config.aggregate if self.aggregate is None else self.aggregate
+        if config.enabled and config.tracing and not aggregate:
+            trace_id, span_id, self.parent_span_id = child_of(current_span())
+            self.span = SpanContext(trace_id or new_trace_id(), span_id or new_span_id())
+            self._span_token = enter_span(self.span)
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        """End timing and send event if possible"""
-        if exc_type is None:
-            # No automatic event sending here - let user handle response
-            pass
+        """Close the block's span and send it"""
+        if self._span_token is not None:
+            exit_span(self._span_token)
+            self._span_token = None
+            needed = self.span.children or (not self._span_tracked and self.parent_span_id is not None)
+            if needed and get_config().enabled:
+                self._send_span(error=exc_type is not None)
         return False
     
+    async def __aenter__(self):
+        """Start timing inside a coroutine"""
+        return self.__enter__()
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """End timing inside a coroutine"""
+        return self.__exit__(exc_type, exc_val, exc_tb)
+    
+    def _event_span(self) -> SpanIds:
+        """Span ids for an LLM call tracked by this block"""
+        if self.span is not None and not self._span_tracked:
+            self._span_tracked = True
+            return self.span.trace_id, self.span.span_id, self.parent_span_id
+        return child_of(self.span or current_span())
+    
+    def _send_span(self, error: bool):
+        """Queue the span record of the finished block"""
+        payload = {
+            "event_type": "span",
+            "timestamp": datetime.utcfromtimestamp(self.start_time).isoformat(),
+            "trace_id": self.span.trace_id,
+            "span_id": self.span.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "duration_ms": round((time.time() - self.start_time) * 1000, 3),
+            "status": "error" if error else "ok",
+            "project": self.project,
+            "agent": self.agent,
+            "step": self.step,
+            "user_id": self.user_id,
+            "tags": self.tags,
+        }
+        get_exporter().enqueue(self.endpoint or get_config().endpoint, payload)
+    
     def track_response(self, response: Any):
         """Track an LLM response"""
         if not get_config().enabled:
@@ -58,22 +145,78 @@ class ObservationContext:
         
         if not adapter:
             # Unknown provider - try to extract basic info
-            log_event(
+            _send_event(
+                event_id=self.event_id,
                 model="unknown",
                 prompt_tokens=0,
                 completion_tokens=0,
+                total_tokens=0,
                 latency_ms=latency_ms,
+                input_cost=0.0,
+                output_cost=0.0,
+                total_cost=0.0,
+                currency="USD",
                 project=self.project,
                 agent=self.agent,
                 step=self.step,
                 user_id=self.user_id,
                 tags=self.tags,
                 endpoint=self.endpoint,
+                aggregate=self.aggregate,
+                span_ids=self._event_span(),
             )
             return
         
         # Extract usage and cost
         usage = adapter.extract_usage(response)
+        self._record(adapter, usage, latency_ms)
+    
+    def track_stream(self, stream: Any) -> Any:
+        """
+        Track a streaming LLM response
+        
+        Returns a wrapper to iterate instead of ``stream``; sync and async
+        streams are both supported. Chunks pass through untouched, and the
+        event is sent once the stream is exhausted or closed, with time to
+        first token, generation time and output tokens per second besides
+        the total latency.
+        
+        For exact token counts from OpenAI, request them with
+        ``stream_options={"include_usage": True}``; otherwise completion
+        tokens are counted per content chunk and prompt tokens are unknown.
+        
+        Example:
+            with observe(project="chat") as obs:
+                stream = client.chat.completions.create(..., stream=True)
+                for chunk in obs.track_stream(stream):
+                    print(chunk.choices[0].delta.content or "", end="")
+        """
+        if not get_config().enabled:
+            return stream
+        from .streaming import wrap_stream
+        return wrap_stream(stream, self.start_time or time.time(), self._track_stream_usage)
+    
+    def _track_stream_usage(self, stream_usage: "StreamUsage"):
+        """Send the event for a finished stream"""
+        self._record(
+            stream_usage.adapter(),
+            stream_usage.usage(),
+            stream_usage.latency_ms,
+            ttft_ms=stream_usage.ttft_ms,
+            generation_ms=stream_usage.generation_ms,
+            tokens_per_second=stream_usage.tokens_per_second,
+        )
+    
+    def _record(
+        self,
+        adapter: Any,
+        usage: Dict[str, Any],
+        latency_ms: int,
+        ttft_ms: Optional[int] = None,
+        generation_ms: Optional[int] = None,
+        tokens_per_second: Optional[float] = None,
+    ):
+        """Price the usage and send the event"""
         cost_info = adapter.extract_cost(usage, usage["model"])
         
         # Send event
@@ -94,10 +237,14 @@ class ObservationContext:
             user_id=self.user_id,
             tags=self.tags,
             endpoint=self.endpoint,
+            aggregate=self.aggregate,
+            ttft_ms=ttft_ms,
+            generation_ms=generation_ms,
+            tokens_per_second=tokens_per_second,
+            span_ids=self._event_span(),
         )
 
 
-@contextmanager
 def observe(
     project: str,
     agent: Optional[str] = None,
@@ -105,10 +252,17 @@ def observe(
     user_id: Optional[str] = None,
     tags: Optional[Dict[str, Any]] = None,
     endpoint: Optional[str] = None,
-):
+    aggregate: Optional[bool] = None,
+    name: Optional[str] = None,
+) -> ObservationContext:
     """
     Context manager for observing LLM calls
     
+    Works with both ``with`` and ``async with``. Tracking only queues the
+    event for the background exporter, so it never blocks an event loop.
+    Nested blocks, including blocks in asyncio tasks started inside them,
+    form one trace; see ``ai_observer.propagate()`` for threads.
+    
     Args:
         project: Project name
         agent: Agent name (optional)
@@ -116,23 +270,29 @@ def observe(
         user_id: User ID (optional)
         tags: Additional tags (optional)
         endpoint: Custom endpoint (optional)
+        aggregate: Ship per-minute rollups instead of one event per call
+            (defaults to the ``aggregate`` setting)
+        name: Span name (defaults to step, agent or project)
         
     Example:
         with observe(project="rag-app", agent="planner") as obs:
             response = client.chat.completions.create(...)
             obs.track_response(response)
+        
+        async with observe(project="rag-app", agent="planner") as obs:
+            response = await async_client.chat.completions.create(...)
+            obs.track_response(response)
     """
-    ctx = ObservationContext(
+    return ObservationContext(
         project=project,
         agent=agent,
         step=step,
         user_id=user_id,
         tags=tags,
         endpoint=endpoint,
+        aggregate=aggregate,
+        name=name,
     )
-    
-    with ctx:
-        yield ctx
 
 
 def log_event(
@@ -150,10 +310,17 @@ def log_event(
     output_cost: float = 0.0,
     total_cost: float = 0.0,
     currency: str = "USD",
+    aggregate: Optional[bool] = None,
+    ttft_ms: Optional[int] = None,
+    generation_ms: Optional[int] = None,
+    tokens_per_second: Optional[float] = None,
 ):
     """
     Manually log an event
     
+    Inside an ``observe()`` block or ``@traced`` function the event joins
+    its trace as a child of that span.
+    
     Args:
         model: Model name
         prompt_tokens: Number of prompt tokens
@@ -169,6 +336,12 @@ def log_event(
         output_cost: Output cost
         total_cost: Total cost
         currency: Currency code
+        aggregate: Fold into a per-minute rollup instead of sending an event
+            (defaults to the ``aggregate`` setting)
+        ttft_ms: Time to first token in milliseconds
+        generation_ms: Milliseconds from the first token to the end of the response
+        tokens_per_second: Output tokens per second of generation (derived by
+            the collector from completion_tokens and generation_ms if omitted)
         
     Example:
         log_event(
@@ -199,6 +372,11 @@ def log_event(
         user_id=user_id,
         tags=tags,
         endpoint=endpoint,
+        aggregate=aggregate,
+        ttft_ms=ttft_ms,
+        generation_ms=generation_ms,
+        tokens_per_second=tokens_per_second,
+        span_ids=child_of(current_span()),
     )
 
 
@@ -209,10 +387,14 @@ def track_retrieval(
     project: Optional[str] = None,
     tags: Optional[Dict[str, Any]] = None,
     endpoint: Optional[str] = None,
+    latency_ms: int = 0,
 ):
     """
     Track RAG retrieval metrics
     
+    Inside an ``observe()`` block or ``@traced`` function the retrieval
+    joins its trace as a child of that span.
+    
     Args:
         chunks: Number of chunks retrieved
         context_tokens: Total context tokens
@@ -220,6 +402,7 @@ def track_retrieval(
         project: Project name
         tags: Additional tags
         endpoint: Custom endpoint
+        latency_ms: Time the retrieval took in milliseconds
         
     Example:
         track_retrieval(
@@ -234,6 +417,7 @@ def track_retrieval(
     
     config = get_config()
     endpoint_url = endpoint or config.endpoint
+    trace_id, span_id, parent_span_id = child_of(current_span())
     
     payload = {
         "event_id": str(uuid.uuid4()),
@@ -244,18 +428,13 @@ def track_retrieval(
         "source": source,
         "project": project,
         "tags": tags or {},
+        "latency_ms": latency_ms,
+        "trace_id": trace_id,
+        "span_id": span_id,
+        "parent_span_id": parent_span_id,
     }
     
-    try:
-        requests.post(
-            f"{endpoint_url}/events",
-            json=payload,
-            headers={"Authorization": f"Bearer {config.api_key}"} if config.api_key else {},
-            timeout=config.timeout,
-        )
-    except Exception as e:
-        # Silent failure - don't break user's code
-        pass
+    get_exporter().enqueue(endpoint_url, payload)
 
 
 def traced(
@@ -263,38 +442,71 @@ def traced(
     agent: Optional[str] = None,
     step: Optional[str] = None,
     tags: Optional[Dict[str, Any]] = None,
+    aggregate: Optional[bool] = None,
 ):
     """
     Decorator for tracing functions
     
+    Supports plain functions, coroutine functions and async generators.
+    
     Args:
         project: Project name
         agent: Agent name
         step: Step name
         tags: Additional tags
+        aggregate: Ship per-minute rollups instead of one event per call
         
     Example:
         @traced(project="rag-app", agent="executor")
         def run_agent():
             return client.chat.completions.create(...)
+        
+        @traced(project="rag-app", agent="executor")
+        async def run_agent_async():
+            return await async_client.chat.completions.create(...)
     """
     def decorator(func: Callable) -> Callable:
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            with observe(
-                project=project or func.__name__,
+        import inspect
+        
+        def start(name: str) -> ObservationContext:
+            return observe(
+                project=project or name,
                 agent=agent,
                 step=step,
                 tags=tags,
-            ) as obs:
+                aggregate=aggregate,
+                name=func.__qualname__,
+            )
+        
+        def track(obs: ObservationContext, result: Any):
+            # Try to track if result looks like an LLM response
+            registry = get_adapter_registry()
+            adapter = registry.get_adapter(result)
+            if adapter:
+                obs.track_response(result)
+        
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def asyncgen_wrapper(*args, **kwargs):
+                async with start(func.__name__):
+                    async for item in func(*args, **kwargs):
+                        yield item
+            return asyncgen_wrapper
+        
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                async with start(func.__name__) as obs:
+                    result = await func(*args, **kwargs)
+                    track(obs, result)
+                    return result
+            return async_wrapper
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with start(func.__name__) as obs:
                 result = func(*args, **kwargs)
-                
-                # Try to track if result looks like an LLM response
-                registry = get_adapter_registry()
-                adapter = registry.get_adapter(result)
-                if adapter:
-                    obs.track_response(result)
-                
+                track(obs, result)
                 return result
         return wrapper
     return decorator
@@ -317,11 +529,38 @@ def _send_event(
     user_id: Optional[str],
     tags: Optional[Dict[str, Any]],
     endpoint: Optional[str],
+    aggregate: Optional[bool] = None,
+    ttft_ms: Optional[int] = None,
+    generation_ms: Optional[int] = None,
+    tokens_per_second: Optional[float] = None,
+    span_ids: SpanIds = NO_SPAN,
 ):
-    """Internal function to send event to collector"""
+    """Internal function to queue an event (or fold it into a rollup) for the background exporter"""
     config = get_config()
     endpoint_url = endpoint or config.endpoint
     
+    if config.aggregate if aggregate is None else aggregate:
+        get_exporter().aggregate(
+            endpoint_url,
+            model=model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=total_tokens,
+            latency_ms=latency_ms,
+            input_cost=input_cost,
+            output_cost=output_cost,
+            total_cost=total_cost,
+            project=project,
+            agent=agent,
+            step=step,
+        )
+        return
+    
+    weight = sample_weight(project, total_cost, latency_ms)
+    if weight is None:
+        return
+    
+    trace_id, span_id, parent_span_id = span_ids
     payload = {
         "event_id": event_id,
         "timestamp": datetime.utcnow().isoformat(),
@@ -340,15 +579,13 @@ def _send_event(
         "step": step,
         "user_id": user_id,
         "tags": tags or {},
+        "sample_weight": weight,
+        "ttft_ms": ttft_ms,
+        "generation_ms": generation_ms,
+        "tokens_per_second": tokens_per_second,
+        "trace_id": trace_id,
+        "span_id": span_id,
+        "parent_span_id": parent_span_id,
     }
     
-    try:
-        requests.post(
-            f"{endpoint_url}/events",
-            json=payload,
-            headers={"Authorization": f"Bearer {config.api_key}"} if config.api_key else {},
-            timeout=config.timeout,
-        )
-    except Exception as e:
-        # Silent failure - don't break user's code
-        pass
+    get_exporter().enqueue(endpoint_url, payload)
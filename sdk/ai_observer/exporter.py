@@ -0,0 +1,624 @@
+"""Background batching exporter for AI Observer SDK"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from .aggregator import get_aggregator
+from .config import get_config
+
+if TYPE_CHECKING:
+    from .spool import DiskSpool
+
+# The transport (and with it ``requests``) and the spool are imported on
+# first use, off the caller's path, to keep ``import ai_observer`` cheap
+
+# Events per request when replaying the spool
+REPLAY_BATCH_SIZE = 500
+
+# Longest fork() waits for the parent's buffered events to be sent
+FORK_FLUSH_TIMEOUT = 5.0
+
+# Upper bounds in milliseconds of the flush latency histogram buckets
+FLUSH_LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# event_type of the SDK's own stats; the collector keeps them out of aggregates
+SDK_STATS_EVENT_TYPE = "sdk_stats"
+
+# Payload fields the collector deduplicates on. A failed request may still
+# have been stored, so only payloads carrying one are spooled and sent again.
+IDEMPOTENCY_KEYS = ("event_id", "rollup_id", "span_id")
+
+
+class CollectorUnavailable(Exception):
+    """The collector could not be reached or asked us to back off"""
+
+
+class CollectorRejected(Exception):
+    """The collector refused the batch; sending it again would not help"""
+
+
+class _FlushRequest:
+    """Marker placed on the queue to ask the worker to drain its batch"""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of durations in milliseconds"""
+
+    def __init__(self, bounds: Tuple[float, ...] = FLUSH_LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float):
+        index = next((i for i, bound in enumerate(self.bounds) if ms <= bound), len(self.bounds))
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counts per bucket, keyed by upper bound ("+Inf" for the last)"""
+        with self._lock:
+            counts = list(self.counts)
+            count, sum_ms, max_ms = self.count, self.sum_ms, self.max_ms
+        labels = [str(bound) for bound in self.bounds] + ["+Inf"]
+        return {
+            "count": count,
+            "sum_ms": round(sum_ms, 3),
+            "avg_ms": round(sum_ms / count, 3) if count else 0.0,
+            "max_ms": round(max_ms, 3),
+            "buckets": dict(zip(labels, counts)),
+        }
+
+
+class BatchExporter:
+    """
+    Buffers events in a bounded in-memory queue and ships them from a
+    background worker thread.
+
+    A batch is sent as soon as it reaches ``batch_size`` events or when
+    ``flush_interval`` seconds have passed since the last send, whichever
+    comes first. Callers only pay for a non-blocking ``put`` on the queue.
+
+    With a spool directory configured, batches the collector cannot take
+    are written to disk instead of being dropped, except for payloads
+    without an idempotency key (the SDK's own stats), which the collector
+    could not tell apart from a copy it already stored. While the transport's
+    circuit to the collector is open they go straight to the spool without
+    touching the network; once a send gets through again the spool is
+    replayed, oldest segment first.
+
+    When the queue is full the ``queue_policy`` setting decides what gives:
+    ``drop_newest`` drops the new event, ``drop_oldest`` makes room by
+    dropping the oldest queued event, ``block`` makes the caller wait up to
+    ``block_timeout`` seconds for room, and ``spill`` writes the new event
+    to the spool (dropping it without a spool directory). Every outcome is
+    counted in ``stats()``.
+    """
+
+    def __init__(self, max_queue_size: Optional[int] = None):
+        self.max_queue_size = max_queue_size or get_config().max_queue_size
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=self.max_queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._atexit_registered = False
+        self._spool: Optional["DiskSpool"] = None
+        self._spool_lock = threading.Lock()
+        self._spool_pending = False
+        self._replay_at = 0.0
+        self._stats_at = 0.0
+        self.flush_latency = LatencyHistogram()
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.sent = 0
+        self.bytes_sent = 0
+        self.retried = 0
+        self.dropped = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.send_failures = 0
+        self.last_error: Optional[str] = None
+        self.flush_latency.reset()
+
+    def _count(self, **deltas: int):
+        """Add to the named counters, which callers and the worker update concurrently"""
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def enqueue(self, endpoint_url: str, payload: Dict[str, Any]) -> bool:
+        """
+        Queue a payload for delivery to ``endpoint_url``
+
+        Returns False if the event was dropped because the queue is full
+        or the exporter has been shut down.
+        """
+        if self._closed:
+            self._count(dropped=1)
+            return False
+
+        self._ensure_started()
+        item = (endpoint_url, payload)
+        config = get_config()
+        try:
+            if config.queue_policy == "block":
+                self._queue.put(item, timeout=config.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            if config.queue_policy == "drop_oldest":
+                return self._replace_oldest(item)
+            if config.queue_policy == "spill":
+                return self._spill(item)
+            self._count(dropped=1)
+            return False
+        return True
+
+    def aggregate(self, endpoint_url: str, **call: Any) -> bool:
+        """
+        Fold a call into the aggregator's rollups for ``endpoint_url``
+
+        The worker thread ships each minute once it is over. Returns False
+        if the call was dropped because the exporter has been shut down and
+        nothing would ship it.
+        """
+        if self._closed:
+            self._count(dropped=1)
+            return False
+
+        get_aggregator().add(endpoint_url, **call)
+        self._ensure_started()
+        return True
+
+    def _replace_oldest(self, item: Tuple[str, Dict[str, Any]]) -> bool:
+        """Drop the oldest queued event to make room for ``item``"""
+        q = self._queue
+        with q.mutex:
+            # Flush requests and the stop marker are never dropped
+            oldest = next((i for i, queued in enumerate(q.queue) if isinstance(queued, tuple)), None)
+            if oldest is not None:
+                del q.queue[oldest]
+                q.queue.append(item)
+                q.not_empty.notify()
+        self._count(dropped=1)
+        return oldest is not None
+
+    def _spill(self, item: Tuple[str, Dict[str, Any]]) -> bool:
+        """Write ``item`` to the spool, to be replayed once the queue drains"""
+        spool = self._get_spool()
+        if spool is not None and _resendable(item[1]):
+            try:
+                spool.append([item])
+            except OSError as exc:
+                self._record_failure(exc)
+            else:
+                self._count(spooled=1)
+                self._spool_pending = True
+                return True
+        self._count(dropped=1)
+        return False
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until every event queued before this call has been sent
+
+        Returns False if the timeout expired first.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return True
+
+        request = _FlushRequest()
+        try:
+            self._queue.put(request, timeout=timeout)
+        except queue.Full:
+            return False
+        return request.done.wait(timeout)
+
+    def shutdown(self, timeout: Optional[float] = None):
+        """Flush pending events and stop the worker thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+
+        if thread is None or not thread.is_alive():
+            return
+
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of the exporter's counters and circuit breaker states"""
+        from .transport import get_transport
+
+        spool = self._spool
+        with self._lock:
+            counters = {
+                "sent": self.sent,
+                "bytes_sent": self.bytes_sent,
+                "retried": self.retried,
+                "dropped": self.dropped,
+                "spooled": self.spooled,
+                "replayed": self.replayed,
+            }
+            send_failures = self.send_failures
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self.max_queue_size,
+            "queue_policy": get_config().queue_policy,
+            **counters,
+            "evicted": spool.evicted if spool is not None else 0,
+            "spool_bytes": spool.size if spool is not None else 0,
+            "send_failures": send_failures,
+            "last_error": self.last_error,
+            "flush_latency_ms": self.flush_latency.snapshot(),
+            "circuit_breakers": {
+                collector: breaker.stats()
+                for collector, breaker in list(get_transport().breakers.items())
+            },
+        }
+
+    def before_fork(self):
+        """Send what this process has buffered so that a forked child does not inherit it"""
+        thread = self._thread
+        if not self._closed and thread is not None and thread.is_alive():
+            self.flush(FORK_FLUSH_TIMEOUT)
+
+    def after_fork_in_child(self):
+        """
+        Start over in a forked child
+
+        Only the forking thread survives a fork, so the worker is gone and
+        the queue and locks may have been copied mid-use. Anything still
+        buffered belongs to the parent, which sends it; the child drops its
+        copy so that no event is delivered twice. The spool is left to the
+        parent as well.
+        """
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._spool = None
+        self._spool_lock = threading.Lock()
+        self._spool_pending = False
+        self._replay_at = 0.0
+        self._stats_at = 0.0
+        self.flush_latency = LatencyHistogram()
+        self._reset_counters()
+
+    def _ensure_started(self):
+        """Start the worker thread on first use"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._closed or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(
+                target=self._run,
+                name="ai-observer-exporter",
+                daemon=True,
+            )
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.shutdown)
+                self._atexit_registered = True
+
+    def _run(self):
+        """Worker loop: collect events and send them by size or interval"""
+        batch: List[Tuple[str, Dict[str, Any]]] = []
+        last_send = time.monotonic()
+
+        while True:
+            config = get_config()
+            wait = max(0.0, last_send + config.flush_interval - time.monotonic())
+            if self._spool_pending:
+                wait = min(wait, max(0.0, self._replay_at - time.monotonic()))
+            if config.self_metrics_interval > 0:
+                if not self._stats_at:
+                    self._stats_at = time.monotonic() + config.self_metrics_interval
+                wait = min(wait, max(0.0, self._stats_at - time.monotonic()))
+
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                batch.extend(get_aggregator().drain(include_current=True))
+                self._send(batch)
+                if self._spool is not None:
+                    self._spool.close()
+                return
+
+            if isinstance(item, _FlushRequest):
+                batch.extend(get_aggregator().drain(include_current=True))
+                self._send(batch)
+                batch = []
+                last_send = time.monotonic()
+                item.done.set()
+                continue
+
+            if item is not None:
+                batch.append(item)
+            batch.extend(get_aggregator().drain())
+            if config.self_metrics_interval > 0 and time.monotonic() >= self._stats_at:
+                batch.append((config.endpoint, self._stats_event()))
+                self._stats_at = time.monotonic() + config.self_metrics_interval
+
+            if len(batch) >= config.batch_size or (
+                batch and time.monotonic() - last_send >= config.flush_interval
+            ):
+                self._send(batch)
+                batch = []
+                last_send = time.monotonic()
+            elif not batch:
+                last_send = time.monotonic()
+
+            self._replay()
+
+    def _send(self, batch: List[Tuple[str, Dict[str, Any]]]):
+        """Deliver a batch of events to the collector, spooling what fails"""
+        if not batch:
+            return
+
+        spool = self._get_spool()
+
+        # Events may target different collectors via the per-call endpoint
+        by_endpoint: Dict[str, List[Dict[str, Any]]] = {}
+        for endpoint_url, payload in batch:
+            by_endpoint.setdefault(endpoint_url, []).append(payload)
+
+        failed: List[Tuple[str, Dict[str, Any]]] = []
+        start = time.perf_counter()
+        for endpoint_url, payloads in by_endpoint.items():
+            try:
+                self._post(endpoint_url, payloads)
+            except CollectorRejected as exc:
+                self._record_failure(exc)
+                self._count(dropped=len(payloads))
+            except Exception as exc:
+                # Never raised into the user's code; counted in stats() instead
+                self._record_failure(exc)
+                failed.extend((endpoint_url, payload) for payload in payloads)
+        self.flush_latency.observe((time.perf_counter() - start) * 1000)
+
+        if not failed:
+            return
+        if spool is not None:
+            resendable = [item for item in failed if _resendable(item[1])]
+            try:
+                spool.append(resendable)
+            except OSError as exc:
+                self._record_failure(exc)
+            else:
+                self._count(spooled=len(resendable), dropped=len(failed) - len(resendable))
+                self._spool_pending = self._spool_pending or bool(resendable)
+                return
+        self._count(dropped=len(failed))
+
+    def _post(self, endpoint_url: str, payloads: List[Dict[str, Any]]) -> int:
+        """
+        Send payloads to the batch endpoint; returns how many were accepted
+
+        Raises ``CollectorUnavailable`` if they should be sent again later
+        and ``CollectorRejected`` for any other non-2xx response. Items the
+        collector rejects one by one are counted as dropped.
+        """
+        from .transport import get_transport, is_unavailable
+
+        response = get_transport().post(f"{endpoint_url}/events/batch", payloads)
+        self._count(retried=_retries(response))
+        status = response.status_code
+        if is_unavailable(status):
+            raise CollectorUnavailable(f"Collector returned HTTP {status}")
+        if not 200 <= status < 300:
+            raise CollectorRejected(f"Collector rejected the batch with HTTP {status}")
+        rejected = _rejected(response)
+        accepted = len(payloads) - len(rejected)
+        self._count(bytes_sent=_body_size(response), sent=accepted, dropped=len(rejected))
+        if rejected:
+            self._record_error(
+                f"Collector rejected {len(rejected)} of {len(payloads)} events: {rejected[0].get('error')}"
+            )
+        return accepted
+
+    def _record_failure(self, exc: BaseException):
+        self._count(send_failures=1)
+        self._record_error(f"{type(exc).__name__}: {exc}")
+
+    def _record_error(self, message: str):
+        import logging
+
+        self.last_error = message
+        logging.getLogger(__name__).debug("Delivery failed: %s", message)
+
+    def _stats_event(self) -> Dict[str, Any]:
+        """Internal event carrying ``stats()``, sent with ``self_metrics_interval``"""
+        import socket
+
+        return {
+            "event_type": SDK_STATS_EVENT_TYPE,
+            "timestamp": datetime.utcnow().isoformat(),
+            "client_id": f"{socket.gethostname()}:{os.getpid()}",
+            "stats": self.stats(),
+        }
+
+    def _get_spool(self) -> Optional["DiskSpool"]:
+        """Open, reopen or close the spool to follow the configuration"""
+        # Callers spill to the spool while the worker sends and replays
+        with self._spool_lock:
+            return self._sync_spool()
+
+    def _sync_spool(self) -> Optional["DiskSpool"]:
+        config = get_config()
+        spool = self._spool
+
+        if spool is not None and str(spool.directory) != str(config.spool_dir):
+            spool.close()
+            spool = self._spool = None
+            self._spool_pending = False
+
+        if spool is None and config.spool_dir:
+            from .spool import DiskSpool
+
+            try:
+                spool = self._spool = DiskSpool(config.spool_dir, config.spool_max_bytes)
+            except OSError:
+                return None
+            # Events left behind by an earlier run are replayed right away
+            self._spool_pending = len(spool) > 0
+
+        if spool is not None:
+            spool.max_bytes = config.spool_max_bytes
+        return spool
+
+    def _replay(self):
+        """Replay the oldest spool segment if the collector may be back"""
+        spool = self._get_spool()
+        if spool is None or not self._spool_pending or time.monotonic() < self._replay_at:
+            return
+
+        try:
+            spool.replay_oldest(self._replay_post, REPLAY_BATCH_SIZE)
+        except Exception as exc:
+            self._record_failure(exc)
+            # Wait at least until the circuit lets a probe through again
+            delay = max(getattr(exc, "retry_after", 0.0), get_config().breaker_backoff)
+            self._replay_at = time.monotonic() + delay
+            return
+        self._spool_pending = len(spool) > 0
+
+    def _replay_post(self, endpoint_url: str, payloads: List[Dict[str, Any]]):
+        """Send a run of spooled events; a run the collector refuses leaves the spool as dropped"""
+        try:
+            self._count(replayed=self._post(endpoint_url, payloads))
+        except CollectorRejected as exc:
+            self._record_failure(exc)
+            self._count(dropped=len(payloads))
+
+
+def _resendable(payload: Dict[str, Any]) -> bool:
+    """Whether the collector would recognise ``payload`` if it arrived twice"""
+    return any(payload.get(key) for key in IDEMPOTENCY_KEYS)
+
+
+def _retries(response: Any) -> int:
+    """Attempts urllib3 repeated before ``response`` came back"""
+    history = getattr(getattr(getattr(response, "raw", None), "retries", None), "history", None)
+    return len(history) if isinstance(history, tuple) else 0
+
+
+def _rejected(response: Any) -> List[Dict[str, Any]]:
+    """Items reported as errors in the collector's batch response"""
+    try:
+        body = response.json()
+    except ValueError:
+        return []
+    results = body.get("results") if isinstance(body, dict) else None
+    if not isinstance(results, list):
+        return []
+    return [result for result in results if isinstance(result, dict) and result.get("status") == "error"]
+
+
+def _body_size(response: Any) -> int:
+    """Size of the request body that produced ``response``"""
+    body = getattr(getattr(response, "request", None), "body", None)
+    return len(body) if isinstance(body, (bytes, str)) else 0
+
+
+# Global exporter instance
+_exporter = BatchExporter()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(
+        before=_exporter.before_fork,
+        after_in_child=_exporter.after_fork_in_child,
+    )
+
+
+def get_exporter() -> BatchExporter:
+    """Get the global exporter instance"""
+    return _exporter
+
+
+def flush(timeout: Optional[float] = None) -> bool:
+    """
+    Send all buffered events now
+
+    Args:
+        timeout: Maximum number of seconds to wait (None waits forever)
+
+    Returns:
+        True if every buffered event was handed to the collector
+    """
+    return _exporter.flush(timeout)
+
+
+def shutdown(timeout: Optional[float] = None):
+    """
+    Flush buffered events and stop the background exporter
+
+    Called automatically at interpreter exit.
+    """
+    _exporter.shutdown(timeout)
+
+
+def get_stats() -> Dict[str, Any]:
+    """
+    Report the SDK's delivery health
+
+    Returns:
+        Dict with the queue depth, capacity and overflow policy; the number
+        of events sent, dropped (including those the collector refused),
+        spooled, replayed from the spool and evicted from it to stay under
+        ``spool_max_bytes``; bytes sent, HTTP retries, failed sends and the
+        last error; a histogram of per-flush latency in milliseconds; the
+        spool size in bytes; and per-collector circuit breaker state (``closed``, ``open`` or
+        ``half_open``), consecutive failures, times opened, sends
+        short-circuited and seconds until the next probe
+    """
+    return _exporter.stats()
+
+
+async def aflush(timeout: Optional[float] = None) -> bool:
+    """
+    Async version of ``flush()``
+
+    Waits for the exporter thread without blocking the running event loop.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _exporter.flush, timeout)
+
+
+async def ashutdown(timeout: Optional[float] = None):
+    """Async version of ``shutdown()``"""
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, _exporter.shutdown, timeout)
@@ -0,0 +1,218 @@
+"""Automatic instrumentation of the OpenAI and Anthropic clients"""
+
+import contextvars
+import functools
+import importlib
+import inspect
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .config import get_config
+from .core import ObservationContext, get_adapter_registry
+
+# (module, sync resource class, async resource class) whose ``create`` is patched
+TARGETS = (
+    ("openai.resources.chat", "Completions", "AsyncCompletions"),
+    ("anthropic.resources.messages", "Messages", "AsyncMessages"),
+)
+
+_FIELDS = ("project", "agent", "step", "user_id", "tags")
+
+_scope: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("ai_observer_scope", default={})
+
+
+class Scope:
+    """
+    Attribution for instrumented calls made inside a block
+
+    Fields left as None are inherited from the enclosing scope. The scope
+    lives in a context variable, so it follows asyncio tasks and
+    ``contextvars.copy_context()`` but not plain new threads.
+    """
+
+    def __init__(self, **fields: Any):
+        self.fields = {name: value for name, value in fields.items() if value is not None}
+        self._token: Optional[contextvars.Token] = None
+
+    def __enter__(self):
+        self._token = _scope.set({**_scope.get(), **self.fields})
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _scope.reset(self._token)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return self.__exit__(exc_type, exc_val, exc_tb)
+
+
+def scope(
+    project: Optional[str] = None,
+    agent: Optional[str] = None,
+    step: Optional[str] = None,
+    user_id: Optional[str] = None,
+    tags: Optional[Dict[str, Any]] = None,
+) -> Scope:
+    """
+    Attribute instrumented LLM calls made in a ``with`` / ``async with`` block
+
+    Example:
+        ai_observer.instrument()
+
+        with ai_observer.scope(project="rag-app", agent="planner"):
+            client.chat.completions.create(...)
+    """
+    return Scope(project=project, agent=agent, step=step, user_id=user_id, tags=tags)
+
+
+class _Instrumentor:
+    """Keeps the patched methods and their originals"""
+
+    def __init__(self):
+        self.requested = False
+        self.defaults: Dict[str, Any] = {}
+        # (class, original create, whether the class defined it itself)
+        self.originals: List[Tuple[type, Callable, bool]] = []
+        self._lock = threading.Lock()
+
+    def patch(self):
+        """Replace each installed client's ``create`` with a tracking wrapper"""
+        with self._lock:
+            if self.originals:
+                return
+            for module_name, sync_name, async_name in TARGETS:
+                try:
+                    module = importlib.import_module(module_name)
+                except ImportError:
+                    continue
+                for name, wrap in ((sync_name, _wrap_sync), (async_name, _wrap_async)):
+                    cls = getattr(module, name, None)
+                    # Some SDK versions inherit create from a base class
+                    original = inspect.getattr_static(cls, "create", None) if cls is not None else None
+                    if not callable(original):
+                        continue
+                    own = "create" in cls.__dict__
+                    setattr(cls, "create", wrap(original))
+                    self.originals.append((cls, original, own))
+
+    def restore(self):
+        """Put the original ``create`` methods back"""
+        with self._lock:
+            for cls, original, own in reversed(self.originals):
+                if own:
+                    setattr(cls, "create", original)
+                else:
+                    # Inherited: uncover the base class's method again
+                    delattr(cls, "create")
+            self.originals = []
+
+    def after_fork_in_child(self):
+        self._lock = threading.Lock()
+
+    def on_enabled_change(self, enabled: bool):
+        if not self.requested:
+            return
+        if enabled:
+            self.patch()
+        else:
+            self.restore()
+
+
+_instrumentor = _Instrumentor()
+get_config().on_enabled_change(_instrumentor.on_enabled_change)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_instrumentor.after_fork_in_child)
+
+
+def _observation(start_time: float) -> ObservationContext:
+    fields = {**_instrumentor.defaults, **_scope.get()}
+    obs = ObservationContext(**{name: fields.get(name) for name in _FIELDS})
+    obs.start_time = start_time
+    return obs
+
+
+def _track(response: Any, start_time: float, stream: bool) -> Any:
+    """Track a response from a patched ``create``; returns what the caller gets"""
+    try:
+        if stream:
+            return _observation(start_time).track_stream(response)
+        # Raw-response wrappers and the like carry no usage to track
+        if get_adapter_registry().get_adapter(response) is not None:
+            _observation(start_time).track_response(response)
+    except Exception:
+        # Silent failure - don't break user's code
+        pass
+    return response
+
+
+def _wrap_sync(original: Callable) -> Callable:
+    @functools.wraps(original)
+    def create(self, *args, **kwargs):
+        start_time = time.time()
+        response = original(self, *args, **kwargs)
+        return _track(response, start_time, kwargs.get("stream") is True)
+
+    return create
+
+
+def _wrap_async(original: Callable) -> Callable:
+    @functools.wraps(original)
+    async def create(self, *args, **kwargs):
+        start_time = time.time()
+        response = await original(self, *args, **kwargs)
+        return _track(response, start_time, kwargs.get("stream") is True)
+
+    return create
+
+
+def instrument(
+    project: Optional[str] = None,
+    agent: Optional[str] = None,
+    step: Optional[str] = None,
+    user_id: Optional[str] = None,
+    tags: Optional[Dict[str, Any]] = None,
+):
+    """
+    Track every OpenAI and Anthropic ``create`` call automatically
+
+    Patches ``chat.completions.create`` and ``messages.create`` of the
+    installed ``openai``/``anthropic`` packages, sync and async, so calls
+    are tracked without ``observe()`` at each call site. Streams
+    (``stream=True``) are tracked as they are consumed. Calls are
+    attributed to the innermost ``scope()``, falling back to the
+    arguments given here.
+
+    While tracking is disabled (``configure(enabled=False)``) the original
+    methods are put back, so instrumented clients cost nothing extra; they
+    are patched again when it is re-enabled.
+
+    Do not also call ``track_response()`` on instrumented calls, or they
+    are counted twice.
+
+    Args:
+        project: Default project for calls outside any scope
+        agent: Default agent
+        step: Default step
+        user_id: Default user ID
+        tags: Default tags
+    """
+    _instrumentor.defaults = {
+        name: value
+        for name, value in zip(_FIELDS, (project, agent, step, user_id, tags))
+        if value is not None
+    }
+    _instrumentor.requested = True
+    if get_config().enabled:
+        _instrumentor.patch()
+
+
+def uninstrument():
+    """Undo ``instrument()``, restoring the original client methods"""
+    _instrumentor.requested = False
+    _instrumentor.restore()
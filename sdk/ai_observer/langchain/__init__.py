@@ -1,6 +1,8 @@
 """LangChain integration for AI Cost Observatory"""
 
 from typing import Any, Dict, Optional, List
+from uuid import UUID
+import threading
 import time
 
 try:
@@ -14,8 +16,73 @@ except ImportError:
 from ..core import log_event
 
 
+def extract_usage(response: Any) -> Optional[Dict[str, Any]]:
+    """
+    Token usage and model of one LLM run's result, counted once
+    
+    ``llm_output["token_usage"]`` already totals every generation of the
+    run, so it is used when present. Otherwise usage is summed over the
+    generations, from ``message.usage_metadata`` (chat models) or
+    ``generation_info["token_usage"]``. Returns None without usage.
+    """
+    llm_output = getattr(response, 'llm_output', None) or {}
+    model = llm_output.get('model_name')
+    
+    usage = llm_output.get('token_usage') or {}
+    prompt_tokens = usage.get('prompt_tokens', 0) or 0
+    completion_tokens = usage.get('completion_tokens', 0) or 0
+    
+    if not (prompt_tokens or completion_tokens):
+        for generation_list in getattr(response, 'generations', None) or []:
+            for gen in generation_list or []:
+                generation_info = getattr(gen, 'generation_info', None) or {}
+                message = getattr(gen, 'message', None)
+                metadata = getattr(message, 'usage_metadata', None)
+                
+                if metadata:
+                    prompt_tokens += metadata.get('input_tokens', 0) or 0
+                    completion_tokens += metadata.get('output_tokens', 0) or 0
+                else:
+                    usage = generation_info.get('token_usage') or {}
+                    prompt_tokens += usage.get('prompt_tokens', 0) or 0
+                    completion_tokens += usage.get('completion_tokens', 0) or 0
+                
+                if not model:
+                    response_metadata = getattr(message, 'response_metadata', None) or {}
+                    model = generation_info.get('model_name') or response_metadata.get('model_name')
+    
+    if not (prompt_tokens or completion_tokens):
+        return None
+    return {
+        "model": model or "unknown",
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+    }
+
+
+class _ChainTotals:
+    """Usage of the LLM calls made inside one top-level chain run, per model"""
+    
+    def __init__(self, start_time: float):
+        self.start_time = start_time
+        self.models: Dict[str, List[int]] = {}
+    
+    def add(self, usage: Dict[str, Any]):
+        counts = self.models.setdefault(usage["model"], [0, 0, 0])
+        counts[0] += usage["prompt_tokens"]
+        counts[1] += usage["completion_tokens"]
+        counts[2] += 1
+
+
 class CostCallback(BaseCallbackHandler):
-    """LangChain callback for tracking costs"""
+    """
+    LangChain callback for tracking costs
+    
+    Timing is kept per LangChain ``run_id``, so one callback can be shared
+    by concurrent, batched and async runs. Each LLM run is counted once.
+    With ``aggregate_chains`` the LLM calls made inside a chain run are
+    summed and sent as one record per model when the outermost chain ends.
+    """
     
     def __init__(
         self,
@@ -25,6 +92,8 @@ class CostCallback(BaseCallbackHandler):
         user_id: Optional[str] = None,
         tags: Optional[Dict[str, Any]] = None,
         endpoint: Optional[str] = None,
+        aggregate_chains: bool = False,
+        aggregate: Optional[bool] = None,
     ):
         """
         Initialize the cost callback
@@ -36,7 +105,11 @@ class CostCallback(BaseCallbackHandler):
             user_id: User ID
             tags: Additional tags
             endpoint: Custom endpoint
-            
+            aggregate_chains: Send one record per model for all LLM calls in
+                a chain run, at ``on_chain_end``, instead of one per call
+            aggregate: Fold records into per-minute rollups (defaults to the
+                ``aggregate`` setting); useful for large ``batch()`` jobs
+        
         Example:
             from ai_observer.langchain import CostCallback
             from langchain.chat_models import ChatOpenAI
@@ -52,69 +125,149 @@ class CostCallback(BaseCallbackHandler):
         self.user_id = user_id
         self.tags = tags or {}
         self.endpoint = endpoint
-        self.start_time = None
-        
+        self.aggregate_chains = aggregate_chains
+        self.aggregate = aggregate
+        self._lock = threading.Lock()
+        # LLM run_id -> start time
+        self._llm_runs: Dict[Optional[UUID], float] = {}
+        # run_id -> parent run_id for running chains, and for tools and
+        # retrievers inside them, so nested LLM calls find their chain
+        self._chain_parents: Dict[UUID, Optional[UUID]] = {}
+        # top-level chain run_id -> totals
+        self._chain_totals: Dict[UUID, _ChainTotals] = {}
+    
     def on_llm_start(
         self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any
     ) -> None:
         """Run when LLM starts running"""
-        self.start_time = time.time()
-        
-    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        with self._lock:
+            self._llm_runs[kwargs.get('run_id')] = time.time()
+    
+    def on_chat_model_start(
+        self, serialized: Dict[str, Any], messages: List[List[Any]], **kwargs: Any
+    ) -> None:
+        """Run when a chat model starts running"""
+        with self._lock:
+            self._llm_runs[kwargs.get('run_id')] = time.time()
+    
+    def on_llm_end(self, response: "LLMResult", **kwargs: Any) -> None:
         """Run when LLM ends running"""
-        if not self.start_time:
+        with self._lock:
+            start_time = self._llm_runs.pop(kwargs.get('run_id'), None)
+        if start_time is None:
             return
-            
-        latency_ms = int((time.time() - self.start_time) * 1000)
         
-        # Extract usage from LangChain response
-        for generation in response.generations:
-            if generation and len(generation) > 0:
-                gen = generation[0]
-                
-                # Try to get token usage from generation info
-                if hasattr(gen, 'generation_info') and gen.generation_info:
-                    usage = gen.generation_info.get('token_usage', {})
-                    model = gen.generation_info.get('model_name', 'unknown')
-                    
-                    prompt_tokens = usage.get('prompt_tokens', 0)
-                    completion_tokens = usage.get('completion_tokens', 0)
-                    
-                    if prompt_tokens > 0 or completion_tokens > 0:
-                        log_event(
-                            model=model,
-                            prompt_tokens=prompt_tokens,
-                            completion_tokens=completion_tokens,
-                            latency_ms=latency_ms,
-                            project=self.project,
-                            agent=self.agent,
-                            step=self.step,
-                            user_id=self.user_id,
-                            tags=self.tags,
-                            endpoint=self.endpoint,
-                        )
+        usage = extract_usage(response)
+        if usage is None:
+            return
         
-        # Also check llm_output for aggregate usage
-        if hasattr(response, 'llm_output') and response.llm_output:
-            usage = response.llm_output.get('token_usage', {})
-            model = response.llm_output.get('model_name', 'unknown')
-            
-            prompt_tokens = usage.get('prompt_tokens', 0)
-            completion_tokens = usage.get('completion_tokens', 0)
-            
-            if prompt_tokens > 0 or completion_tokens > 0:
-                log_event(
-                    model=model,
-                    prompt_tokens=prompt_tokens,
-                    completion_tokens=completion_tokens,
-                    latency_ms=latency_ms,
-                    project=self.project,
-                    agent=self.agent,
-                    step=self.step,
-                    user_id=self.user_id,
-                    tags=self.tags,
-                    endpoint=self.endpoint,
-                )
+        if self.aggregate_chains:
+            with self._lock:
+                totals = self._chain_totals.get(self._root_chain(kwargs.get('parent_run_id')))
+                if totals is not None:
+                    totals.add(usage)
+                    return
+        
+        self._log(usage, int((time.time() - start_time) * 1000))
+    
+    def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
+        """Run when LLM errors"""
+        with self._lock:
+            self._llm_runs.pop(kwargs.get('run_id'), None)
+    
+    def on_chain_start(
+        self, serialized: Dict[str, Any], inputs: Dict[str, Any], **kwargs: Any
+    ) -> None:
+        """Run when a chain starts running"""
+        run_id = kwargs.get('run_id')
+        if not self.aggregate_chains or run_id is None:
+            return
+        
+        parent_run_id = kwargs.get('parent_run_id')
+        with self._lock:
+            self._chain_parents[run_id] = parent_run_id
+            if parent_run_id not in self._chain_parents:
+                self._chain_totals[run_id] = _ChainTotals(time.time())
+    
+    def on_chain_end(self, outputs: Dict[str, Any], **kwargs: Any) -> None:
+        """Run when a chain ends running; sends its totals if it is the outermost chain"""
+        self._end_chain(kwargs.get('run_id'))
+    
+    def on_chain_error(self, error: BaseException, **kwargs: Any) -> None:
+        """Run when a chain errors; tokens already used are still sent"""
+        self._end_chain(kwargs.get('run_id'))
+    
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs: Any) -> None:
+        """Run when a tool starts running"""
+        self._start_child(kwargs.get('run_id'), kwargs.get('parent_run_id'))
+    
+    def on_tool_end(self, output: Any, **kwargs: Any) -> None:
+        """Run when a tool ends running"""
+        self._end_chain(kwargs.get('run_id'))
+    
+    def on_tool_error(self, error: BaseException, **kwargs: Any) -> None:
+        """Run when a tool errors"""
+        self._end_chain(kwargs.get('run_id'))
+    
+    def on_retriever_start(self, serialized: Dict[str, Any], query: str, **kwargs: Any) -> None:
+        """Run when a retriever starts running"""
+        self._start_child(kwargs.get('run_id'), kwargs.get('parent_run_id'))
+    
+    def on_retriever_end(self, documents: Any, **kwargs: Any) -> None:
+        """Run when a retriever ends running"""
+        self._end_chain(kwargs.get('run_id'))
+    
+    def on_retriever_error(self, error: BaseException, **kwargs: Any) -> None:
+        """Run when a retriever errors"""
+        self._end_chain(kwargs.get('run_id'))
+    
+    def _start_child(self, run_id: Optional[UUID], parent_run_id: Optional[UUID]):
+        """Link a tool or retriever run to the chain it runs in"""
+        if not self.aggregate_chains or run_id is None:
+            return
+        with self._lock:
+            if parent_run_id in self._chain_parents:
+                self._chain_parents[run_id] = parent_run_id
+    
+    def _root_chain(self, run_id: Optional[UUID]) -> Optional[UUID]:
+        """Outermost running chain containing ``run_id`` (call with the lock held)"""
+        root = None
+        while run_id in self._chain_parents:
+            root = run_id
+            run_id = self._chain_parents[run_id]
+        return root
+    
+    def _end_chain(self, run_id: Optional[UUID]):
+        if run_id is None:
+            return
+        with self._lock:
+            self._chain_parents.pop(run_id, None)
+            totals = self._chain_totals.pop(run_id, None)
+        if totals is None:
+            return
+        
+        latency_ms = int((time.time() - totals.start_time) * 1000)
+        for model, (prompt_tokens, completion_tokens, calls) in totals.models.items():
+            self._log(
+                {"model": model, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens},
+                latency_ms,
+                tags={**self.tags, "llm_calls": calls},
+            )
+    
+    def _log(self, usage: Dict[str, Any], latency_ms: int, tags: Optional[Dict[str, Any]] = None):
+        log_event(
+            model=usage["model"],
+            prompt_tokens=usage["prompt_tokens"],
+            completion_tokens=usage["completion_tokens"],
+            latency_ms=latency_ms,
+            project=self.project,
+            agent=self.agent,
+            step=self.step,
+            user_id=self.user_id,
+            tags=self.tags if tags is None else tags,
+            endpoint=self.endpoint,
+            aggregate=self.aggregate,
+        )
 
 
 if not LANGCHAIN_AVAILABLE:
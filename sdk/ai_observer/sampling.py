@@ -0,0 +1,30 @@
+"""Head sampling of LLM call events"""
+
+import random
+from typing import Optional
+
+from .config import get_config
+
+
+def sample_weight(project: Optional[str], total_cost: float, latency_ms: int) -> Optional[float]:
+    """
+    Decide whether to keep an event and with what weight
+
+    Returns None to drop the event, otherwise the ``sample_weight`` to send
+    with it: the inverse of the probability it was kept with. Calls at or
+    above ``sample_keep_cost`` or ``sample_keep_latency_ms`` are always
+    kept with weight 1, so weighted totals on the collector stay unbiased.
+    """
+    config = get_config()
+
+    if config.sample_keep_cost is not None and total_cost >= config.sample_keep_cost:
+        return 1.0
+    if config.sample_keep_latency_ms is not None and latency_ms >= config.sample_keep_latency_ms:
+        return 1.0
+
+    rate = config.project_sample_rates.get(project, config.sample_rate) if project else config.sample_rate
+    if rate >= 1.0:
+        return 1.0
+    if rate <= 0.0 or random.random() >= rate:
+        return None
+    return 1.0 / rate
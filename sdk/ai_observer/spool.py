@@ -0,0 +1,204 @@
+"""Crash-safe on-disk spool for events the collector could not accept"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+Record = Tuple[str, Dict[str, Any]]
+
+# A segment is closed and a new one started once it grows past this size
+SEGMENT_BYTES = 4 * 1024 * 1024
+
+SEGMENT_SUFFIX = ".spool"
+
+
+class DiskSpool:
+    """
+    Append-only segment files holding batches that failed to send
+
+    Each record is one JSON line ``{"endpoint": ..., "payload": ...}``,
+    fsynced before ``append()`` returns, so a spooled event survives a
+    crash of the process. Segment names start with a nanosecond timestamp,
+    which makes lexical order the order events were spooled in: replay and
+    eviction both work oldest first. When the spool grows past
+    ``max_bytes`` whole segments are evicted, oldest first.
+
+    A spool directory should belong to a single process at a time.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, segment_bytes: int = SEGMENT_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.evicted = 0
+
+        self._lock = threading.Lock()
+        self._active: Optional[Path] = None
+        self._active_file = None
+        self._active_size = 0
+        self._size = sum(segment.stat().st_size for segment in self._segments())
+
+    def __len__(self) -> int:
+        """Number of segment files waiting to be replayed"""
+        return len(self._segments())
+
+    @property
+    def size(self) -> int:
+        """Bytes currently held on disk"""
+        return self._size
+
+    def append(self, records: List[Record]):
+        """Durably append records to the active segment"""
+        if not records:
+            return
+
+        data = "".join(
+            json.dumps({"endpoint": endpoint_url, "payload": payload}, default=str) + "\n"
+            for endpoint_url, payload in records
+        ).encode()
+
+        with self._lock:
+            if self._active_file is None or self._active_size >= self.segment_bytes:
+                self._roll()
+            self._active_file.write(data)
+            self._active_file.flush()
+            os.fsync(self._active_file.fileno())
+            self._active_size += len(data)
+            self._size += len(data)
+            self._evict()
+
+    def replay_oldest(self, send: Callable[[str, List[Dict[str, Any]]], None], batch_size: int) -> int:
+        """
+        Send the oldest segment through ``send(endpoint_url, payloads)``
+
+        Records go out in order, in runs of up to ``batch_size`` payloads for
+        the same endpoint. The segment is deleted once every run has been
+        sent. If ``send`` raises, the delivered prefix is cut from the
+        segment (via an atomic rename) and the exception propagates, so
+        nothing is sent twice or lost. Records appended to the segment by
+        other threads while it is being sent are kept for the next replay.
+
+        Returns the number of records delivered.
+        """
+        with self._lock:
+            segments = self._segments()
+            if not segments:
+                return 0
+            segment = segments[0]
+            # Appends are fsynced and whole, so even the active segment can
+            # be read as is, up to its current length
+            length = segment.stat().st_size
+
+        records = self._read(segment, length)
+        delivered = 0
+        try:
+            while delivered < len(records):
+                endpoint_url = records[delivered][0]
+                payloads = []
+                for record_url, payload in records[delivered:delivered + batch_size]:
+                    if record_url != endpoint_url:
+                        break
+                    payloads.append(payload)
+                send(endpoint_url, payloads)
+                delivered += len(payloads)
+        except Exception:
+            if delivered:
+                self._rewrite(segment, records[delivered:], length)
+            raise
+
+        self._rewrite(segment, [], length)
+        return delivered
+
+    def close(self):
+        """Close the active segment"""
+        with self._lock:
+            self._close_active()
+
+    def _segments(self) -> List[Path]:
+        return sorted(self.directory.glob(f"*{SEGMENT_SUFFIX}"))
+
+    def _roll(self):
+        """Close the active segment and open a new one"""
+        self._close_active()
+        self._active = self.directory / f"{time.time_ns():020d}-{os.getpid()}{SEGMENT_SUFFIX}"
+        self._active_file = open(self._active, "ab")
+        self._active_size = 0
+
+    def _close_active(self):
+        if self._active_file is not None:
+            self._active_file.close()
+        self._active = None
+        self._active_file = None
+        self._active_size = 0
+
+    def _evict(self):
+        """Delete the oldest segments until the spool fits in max_bytes"""
+        while self._size > self.max_bytes:
+            segments = self._segments()
+            if not segments:
+                return
+            oldest = segments[0]
+            if oldest == self._active:
+                self._close_active()
+            self.evicted += len(self._read(oldest))
+            self._remove(oldest)
+
+    def _remove(self, segment: Path):
+        try:
+            size = segment.stat().st_size
+            segment.unlink()
+        except FileNotFoundError:
+            return
+        self._size -= size
+
+    def _rewrite(self, segment: Path, records: List[Record], replayed_bytes: int):
+        """
+        Atomically replace the first ``replayed_bytes`` of a segment with the
+        given records, removing the segment if nothing is left
+        """
+        data = "".join(
+            json.dumps({"endpoint": endpoint_url, "payload": payload}) + "\n"
+            for endpoint_url, payload in records
+        ).encode()
+        tmp = segment.with_suffix(".tmp")
+
+        with self._lock:
+            if segment == self._active:
+                self._close_active()
+            try:
+                with open(segment, "rb") as f:
+                    f.seek(replayed_bytes)
+                    data += f.read()
+            except FileNotFoundError:
+                return
+            if not data:
+                self._remove(segment)
+                return
+
+            with open(tmp, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            old_size = segment.stat().st_size
+            os.replace(tmp, segment)
+            self._size += len(data) - old_size
+
+    @staticmethod
+    def _read(segment: Path, length: int = -1) -> List[Record]:
+        """Records in the first ``length`` bytes of a segment; a line torn by a crash mid-write is skipped"""
+        records = []
+        try:
+            with open(segment, "rb") as f:
+                for line in f.read(length).splitlines():
+                    try:
+                        record = json.loads(line)
+                        records.append((record["endpoint"], record["payload"]))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except FileNotFoundError:
+            pass
+        return records
@@ -0,0 +1,240 @@
+"""Instrumentation for streaming OpenAI and Anthropic responses"""
+
+import inspect
+import time
+import weakref
+from typing import Any, Callable, Dict, Optional
+
+from .adapters import AnthropicAdapter, OpenAIAdapter, ProviderAdapter
+
+
+class StreamUsage:
+    """
+    Token usage and timing read off a stream as its chunks go by
+
+    Understands OpenAI ``ChatCompletionChunk`` objects and Anthropic raw
+    message stream events. Exact counts come from the usage the provider
+    sends with the stream (OpenAI's final chunk when the request has
+    ``stream_options={"include_usage": True}``, Anthropic's
+    ``message_start``/``message_delta`` events); without them completion
+    tokens are counted as one per content chunk.
+    """
+
+    def __init__(self, start_time: float):
+        self.start_time = start_time
+        self.first_token_time: Optional[float] = None
+        self.end_time: Optional[float] = None
+        self.provider: Optional[str] = None
+        self.model = "unknown"
+        self.prompt_tokens = 0
+        self.completion_tokens: Optional[int] = None
+        self.content_chunks = 0
+
+    def add(self, chunk: Any):
+        """Account for one chunk without copying or holding on to it"""
+        event_type = getattr(chunk, "type", None)
+        if event_type is not None:
+            self._add_anthropic(chunk, event_type)
+            return
+
+        choices = getattr(chunk, "choices", None)
+        if choices is None:
+            return
+        self.provider = "openai"
+        if self.model == "unknown" and getattr(chunk, "model", None):
+            self.model = chunk.model
+        for choice in choices:
+            delta = choice.delta
+            if delta is not None and (delta.content or getattr(delta, "tool_calls", None)):
+                self._token()
+                break
+        usage = getattr(chunk, "usage", None)
+        if usage is not None:
+            self.prompt_tokens = usage.prompt_tokens
+            self.completion_tokens = usage.completion_tokens
+
+    def _add_anthropic(self, chunk: Any, event_type: str):
+        self.provider = "anthropic"
+        if event_type == "content_block_delta":
+            self._token()
+        elif event_type == "message_start":
+            message = chunk.message
+            self.model = message.model
+            self.prompt_tokens = message.usage.input_tokens
+            self.completion_tokens = message.usage.output_tokens
+        elif event_type == "message_delta":
+            # output_tokens is cumulative
+            self.completion_tokens = chunk.usage.output_tokens
+
+    def _token(self):
+        self.content_chunks += 1
+        if self.first_token_time is None:
+            self.first_token_time = time.time()
+
+    def finish(self):
+        if self.end_time is None:
+            self.end_time = time.time()
+
+    @property
+    def output_tokens(self) -> int:
+        if self.completion_tokens is None:
+            return self.content_chunks
+        return self.completion_tokens
+
+    @property
+    def latency_ms(self) -> int:
+        return int(((self.end_time or time.time()) - self.start_time) * 1000)
+
+    @property
+    def ttft_ms(self) -> Optional[int]:
+        """Time to first token, from the start of the request"""
+        if self.first_token_time is None:
+            return None
+        return int((self.first_token_time - self.start_time) * 1000)
+
+    @property
+    def generation_ms(self) -> Optional[int]:
+        """Time from the first token to the end of the stream"""
+        if self.first_token_time is None:
+            return None
+        return int(((self.end_time or time.time()) - self.first_token_time) * 1000)
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """Output tokens per second of generation, after the first token"""
+        if self.first_token_time is None:
+            return None
+        seconds = (self.end_time or time.time()) - self.first_token_time
+        if seconds <= 0:
+            return None
+        return round(self.output_tokens / seconds, 3)
+
+    def adapter(self) -> ProviderAdapter:
+        """Adapter pricing the provider that sent the stream"""
+        return _ANTHROPIC if self.provider == "anthropic" else _OPENAI
+
+    def usage(self) -> Dict[str, Any]:
+        """Usage in the shape returned by ``ProviderAdapter.extract_usage``"""
+        return {
+            "model": self.model,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.output_tokens,
+            "total_tokens": self.prompt_tokens + self.output_tokens,
+        }
+
+
+_OPENAI = OpenAIAdapter()
+_ANTHROPIC = AnthropicAdapter()
+
+
+def _record(usage: StreamUsage, on_finish: Callable[[StreamUsage], None]):
+    """Stop the clock and hand the usage to ``on_finish``"""
+    usage.finish()
+    try:
+        on_finish(usage)
+    except Exception:
+        # Silent failure - don't break user's code
+        pass
+
+
+class ObservedStream:
+    """
+    Pass-through wrapper around a synchronous provider stream
+
+    Chunks are yielded exactly as the provider produced them. ``on_finish``
+    is called once with the ``StreamUsage`` when the stream is exhausted,
+    fails, or is closed early. A stream left partly read without being
+    closed (a ``break`` out of the loop) is recorded when it is garbage
+    collected, which in CPython is as soon as the last reference goes.
+    Any other attribute is read from the wrapped stream.
+    """
+
+    def __init__(self, stream: Any, usage: StreamUsage, on_finish: Callable[[StreamUsage], None]):
+        self._stream = stream
+        self._iterator = iter(stream)
+        self._usage = usage
+        # Runs once: at the end of the stream, on close, or when a stream
+        # abandoned without either is garbage collected
+        self._finish = weakref.finalize(self, _record, usage, on_finish)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            chunk = next(self._iterator)
+        except BaseException:
+            self._finish()
+            raise
+        self._usage.add(chunk)
+        return chunk
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def close(self):
+        """Close the underlying stream and record what was received"""
+        try:
+            close = getattr(self._stream, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self._finish()
+
+    def __getattr__(self, name: str):
+        return getattr(self._stream, name)
+
+
+class AsyncObservedStream:
+    """Pass-through wrapper around an asynchronous provider stream, recorded like ``ObservedStream``"""
+
+    def __init__(self, stream: Any, usage: StreamUsage, on_finish: Callable[[StreamUsage], None]):
+        self._stream = stream
+        self._iterator = stream.__aiter__()
+        self._usage = usage
+        self._finish = weakref.finalize(self, _record, usage, on_finish)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            chunk = await self._iterator.__anext__()
+        except BaseException:
+            self._finish()
+            raise
+        self._usage.add(chunk)
+        return chunk
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+        return False
+
+    async def close(self):
+        """Close the underlying stream and record what was received"""
+        try:
+            close = getattr(self._stream, "close", None) or getattr(self._stream, "aclose", None)
+            if close is not None:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+        finally:
+            self._finish()
+
+    def __getattr__(self, name: str):
+        return getattr(self._stream, name)
+
+
+def wrap_stream(stream: Any, start_time: float, on_finish: Callable[[StreamUsage], None]) -> Any:
+    """Wrap a sync or async stream, picking the wrapper by the iteration protocol it supports"""
+    usage = StreamUsage(start_time)
+    if hasattr(stream, "__aiter__"):
+        return AsyncObservedStream(stream, usage, on_finish)
+    return ObservedStream(stream, usage, on_finish)
@@ -0,0 +1,100 @@
+"""Trace and span context for AI Observer SDK"""
+
+import contextvars
+import functools
+import os
+from typing import Any, Callable, Optional, Tuple
+
+# (trace_id, span_id, parent_span_id) sent with an event
+SpanIds = Tuple[Optional[str], Optional[str], Optional[str]]
+
+NO_SPAN: SpanIds = (None, None, None)
+
+
+class SpanContext:
+    """Identifies the span that events recorded in the current context belong to"""
+
+    __slots__ = ("trace_id", "span_id", "children")
+
+    def __init__(self, trace_id: str, span_id: str):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        # Spans and events started under this span so far
+        self.children = 0
+
+    def __repr__(self) -> str:
+        return f"SpanContext(trace_id={self.trace_id!r}, span_id={self.span_id!r})"
+
+
+_current_span: contextvars.ContextVar[Optional[SpanContext]] = contextvars.ContextVar(
+    "ai_observer_span", default=None
+)
+
+
+def new_trace_id() -> str:
+    """Random 128-bit trace id as 32 hex digits"""
+    return os.urandom(16).hex()
+
+
+def new_span_id() -> str:
+    """Random 64-bit span id as 16 hex digits"""
+    return os.urandom(8).hex()
+
+
+def current_span() -> Optional[SpanContext]:
+    """
+    The innermost ``observe()`` / ``@traced`` span open in this context
+
+    Spans live in a context variable, so asyncio tasks inherit the span
+    that was open when they were created. Plain threads start without
+    one; hand them work through ``propagate()``.
+    """
+    return _current_span.get()
+
+
+def child_of(parent: Optional[SpanContext]) -> SpanIds:
+    """Ids for a new span under ``parent``; no ids without a parent"""
+    if parent is None:
+        return NO_SPAN
+    parent.children += 1
+    return parent.trace_id, new_span_id(), parent.span_id
+
+
+def enter_span(span: SpanContext) -> contextvars.Token:
+    """Make ``span`` the current span; returns the token for ``exit_span()``"""
+    return _current_span.set(span)
+
+
+def exit_span(token: contextvars.Token):
+    """Restore the span that was current before ``enter_span()``"""
+    try:
+        _current_span.reset(token)
+    except ValueError:
+        # Left in another context than it was entered in, e.g. an async
+        # generator finished by a different task
+        previous = token.old_value
+        _current_span.set(None if previous is contextvars.Token.MISSING else previous)
+
+
+def propagate(func: Callable) -> Callable:
+    """
+    Wrap ``func`` to run in a copy of the current context
+
+    The context is captured when ``propagate()`` is called, so work
+    submitted to threads (``threading.Thread``, ``ThreadPoolExecutor``,
+    ``loop.run_in_executor``) joins the caller's trace as a child of its
+    current span.
+
+    Example:
+        with observe(project="rag-app", agent="orchestrator"):
+            with ThreadPoolExecutor() as pool:
+                pool.submit(ai_observer.propagate(retrieve), query)
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def run(*args: Any, **kwargs: Any) -> Any:
+        # A fresh copy per call, so the wrapper can run in several threads at once
+        return context.copy().run(func, *args, **kwargs)
+
+    return run
@@ -0,0 +1,348 @@
+"""HTTP transport for AI Observer SDK"""
+
+import gzip
+import importlib
+import json
+import os
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from .config import get_config
+
+if TYPE_CHECKING:
+    import requests
+
+
+# Collector responses meaning "not now", besides any 5xx
+UNAVAILABLE_STATUSES = (408, 429)
+
+# Collector response to a msgpack or compressed body from a collector that
+# only understands plain JSON. A 422 is an ordinary validation error of one
+# batch and says nothing about the encoding.
+UNSUPPORTED_BODY_STATUS = 415
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def is_unavailable(status_code: int) -> bool:
+    """Whether a collector response means the request should be retried later"""
+    return status_code in UNAVAILABLE_STATUSES or status_code >= 500
+
+
+def _optional_module(name: str):
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+def encode_body(payload: Any, wire_format: str = "json", compression: str = "none") -> Tuple[bytes, Dict[str, str]]:
+    """
+    Serialize and compress a payload for the collector
+
+    Returns the request body and its Content-Type/Content-Encoding headers.
+    msgpack needs the ``msgpack`` package and zstd the ``zstandard``
+    package (``pip install ai-cost-observatory[msgpack]``); without them
+    the body falls back to JSON and gzip respectively.
+    """
+    msgpack = _optional_module("msgpack") if wire_format == "msgpack" else None
+    if msgpack is not None:
+        body = msgpack.packb(payload, use_bin_type=True, default=str)
+        headers = {"Content-Type": "application/msgpack"}
+    else:
+        body = json.dumps(payload, separators=(",", ":"), default=str).encode()
+        headers = {"Content-Type": "application/json"}
+
+    zstandard = _optional_module("zstandard") if compression == "zstd" else None
+    if zstandard is not None:
+        body = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+        headers["Content-Encoding"] = "zstd"
+    elif compression in ("gzip", "zstd"):
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        headers["Content-Encoding"] = "gzip"
+    return body, headers
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending while the collector's circuit is open"""
+
+    def __init__(self, url: str, retry_after: float):
+        super().__init__(f"Circuit open for {url}; next attempt in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Stops sending to a collector that keeps failing
+
+    After ``threshold`` consecutive failures the circuit opens and every
+    send fails immediately instead of waiting on the network. Once the
+    open period is over a single half-open probe is let through: success
+    closes the circuit, failure opens it again for twice as long (up to
+    ``max_backoff``). Open periods are jittered so that many processes
+    recovering from the same outage do not probe in lockstep.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold: int = 5, backoff: float = 1.0, max_backoff: float = 60.0):
+        self.threshold = threshold
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self.short_circuited = 0
+        self._reopen_count = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now; moves an expired open circuit to half-open"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() >= self._open_until:
+                # This caller becomes the probe
+                self.state = self.HALF_OPEN
+                return True
+            self.short_circuited += 1
+            return False
+
+    def retry_after(self) -> float:
+        """Seconds until the next request will be let through"""
+        if self.state == self.CLOSED:
+            return 0.0
+        return max(0.0, self._open_until - time.monotonic())
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._reopen_count = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.threshold:
+                self._open()
+
+    def _open(self):
+        """Open the circuit for a jittered, exponentially growing period"""
+        delay = min(self.max_backoff, self.backoff * 2 ** self._reopen_count)
+        self._open_until = time.monotonic() + delay / 2 + random.uniform(0, delay / 2)
+        self._reopen_count += 1
+        self.times_opened += 1
+        self.state = self.OPEN
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "short_circuited": self.short_circuited,
+            "retry_after": round(self.retry_after(), 3),
+        }
+
+
+class HTTPTransport:
+    """
+    Keep-alive connection pool for talking to the collector
+
+    Wraps a ``requests.Session`` whose adapters keep up to ``pool_size``
+    connections per host open between sends, so events do not pay for a
+    new TCP/TLS handshake each time. The underlying urllib3 pool is
+    thread-safe and may be shared by every thread in the process.
+
+    Only failures to connect are retried here, since the request cannot
+    have reached the collector. A POST that fails after it was sent (a
+    read timeout or an error status) may already have been stored, so it
+    is left to the exporter, which sends it again only if the collector
+    can recognise it as a duplicate.
+    """
+
+    def __init__(self, pool_size: int = 10, max_retries: int = 3, retry_backoff: float = 0.5):
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.pid = os.getpid()
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.json_only: Set[str] = set()
+        self._breakers_lock = threading.Lock()
+
+        # requests costs more to import than the rest of the SDK together,
+        # so it is loaded with the first transport rather than with the package
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,
+            status=0,
+            other=0,
+            backoff_factor=retry_backoff,
+            allowed_methods=frozenset({"POST"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=retry,
+        )
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post(self, url: str, json: Any) -> "requests.Response":
+        """
+        POST a payload to the collector
+
+        The body is encoded per the ``wire_format`` and ``compression``
+        settings. A collector that rejects that encoding with 415 is
+        remembered and sent plain JSON from then on.
+
+        Raises ``CircuitOpenError`` without touching the network while the
+        collector's circuit is open.
+        """
+        breaker = self.breaker_for(url)
+        if not breaker.allow():
+            raise CircuitOpenError(url, breaker.retry_after())
+
+        config = get_config()
+        headers = {"Authorization": f"Bearer {config.api_key}"} if config.api_key else {}
+        timeout = (config.connect_timeout, config.timeout)
+        collector = self._collector(url)
+        encoded = (
+            collector not in self.json_only
+            and (config.wire_format != "json" or config.compression != "none")
+        )
+
+        try:
+            if encoded:
+                body, body_headers = encode_body(json, config.wire_format, config.compression)
+                response = self.session.post(
+                    url,
+                    data=body,
+                    headers={**headers, **body_headers},
+                    timeout=timeout,
+                )
+                if response.status_code == UNSUPPORTED_BODY_STATUS:
+                    self.json_only.add(collector)
+                    encoded = False
+            if not encoded:
+                response = self.session.post(
+                    url,
+                    json=json,
+                    headers=headers,
+                    timeout=timeout,
+                )
+        except Exception:
+            breaker.record_failure()
+            raise
+
+        if is_unavailable(response.status_code):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    def breaker_for(self, url: str) -> CircuitBreaker:
+        """Circuit breaker for the collector serving ``url``"""
+        collector = self._collector(url)
+        breaker = self.breakers.get(collector)
+        if breaker is None:
+            with self._breakers_lock:
+                breaker = self.breakers.get(collector)
+                if breaker is None:
+                    config = get_config()
+                    breaker = self.breakers[collector] = CircuitBreaker(
+                        threshold=config.breaker_threshold,
+                        backoff=config.breaker_backoff,
+                        max_backoff=config.breaker_max_backoff,
+                    )
+        return breaker
+
+    @staticmethod
+    def _collector(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def close(self):
+        """Close all pooled connections"""
+        self.session.close()
+
+
+_transport: Optional[HTTPTransport] = None
+_transport_key: Optional[Tuple[Any, ...]] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> HTTPTransport:
+    """
+    Get the process-wide transport, creating it on first use
+
+    The pool and its circuit breakers are rebuilt when their settings
+    change through ``configure()`` and whenever the current process is not
+    the one that created them, so a forked child never reuses sockets
+    inherited from its parent.
+    """
+    global _transport, _transport_key
+
+    config = get_config()
+    key = (
+        os.getpid(),
+        config.pool_size,
+        config.max_retries,
+        config.retry_backoff,
+        config.breaker_threshold,
+        config.breaker_backoff,
+        config.breaker_max_backoff,
+    )
+    transport = _transport
+    if transport is not None and _transport_key == key:
+        return transport
+
+    with _transport_lock:
+        if _transport is not None and _transport_key == key:
+            return _transport
+
+        if _transport is not None and _transport.pid == os.getpid():
+            _transport.close()
+
+        _transport = HTTPTransport(
+            pool_size=config.pool_size,
+            max_retries=config.max_retries,
+            retry_backoff=config.retry_backoff,
+        )
+        _transport_key = key
+        return _transport
+
+
+def __getattr__(name: str):
+    # ``ai_observer.transport.requests`` stays reachable (e.g. as a patch
+    # target in tests) without importing requests along with the module
+    if name == "requests":
+        return importlib.import_module("requests")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _reset_after_fork():
+    """Drop the parent's pool in a forked child without closing its sockets"""
+    global _transport, _transport_key, _transport_lock
+
+    _transport = None
+    _transport_key = None
+    _transport_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -22,12 +22,13 @@ setup(
     packages=find_packages(),
     install_requires=[
         "requests>=2.31.0",
-        "openai>=1.0.0",
-        "anthropic>=0.7.0",
     ],
     extras_require={
+        "openai": ["openai>=1.0.0"],
+        "anthropic": ["anthropic>=0.7.0"],
         "langchain": ["langchain>=0.1.0", "langchain-openai>=0.0.2"],
         "llamaindex": ["llama-index>=0.9.0"],
+        "msgpack": ["msgpack>=1.0.0", "zstandard>=0.22.0"],
         "dev": [
             "pytest>=7.0.0",
             "pytest-cov>=4.0.0",
@@ -1,11 +1,17 @@
 """Main FastAPI application"""
 
 import os
+import base64
 from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import insert, select, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Any, Callable, List, Literal, Optional, Set, Tuple
 import uuid
 
 import sys
@@ -13,15 +19,27 @@ from pathlib import Path
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from database import get_db, init_db
-from models.database import Event, Cost, RetrievalMetric, ModelPricing, DailyAggregate
+from api.wire import decoded_body, request_body
+from database import SessionLocal, get_db, init_models
+from models.database import Event, Cost, RetrievalMetric, ModelPricing, DailyAggregate, MinuteAggregate, SdkStat, Span
 from models.schemas import (
     EventCreate,
+    RollupCreate,
+    SdkStatsCreate,
+    SdkStatsResponse,
+    SpanCreate,
+    RetrievalCreate,
+    TraceResponse,
     EventResponse,
+    EventPage,
+    BatchItemResult,
+    BatchResponse,
     DashboardOverview,
     CostStats,
     ModelStats,
     AgentStats,
+    ModelLatencyStats,
+    AgentLatencyStats,
     TimeSeriesPoint,
     ForecastResponse,
     OptimizationSuggestion,
@@ -29,6 +47,9 @@ from models.schemas import (
 from services.analytics import AnalyticsService
 from services.forecasting import ForecastingService
 from services.optimization import OptimizationService
+from services.rollups import apply_rollups, apply_minute_rollups, claim_minute_rows, merge_minute_rows, rollup_deltas
+from services.export import ExportService, EXPORT_BATCH_SIZE, EXPORT_MEDIA_TYPES, export_query
+from services.traces import TraceService
 
 # Create FastAPI app
 app = FastAPI(
@@ -50,12 +71,14 @@ app.add_middleware(
 analytics_service = AnalyticsService()
 forecasting_service = ForecastingService()
 optimization_service = OptimizationService()
+export_service = ExportService()
+trace_service = TraceService()
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize database on startup"""
-    init_db()
+    await init_models()
     print("AI Cost Observatory API started successfully!")
 
 
@@ -75,130 +98,524 @@ async def health_check():
     return {"status": "healthy"}
 
 
-@app.post("/events", response_model=dict)
-async def create_event(event: EventCreate, db: Session = Depends(get_db)):
+def _build_rows(event: EventCreate) -> Tuple[dict, Optional[dict], Optional[dict]]:
+    """Convert an incoming event into event, cost and retrieval rows"""
+    event_id = uuid.UUID(event.event_id) if event.event_id else uuid.uuid4()
+    timestamp = event.timestamp or datetime.utcnow()
+    
+    # Calculate total tokens if not provided
+    total_tokens = event.total_tokens or (event.prompt_tokens + event.completion_tokens)
+    
+    tokens_per_second = event.tokens_per_second
+    if tokens_per_second is None and event.generation_ms:
+        tokens_per_second = round(event.completion_tokens / (event.generation_ms / 1000), 3)
+    
+    event_row = {
+        "id": event_id,
+        "timestamp": timestamp,
+        "event_type": event.event_type,
+        "model": event.model,
+        "prompt_tokens": event.prompt_tokens,
+        "completion_tokens": event.completion_tokens,
+        "total_tokens": total_tokens,
+        "latency_ms": event.latency_ms,
+        "ttft_ms": event.ttft_ms,
+        "generation_ms": event.generation_ms,
+        "tokens_per_second": tokens_per_second,
+        "project": event.project,
+        "agent": event.agent,
+        "step": event.step,
+        "user_id": event.user_id,
+        "tags": event.tags,
+        "sample_weight": event.sample_weight,
+        "trace_id": event.trace_id,
+        "span_id": event.span_id,
+        "parent_span_id": event.parent_span_id,
+    }
+    
+    # Create cost record if provided
+    cost_row = None
+    if event.input_cost > 0 or event.output_cost > 0 or event.total_cost > 0:
+        cost_row = {
+            "id": uuid.uuid4(),
+            "event_id": event_id,
+            "input_cost": event.input_cost,
+            "output_cost": event.output_cost,
+            "total_cost": event.total_cost,
+            "currency": event.currency,
+        }
+    
+    # Create retrieval metrics if provided
+    retrieval_row = None
+    if event.chunks is not None or event.context_tokens is not None:
+        retrieval_row = {
+            "id": uuid.uuid4(),
+            "event_id": event_id,
+            "chunks": event.chunks or 0,
+            "context_tokens": event.context_tokens or 0,
+            "source": event.source,
+        }
+    
+    return event_row, cost_row, retrieval_row
+
+
+def _build_minute_row(rollup: RollupCreate) -> dict:
+    """Convert a client-side rollup into a minute_aggregates row"""
+    return {
+        "id": uuid.uuid4(),
+        "minute": rollup.timestamp.replace(second=0, microsecond=0),
+        "project": rollup.project or "",
+        "agent": rollup.agent or "",
+        "step": rollup.step or "",
+        "model": rollup.model,
+        "total_requests": rollup.requests,
+        "total_tokens": rollup.total_tokens or (rollup.prompt_tokens + rollup.completion_tokens),
+        "prompt_tokens": rollup.prompt_tokens,
+        "completion_tokens": rollup.completion_tokens,
+        "input_cost": rollup.input_cost,
+        "output_cost": rollup.output_cost,
+        "total_cost": rollup.total_cost,
+        "total_latency_ms": rollup.latency_sum_ms,
+        "min_latency_ms": rollup.latency_min_ms,
+        "max_latency_ms": rollup.latency_max_ms,
+        "large_prompt_requests": rollup.large_prompt_requests,
+        "large_prompt_cost": rollup.large_prompt_cost,
+        "rollup_id": rollup.rollup_id,
+    }
+
+
+def _build_stats_row(report: SdkStatsCreate) -> dict:
+    """Convert an SDK self-metrics report into an sdk_stats row"""
+    return {
+        "id": uuid.uuid4(),
+        "timestamp": report.timestamp or datetime.utcnow(),
+        "client_id": report.client_id,
+        "stats": report.stats,
+    }
+
+
+def _build_span_row(span: SpanCreate) -> dict:
+    """Convert a finished traced block into a spans row"""
+    return {
+        "id": uuid.uuid4(),
+        "trace_id": span.trace_id,
+        "span_id": span.span_id,
+        "parent_span_id": span.parent_span_id,
+        "kind": "span",
+        "name": span.name,
+        "start_time": span.timestamp,
+        "duration_ms": span.duration_ms,
+        "status": span.status,
+        "project": span.project,
+        "agent": span.agent,
+        "step": span.step,
+        "user_id": span.user_id,
+        "attributes": span.tags,
+    }
+
+
+def _build_retrieval_row(retrieval: RetrievalCreate) -> dict:
+    """Convert a RAG retrieval into a spans row"""
+    end = retrieval.timestamp or datetime.utcnow()
+    # Outside a trace the ids come from the event id, so a retrieval sent twice is stored once
+    key = uuid.UUID(retrieval.event_id).hex if retrieval.event_id else uuid.uuid4().hex
+    return {
+        "id": uuid.uuid4(),
+        "trace_id": retrieval.trace_id or key,
+        "span_id": retrieval.span_id or key[:16],
+        "parent_span_id": retrieval.parent_span_id,
+        "kind": "retrieval",
+        "name": retrieval.source or "retrieval",
+        "start_time": end - timedelta(milliseconds=retrieval.latency_ms),
+        "duration_ms": float(retrieval.latency_ms),
+        "status": "ok",
+        "project": retrieval.project,
+        "attributes": {
+            **retrieval.tags,
+            "chunks": retrieval.chunks,
+            "context_tokens": retrieval.context_tokens,
+            "source": retrieval.source,
+        },
+    }
+
+
+def _unseen(rows: List[Any], key: Callable[[Any], Any], seen: Set[Any]) -> List[Any]:
+    """Rows whose key is not in ``seen`` and not repeated earlier in ``rows``"""
+    unseen = []
+    for row in rows:
+        row_key = key(row)
+        if row_key not in seen:
+            seen.add(row_key)
+            unseen.append(row)
+    return unseen
+
+
+async def _insert_rows(
+    db: AsyncSession,
+    rows: List[Tuple[dict, Optional[dict], Optional[dict]]],
+    side_rows: Optional[List[Tuple[Any, dict]]] = None,
+):
+    """
+    Insert events with their costs and retrieval metrics as multi-row inserts
+    
+    ``side_rows`` are (table, row) pairs for everything that is not an
+    event. Client-side minute rollups are merged into minute_aggregates,
+    and daily rollups are updated, in the same transaction. SDK
+    self-metrics and trace spans go to sdk_stats and spans and are not part
+    of any aggregate.
+    
+    The SDK sends events, spans and rollups again when it cannot tell
+    whether the collector stored them, so those already stored (by event
+    id, by trace and span id, by rollup id) are skipped, not inserted twice.
+    """
+    side_rows = side_rows or []
+    if rows:
+        stored = set((await db.execute(
+            select(Event.id).where(Event.id.in_([event_row["id"] for event_row, _, _ in rows]))
+        )).scalars())
+        rows = _unseen(rows, lambda row: row[0]["id"], stored)
+    span_rows = [row for table, row in side_rows if table is Span]
+    if span_rows:
+        stored = {tuple(key) for key in await db.execute(
+            select(Span.trace_id, Span.span_id).where(Span.trace_id.in_({row["trace_id"] for row in span_rows}))
+        )}
+        span_rows = _unseen(span_rows, lambda row: (row["trace_id"], row["span_id"]), stored)
+    minute_rows = merge_minute_rows(
+        await claim_minute_rows(db, [row for table, row in side_rows if table is MinuteAggregate])
+    )
+    event_rows = [event_row for event_row, _, _ in rows]
+    cost_rows = [cost_row for _, cost_row, _ in rows if cost_row]
+    retrieval_rows = [retrieval_row for _, _, retrieval_row in rows if retrieval_row]
+    
+    if event_rows:
+        await db.execute(insert(Event), event_rows)
+    if cost_rows:
+        await db.execute(insert(Cost), cost_rows)
+    if retrieval_rows:
+        await db.execute(insert(RetrievalMetric), retrieval_rows)
+    stats_rows = [row for table, row in side_rows if table is SdkStat]
+    if stats_rows:
+        await db.execute(insert(SdkStat), stats_rows)
+    if span_rows:
+        await db.execute(insert(Span), span_rows)
+    
+    await apply_minute_rollups(db, minute_rows)
+    
+    # Keep daily rollups in step with the raw events
+    await apply_rollups(db, rollup_deltas(event_rows, cost_rows, minute_rows))
+
+
+@app.post("/events", response_model=dict, openapi_extra=request_body(EventCreate.model_json_schema()))
+async def create_event(payload: Any = Depends(decoded_body), db: AsyncSession = Depends(get_db)):
     """
     Create a new event
     
     This endpoint receives events from the SDK and stores them in the database.
+    The body is JSON or msgpack, optionally gzip- or zstd-compressed.
     """
     try:
-        # Create event record
-        event_id = uuid.UUID(event.event_id) if event.event_id else uuid.uuid4()
-        timestamp = event.timestamp or datetime.utcnow()
+        event = EventCreate.model_validate(payload)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    
+    try:
+        rows = _build_rows(event)
+        await _insert_rows(db, [rows])
+        await db.commit()
         
-        # Calculate total tokens if not provided
-        total_tokens = event.total_tokens or (event.prompt_tokens + event.completion_tokens)
+        return {"status": "success", "event_id": str(rows[0]["id"])}
         
-        db_event = Event(
-            id=event_id,
-            timestamp=timestamp,
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post(
+    "/events/batch",
+    response_model=BatchResponse,
+    openapi_extra=request_body({"type": "array", "items": {"type": "object"}}),
+)
+async def create_events_batch(
+    events: Any = Depends(decoded_body),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Create many events in one request
+    
+    Valid events are written with multi-row inserts in a single transaction.
+    If that fails, events are retried one by one inside savepoints so a bad
+    event only rejects itself. The response reports the status of every item.
+    
+    Items with ``event_type: "rollup"`` are per-minute rollups from SDK
+    clients in aggregation mode; they are merged into the aggregates
+    instead of being stored as events. Items with ``event_type:
+    "sdk_stats"`` are the SDK's reports on its own delivery health; they
+    are stored apart and never counted in aggregates. Items with
+    ``event_type: "span"`` (traced blocks) and ``"retrieval"`` are stored as
+    trace spans.
+    
+    The body is a JSON or msgpack array, optionally gzip- or zstd-compressed.
+    """
+    if not isinstance(events, list):
+        raise HTTPException(status_code=422, detail="Expected an array of events")
+    
+    results: List[BatchItemResult] = []
+    pending: List[Tuple[int, Optional[Tuple[dict, Optional[dict], Optional[dict]]], Optional[Tuple[Any, dict]]]] = []
+    
+    for index, item in enumerate(events):
+        try:
+            event_type = item.get("event_type")
+            if event_type == "rollup":
+                pending.append((index, None, (MinuteAggregate, _build_minute_row(RollupCreate.model_validate(item)))))
+            elif event_type == "sdk_stats":
+                pending.append((index, None, (SdkStat, _build_stats_row(SdkStatsCreate.model_validate(item)))))
+            elif event_type == "span":
+                pending.append((index, None, (Span, _build_span_row(SpanCreate.model_validate(item)))))
+            elif event_type == "retrieval":
+                pending.append((index, None, (Span, _build_retrieval_row(RetrievalCreate.model_validate(item)))))
+            else:
+                pending.append((index, _build_rows(EventCreate.model_validate(item)), None))
+        except (ValidationError, ValueError, TypeError, AttributeError) as e:
+            results.append(BatchItemResult(index=index, status="error", error=str(e)))
+    
+    def result(index, rows, error=None):
+        event_id = str(rows[0]["id"]) if rows else None
+        if error is None:
+            return BatchItemResult(index=index, status="success", event_id=event_id)
+        return BatchItemResult(index=index, status="error", event_id=event_id, error=error)
+    
+    try:
+        await _insert_rows(
+            db,
+            [rows for _, rows, _ in pending if rows],
+            [side_row for _, _, side_row in pending if side_row],
+        )
+        await db.commit()
+        results.extend(result(index, rows) for index, rows, _ in pending)
+    except Exception:
+        await db.rollback()
+        for index, rows, side_row in pending:
+            savepoint = await db.begin_nested()
+            try:
+                await _insert_rows(db, [rows] if rows else [], [side_row] if side_row else [])
+                await savepoint.commit()
+                results.append(result(index, rows))
+            except Exception as e:
+                await savepoint.rollback()
+                results.append(result(index, rows, str(e)))
+        await db.commit()
+    
+    results.sort(key=lambda r: r.index)
+    accepted = sum(1 for r in results if r.status == "success")
+    
+    return BatchResponse(
+        accepted=accepted,
+        rejected=len(results) - accepted,
+        results=results,
+    )
+
+
+def _encode_cursor(timestamp: datetime, event_id: uuid.UUID) -> str:
+    """Opaque cursor pointing just after (timestamp, id)"""
+    raw = f"{timestamp.isoformat()}|{event_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Inverse of _encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, event_id = raw.split("|")
+        return datetime.fromisoformat(timestamp), uuid.UUID(event_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _filter_events(
+    query: Select,
+    project: Optional[str] = None,
+    agent: Optional[str] = None,
+    model: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> Select:
+    """Apply the /events filters to an events query"""
+    if project:
+        query = query.where(Event.project == project)
+    if agent:
+        query = query.where(Event.agent == agent)
+    if model:
+        query = query.where(Event.model == model)
+    if start_date:
+        query = query.where(Event.timestamp >= start_date)
+    if end_date:
+        query = query.where(Event.timestamp <= end_date)
+    return query
+
+
+@app.get("/events", response_model=EventPage)
+async def get_events(
+    project: Optional[str] = None,
+    agent: Optional[str] = None,
+    model: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Get events with filtering, newest first
+    
+    Uses keyset pagination on (timestamp, id): pass the returned
+    ``next_cursor`` back as ``cursor`` to fetch the following page. Every
+    page costs the same no matter how deep it is.
+    """
+    query = _filter_events(
+        select(Event, func.coalesce(Cost.total_cost, 0.0)).outerjoin(Cost, Cost.event_id == Event.id),
+        project,
+        agent,
+        model,
+        start_date,
+        end_date,
+    )
+    if cursor:
+        query = query.where(tuple_(Event.timestamp, Event.id) < tuple_(*_decode_cursor(cursor)))
+    
+    # Fetch one extra row to know whether another page exists
+    query = query.order_by(Event.timestamp.desc(), Event.id.desc()).limit(limit + 1)
+    rows = (await db.execute(query)).all()
+    
+    items = [
+        EventResponse(
+            id=event.id,
+            timestamp=event.timestamp,
             event_type=event.event_type,
             model=event.model,
             prompt_tokens=event.prompt_tokens,
             completion_tokens=event.completion_tokens,
-            total_tokens=total_tokens,
+            total_tokens=event.total_tokens,
             latency_ms=event.latency_ms,
+            ttft_ms=event.ttft_ms,
+            generation_ms=event.generation_ms,
+            tokens_per_second=event.tokens_per_second,
             project=event.project,
             agent=event.agent,
             step=event.step,
             user_id=event.user_id,
             tags=event.tags,
+            sample_weight=event.sample_weight,
+            total_cost=total_cost,
+            trace_id=event.trace_id,
+            span_id=event.span_id,
+            parent_span_id=event.parent_span_id,
         )
-        db.add(db_event)
-        
-        # Create cost record if provided
-        if event.input_cost > 0 or event.output_cost > 0 or event.total_cost > 0:
-            db_cost = Cost(
-                event_id=event_id,
-                input_cost=event.input_cost,
-                output_cost=event.output_cost,
-                total_cost=event.total_cost,
-                currency=event.currency,
-            )
-            db.add(db_cost)
-        
-        # Create retrieval metrics if provided
-        if event.chunks is not None or event.context_tokens is not None:
-            db_retrieval = RetrievalMetric(
-                event_id=event_id,
-                chunks=event.chunks or 0,
-                context_tokens=event.context_tokens or 0,
-                source=event.source,
-            )
-            db.add(db_retrieval)
-        
-        db.commit()
-        
-        return {"status": "success", "event_id": str(event_id)}
-        
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
+        for event, total_cost in rows[:limit]
+    ]
+    
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1][0]
+        next_cursor = _encode_cursor(last.timestamp, last.id)
+    
+    return EventPage(items=items, next_cursor=next_cursor)
 
 
-@app.get("/events", response_model=List[EventResponse])
-async def get_events(
+@app.get("/events/export")
+async def export_events(
+    format: Literal["csv", "ndjson", "parquet"] = "csv",
     project: Optional[str] = None,
     agent: Optional[str] = None,
     model: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    limit: int = Query(100, le=1000),
-    offset: int = 0,
-    db: Session = Depends(get_db),
 ):
     """
-    Get events with filtering
+    Stream every matching event with its cost, oldest first
+    
+    Takes the same filters as ``GET /events``. Rows are read through a
+    server-side cursor and encoded batch by batch, so memory stays flat no
+    matter how many events are exported.
     """
-    query = db.query(Event)
+    query = _filter_events(export_query(), project, agent, model, start_date, end_date)
     
-    if project:
-        query = query.filter(Event.project == project)
-    if agent:
-        query = query.filter(Event.agent == agent)
-    if model:
-        query = query.filter(Event.model == model)
-    if start_date:
-        query = query.filter(Event.timestamp >= start_date)
-    if end_date:
-        query = query.filter(Event.timestamp <= end_date)
-    
-    events = query.order_by(Event.timestamp.desc()).limit(limit).offset(offset).all()
-    
-    # Add cost information
-    result = []
-    for event in events:
-        event_dict = {
-            "id": event.id,
-            "timestamp": event.timestamp,
-            "event_type": event.event_type,
-            "model": event.model,
-            "prompt_tokens": event.prompt_tokens,
-            "completion_tokens": event.completion_tokens,
-            "total_tokens": event.total_tokens,
-            "latency_ms": event.latency_ms,
-            "project": event.project,
-            "agent": event.agent,
-            "step": event.step,
-            "user_id": event.user_id,
-            "tags": event.tags,
-            "total_cost": event.cost.total_cost if event.cost else 0.0,
-        }
-        result.append(EventResponse(**event_dict))
+    async def batches():
+        # The request-scoped session is closed before the body is streamed,
+        # so the export holds its own for as long as it runs
+        async with SessionLocal() as db:
+            result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            async for rows in result.partitions():
+                yield rows
+    
+    return StreamingResponse(
+        export_service.encode(batches(), format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="events.{format}"'},
+    )
+
+
+@app.get("/traces/{trace_id}", response_model=TraceResponse)
+async def get_trace(trace_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    Span tree of one trace
+    
+    Nested ``observe()`` / ``@traced`` blocks, their LLM calls and
+    retrievals, with each span's self time (not covered by its children),
+    time in its own LLM call and time on the critical path. The trace also
+    reports wall time inside and outside LLM calls and the critical path as
+    a list of segments.
+    """
+    trace = await trace_service.get_trace(db, trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return trace
+
+
+@app.get("/sdk/stats", response_model=List[SdkStatsResponse])
+async def get_sdk_stats(
+    client_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Latest delivery stats reported by each SDK client
     
-    return result
+    One entry per client (``host:pid``) with the most recent ``sdk_stats``
+    report: queue depth, events sent, dropped and retried, bytes sent and
+    the flush latency histogram. ``since`` leaves out clients that have
+    not reported since then.
+    """
+    latest = select(SdkStat.client_id, func.max(SdkStat.timestamp).label("timestamp")).group_by(SdkStat.client_id)
+    if client_id:
+        latest = latest.where(SdkStat.client_id == client_id)
+    if since:
+        latest = latest.where(SdkStat.timestamp >= since)
+    latest = latest.subquery()
+    
+    query = (
+        select(SdkStat)
+        .join(latest, (SdkStat.client_id == latest.c.client_id) & (SdkStat.timestamp == latest.c.timestamp))
+        .order_by(SdkStat.client_id)
+    )
+    reports = {}
+    for report in (await db.execute(query)).scalars():
+        reports.setdefault(report.client_id, report)
+    
+    return [
+        SdkStatsResponse(client_id=report.client_id, timestamp=report.timestamp, stats=report.stats)
+        for report in reports.values()
+    ]
 
 
 @app.get("/dashboard/overview", response_model=DashboardOverview)
 async def get_dashboard_overview(
     project: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Get dashboard overview data
     """
-    return analytics_service.get_overview(db, project)
+    return await analytics_service.get_overview(db, project)
 
 
 @app.get("/stats/costs", response_model=CostStats)
@@ -206,12 +623,12 @@ async def get_cost_stats(
     project: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Get cost statistics
     """
-    return analytics_service.get_cost_stats(db, project, start_date, end_date)
+    return await analytics_service.get_cost_stats(db, project, start_date, end_date)
 
 
 @app.get("/stats/models", response_model=List[ModelStats])
@@ -220,12 +637,12 @@ async def get_model_stats(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     limit: int = 10,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Get model usage statistics
     """
-    return analytics_service.get_model_stats(db, project, start_date, end_date, limit)
+    return await analytics_service.get_model_stats(db, project, start_date, end_date, limit)
 
 
 @app.get("/stats/agents", response_model=List[AgentStats])
@@ -234,34 +651,66 @@ async def get_agent_stats(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     limit: int = 10,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Get agent usage statistics
     """
-    return analytics_service.get_agent_stats(db, project, start_date, end_date, limit)
+    return await analytics_service.get_agent_stats(db, project, start_date, end_date, limit)
+
+
+@app.get("/stats/latency/models", response_model=List[ModelLatencyStats])
+async def get_model_latency_stats(
+    project: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = 10,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Get latency percentiles per model
+    
+    Splits latency into time to first token and generation time, with
+    output tokens per second, to show which models are slow to start and
+    which are slow to generate.
+    """
+    return await analytics_service.get_model_latency_stats(db, project, start_date, end_date, limit)
+
+
+@app.get("/stats/latency/agents", response_model=List[AgentLatencyStats])
+async def get_agent_latency_stats(
+    project: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = 10,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Get latency percentiles per agent
+    """
+    return await analytics_service.get_agent_latency_stats(db, project, start_date, end_date, limit)
 
 
 @app.get("/forecast", response_model=ForecastResponse)
 async def get_forecast(
     project: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Get cost forecast
     """
-    return forecasting_service.get_forecast(db, project)
+    return await forecasting_service.get_forecast(db, project)
 
 
 @app.get("/optimize", response_model=List[OptimizationSuggestion])
 async def get_optimization_suggestions(
     project: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Get optimization suggestions
     """
-    return optimization_service.get_suggestions(db, project)
+    return await optimization_service.get_suggestions(db, project)
 
 
 if __name__ == "__main__":
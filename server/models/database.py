@@ -2,8 +2,7 @@
 
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, JSON, Date, Index
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, JSON, Date, Index, Uuid, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -14,7 +13,7 @@ class Event(Base):
     """Core events table - stores all LLM call events"""
     __tablename__ = "events"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4)
     timestamp = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
     event_type = Column(String(50), nullable=False, default="llm_call")
     
@@ -25,6 +24,12 @@ class Event(Base):
     total_tokens = Column(Integer, nullable=False, default=0)
     latency_ms = Column(Integer, nullable=False, default=0)
     
+    # Streaming timings: time to first token, time from first token to the
+    # end of the response, and output tokens per second over that time
+    ttft_ms = Column(Integer)
+    generation_ms = Column(Integer)
+    tokens_per_second = Column(Float)
+    
     # Metadata
     project = Column(String(100), index=True)
     agent = Column(String(100), index=True)
@@ -32,6 +37,14 @@ class Event(Base):
     user_id = Column(String(100), index=True)
     tags = Column(JSON, default=dict)
     
+    # Number of calls this event stands for when the SDK samples (1 / sample rate)
+    sample_weight = Column(Float, nullable=False, default=1.0)
+    
+    # Position in a trace; the event's span may also have a row in ``spans``
+    trace_id = Column(String(32), index=True)
+    span_id = Column(String(16))
+    parent_span_id = Column(String(16))
+    
     # Relationships
     cost = relationship("Cost", back_populates="event", uselist=False, cascade="all, delete-orphan")
     retrieval_metrics = relationship("RetrievalMetric", back_populates="event", uselist=False, cascade="all, delete-orphan")
@@ -48,8 +61,8 @@ class Cost(Base):
     """Cost information for events"""
     __tablename__ = "costs"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    event_id = Column(UUID(as_uuid=True), ForeignKey("events.id", ondelete="CASCADE"), nullable=False, unique=True)
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    event_id = Column(Uuid(as_uuid=True), ForeignKey("events.id", ondelete="CASCADE"), nullable=False, unique=True)
     
     input_cost = Column(Float, nullable=False, default=0.0)
     output_cost = Column(Float, nullable=False, default=0.0)
@@ -64,8 +77,8 @@ class RetrievalMetric(Base):
     """Retrieval metrics for RAG systems"""
     __tablename__ = "retrieval_metrics"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    event_id = Column(UUID(as_uuid=True), ForeignKey("events.id", ondelete="CASCADE"), nullable=False, unique=True)
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    event_id = Column(Uuid(as_uuid=True), ForeignKey("events.id", ondelete="CASCADE"), nullable=False, unique=True)
     
     chunks = Column(Integer, nullable=False, default=0)
     context_tokens = Column(Integer, nullable=False, default=0)
@@ -87,20 +100,131 @@ class ModelPricing(Base):
 
 
 class DailyAggregate(Base):
-    """Daily aggregates for fast dashboard queries"""
+    """
+    Daily aggregates for fast dashboard queries
+    
+    One row per (date, project, agent, model), maintained at ingestion time.
+    Missing project/agent values are stored as "" so they take part in the
+    unique key used for upserts. Counters are sums of ``sample_weight`` and
+    therefore fractional when events are sampled.
+    """
     __tablename__ = "daily_aggregates"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4)
     date = Column(Date, nullable=False, index=True)
-    project = Column(String(100), index=True)
+    project = Column(String(100), nullable=False, default="", index=True)
+    agent = Column(String(100), nullable=False, default="")
+    model = Column(String(100), nullable=False, default="")
+    
+    total_requests = Column(Float, nullable=False, default=0.0)
+    total_tokens = Column(Float, nullable=False, default=0.0)
+    prompt_tokens = Column(Float, nullable=False, default=0.0)
+    completion_tokens = Column(Float, nullable=False, default=0.0)
+    total_cost = Column(Float, nullable=False, default=0.0)
+    total_latency_ms = Column(Float, nullable=False, default=0.0)
+    avg_latency_ms = Column(Float, nullable=False, default=0.0)
+    
+    # Requests whose prompt exceeds LARGE_PROMPT_TOKENS (see services.rollups)
+    large_prompt_requests = Column(Float, nullable=False, default=0.0)
+    large_prompt_cost = Column(Float, nullable=False, default=0.0)
+    
+    __table_args__ = (
+        UniqueConstraint('date', 'project', 'agent', 'model', name='uq_daily_agg_dims'),
+        Index('idx_daily_agg_date_project', 'date', 'project'),
+    )
+
+
+class Span(Base):
+    """
+    Spans of traces: ``observe()`` / ``@traced`` blocks and retrievals
+    
+    LLM calls are the events with the same ``trace_id``. A block whose
+    only content was one LLM call has no row here; its event stands for it.
+    A span is stored once per (trace_id, span_id), however often it is sent.
+    """
+    __tablename__ = "spans"
+    
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    trace_id = Column(String(32), nullable=False)
+    span_id = Column(String(16), nullable=False)
+    parent_span_id = Column(String(16))
+    kind = Column(String(20), nullable=False, default="span")  # "span", "retrieval"
+    name = Column(String(200))
+    start_time = Column(DateTime, nullable=False)
+    duration_ms = Column(Float, nullable=False, default=0.0)
+    status = Column(String(20), nullable=False, default="ok")
+    
+    project = Column(String(100))
     agent = Column(String(100))
-    model = Column(String(100))
+    step = Column(String(100))
+    user_id = Column(String(100))
+    attributes = Column(JSON, default=dict)
+    
+    __table_args__ = (
+        UniqueConstraint('trace_id', 'span_id', name='uq_spans_trace_span'),
+    )
+
+
+class SdkStat(Base):
+    """
+    Delivery stats reported by SDK clients about themselves
+    
+    Sent as internal ``sdk_stats`` events when the SDK's
+    ``self_metrics_interval`` is set. They are kept apart from ``events``
+    so they never count towards costs, tokens or request totals.
+    """
+    __tablename__ = "sdk_stats"
+    
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    timestamp = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    client_id = Column(String(200), nullable=False, index=True)
+    stats = Column(JSON, nullable=False, default=dict)
+
+
+class MinuteAggregate(Base):
+    """
+    Per-minute rollups shipped by SDK clients in aggregation mode
+    
+    One row per (minute, project, agent, step, model). These calls have no
+    rows in ``events``; statistics combine both tables. Missing dimensions
+    are stored as "" like in ``daily_aggregates``.
+    """
+    __tablename__ = "minute_aggregates"
+    
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    minute = Column(DateTime, nullable=False, index=True)
+    project = Column(String(100), nullable=False, default="")
+    agent = Column(String(100), nullable=False, default="")
+    step = Column(String(100), nullable=False, default="")
+    model = Column(String(100), nullable=False, default="")
     
     total_requests = Column(Integer, nullable=False, default=0)
     total_tokens = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    input_cost = Column(Float, nullable=False, default=0.0)
+    output_cost = Column(Float, nullable=False, default=0.0)
     total_cost = Column(Float, nullable=False, default=0.0)
-    avg_latency_ms = Column(Float, nullable=False, default=0.0)
+    total_latency_ms = Column(Integer, nullable=False, default=0)
+    min_latency_ms = Column(Integer, nullable=False, default=0)
+    max_latency_ms = Column(Integer, nullable=False, default=0)
+    large_prompt_requests = Column(Integer, nullable=False, default=0)
+    large_prompt_cost = Column(Float, nullable=False, default=0.0)
     
     __table_args__ = (
-        Index('idx_daily_agg_date_project', 'date', 'project'),
+        UniqueConstraint('minute', 'project', 'agent', 'step', 'model', name='uq_minute_agg_dims'),
+        Index('idx_minute_agg_project_minute', 'project', 'minute'),
     )
+
+
+class AppliedRollup(Base):
+    """
+    Ids of the client-side rollups already merged into the aggregates
+    
+    A rollup that arrives again, from a transport retry or a spool replay
+    of a batch that was already committed, is found here and skipped.
+    """
+    __tablename__ = "applied_rollups"
+    
+    rollup_id = Column(String(32), primary_key=True)
+    applied_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
@@ -1,7 +1,7 @@
 """Pydantic schemas for API requests and responses"""
 
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Literal
 from pydantic import BaseModel, Field
 from uuid import UUID
 
@@ -19,6 +19,12 @@ class EventCreate(BaseModel):
     total_tokens: Optional[int] = None
     latency_ms: int = 0
     
+    # Streaming timings (optional); tokens_per_second is derived from
+    # completion_tokens and generation_ms when not sent
+    ttft_ms: Optional[int] = Field(None, ge=0)
+    generation_ms: Optional[int] = Field(None, ge=0)
+    tokens_per_second: Optional[float] = Field(None, ge=0)
+    
     # Cost information
     input_cost: float = 0.0
     output_cost: float = 0.0
@@ -32,10 +38,110 @@ class EventCreate(BaseModel):
     user_id: Optional[str] = None
     tags: Dict[str, Any] = Field(default_factory=dict)
     
+    # Calls this event stands for when the SDK samples (1 / sample rate)
+    sample_weight: float = Field(1.0, gt=0)
+    
     # RAG metrics (optional)
     chunks: Optional[int] = None
     context_tokens: Optional[int] = None
     source: Optional[str] = None
+    
+    # Trace position (optional)
+    trace_id: Optional[str] = Field(None, max_length=32)
+    span_id: Optional[str] = Field(None, max_length=16)
+    parent_span_id: Optional[str] = Field(None, max_length=16)
+
+
+class SpanCreate(BaseModel):
+    """Schema for a traced block that finished"""
+    event_type: Literal["span"] = "span"
+    timestamp: datetime  # Start of the block
+    trace_id: str = Field(max_length=32)
+    span_id: str = Field(max_length=16)
+    parent_span_id: Optional[str] = Field(None, max_length=16)
+    name: Optional[str] = None
+    duration_ms: float = Field(0.0, ge=0)
+    status: str = "ok"  # "ok", "error"
+    
+    project: Optional[str] = None
+    agent: Optional[str] = None
+    step: Optional[str] = None
+    user_id: Optional[str] = None
+    tags: Dict[str, Any] = Field(default_factory=dict)
+
+
+class RetrievalCreate(BaseModel):
+    """Schema for a RAG retrieval"""
+    event_type: Literal["retrieval"] = "retrieval"
+    timestamp: Optional[datetime] = None  # End of the retrieval
+    latency_ms: int = Field(0, ge=0)
+    chunks: int = 0
+    context_tokens: int = 0
+    source: Optional[str] = None
+    project: Optional[str] = None
+    tags: Dict[str, Any] = Field(default_factory=dict)
+    event_id: Optional[str] = None
+    
+    # Trace position; a retrieval outside any traced block is a trace of its own
+    trace_id: Optional[str] = Field(None, max_length=32)
+    span_id: Optional[str] = Field(None, max_length=16)
+    parent_span_id: Optional[str] = Field(None, max_length=16)
+
+
+class RollupCreate(BaseModel):
+    """Schema for a client-side rollup of the LLM calls made in one minute"""
+    event_type: Literal["rollup"] = "rollup"
+    timestamp: datetime  # Start of the minute
+    rollup_id: Optional[str] = Field(None, max_length=32)  # Applied once, however often it is sent
+    
+    model: str
+    project: Optional[str] = None
+    agent: Optional[str] = None
+    step: Optional[str] = None
+    
+    # Counters summed over the minute
+    requests: int = Field(ge=1)
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: Optional[int] = None
+    input_cost: float = 0.0
+    output_cost: float = 0.0
+    total_cost: float = 0.0
+    latency_sum_ms: int = 0
+    latency_min_ms: int = 0
+    latency_max_ms: int = 0
+    large_prompt_requests: int = 0
+    large_prompt_cost: float = 0.0
+
+
+class SdkStatsCreate(BaseModel):
+    """Schema for the delivery stats an SDK client reports about itself"""
+    event_type: Literal["sdk_stats"] = "sdk_stats"
+    timestamp: Optional[datetime] = None
+    client_id: str = Field(max_length=200)  # host:pid
+    stats: Dict[str, Any] = Field(default_factory=dict)
+
+
+class SdkStatsResponse(BaseModel):
+    """Latest delivery stats of one SDK client"""
+    client_id: str
+    timestamp: datetime
+    stats: Dict[str, Any]
+
+
+class BatchItemResult(BaseModel):
+    """Outcome of a single event in a batch"""
+    index: int
+    status: str  # "success", "error"
+    event_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    """Response for batch event ingestion"""
+    accepted: int
+    rejected: int
+    results: List[BatchItemResult]
 
 
 class EventResponse(BaseModel):
@@ -48,17 +154,30 @@ class EventResponse(BaseModel):
     completion_tokens: int
     total_tokens: int
     latency_ms: int
+    ttft_ms: Optional[int] = None
+    generation_ms: Optional[int] = None
+    tokens_per_second: Optional[float] = None
     project: Optional[str]
     agent: Optional[str]
     step: Optional[str]
     user_id: Optional[str]
     tags: Dict[str, Any]
+    sample_weight: float = 1.0
     total_cost: Optional[float] = None
+    trace_id: Optional[str] = None
+    span_id: Optional[str] = None
+    parent_span_id: Optional[str] = None
     
     class Config:
         from_attributes = True
 
 
+class EventPage(BaseModel):
+    """A page of events with an opaque cursor for the next page"""
+    items: List[EventResponse]
+    next_cursor: Optional[str] = None
+
+
 class CostStats(BaseModel):
     """Cost statistics"""
     total_cost: float
@@ -84,6 +203,93 @@ class AgentStats(BaseModel):
     cost: float
 
 
+class LatencyPercentiles(BaseModel):
+    """Percentiles of a duration in milliseconds (None without samples)"""
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+    p95: Optional[float] = None
+    p99: Optional[float] = None
+
+
+class ThroughputPercentiles(BaseModel):
+    """Percentiles of output tokens per second; the low ones are the slow tail"""
+    p1: Optional[float] = None
+    p5: Optional[float] = None
+    p10: Optional[float] = None
+    p50: Optional[float] = None
+
+
+class LatencyBreakdown(BaseModel):
+    """Where the time of LLM calls goes"""
+    requests: int
+    streamed_requests: int  # Requests with time to first token recorded
+    latency_ms: LatencyPercentiles
+    ttft_ms: LatencyPercentiles
+    generation_ms: LatencyPercentiles
+    tokens_per_second: ThroughputPercentiles
+
+
+class ModelLatencyStats(LatencyBreakdown):
+    """Latency breakdown for one model"""
+    model: str
+
+
+class AgentLatencyStats(LatencyBreakdown):
+    """Latency breakdown for one agent"""
+    agent: str
+
+
+class TraceSpan(BaseModel):
+    """
+    One span of a trace with its children
+    
+    Times are in milliseconds; ``offset_ms`` is from the start of the trace.
+    ``self_ms`` is the span's time not covered by any child, ``llm_ms`` the
+    part of it spent in the span's own LLM call, and ``critical_ms`` the
+    time the span itself is on the trace's critical path.
+    """
+    span_id: str
+    parent_span_id: Optional[str] = None
+    kind: str  # "span", "llm_call", "retrieval"
+    name: Optional[str] = None
+    status: str = "ok"
+    start_time: datetime
+    offset_ms: float
+    duration_ms: float
+    self_ms: float
+    llm_ms: float
+    critical_ms: float
+    project: Optional[str] = None
+    agent: Optional[str] = None
+    step: Optional[str] = None
+    model: Optional[str] = None
+    total_tokens: Optional[int] = None
+    total_cost: Optional[float] = None
+    attributes: Dict[str, Any] = Field(default_factory=dict)
+    children: List["TraceSpan"] = Field(default_factory=list)
+
+
+class CriticalPathSegment(BaseModel):
+    """A stretch of the critical path spent in one span's own time"""
+    span_id: str
+    name: Optional[str] = None
+    offset_ms: float
+    duration_ms: float
+
+
+class TraceResponse(BaseModel):
+    """A trace's span tree with latency attribution"""
+    trace_id: str
+    start_time: datetime
+    duration_ms: float
+    llm_ms: float  # Wall time with at least one LLM call running
+    non_llm_ms: float  # Wall time outside LLM calls
+    total_cost: float
+    span_count: int
+    critical_path: List[CriticalPathSegment]
+    spans: List[TraceSpan]  # Root spans
+
+
 class TimeSeriesPoint(BaseModel):
     """Time series data point"""
     timestamp: datetime
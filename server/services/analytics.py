@@ -1,245 +1,478 @@
 """Analytics service for computing statistics"""
 
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from datetime import datetime, timedelta
-from typing import Optional, List
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, desc, union_all, case
+from sqlalchemy.sql import ColumnElement, Select, Subquery
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional, List, Sequence, Union
+import heapq
 import sys
 from pathlib import Path
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from models.database import Event, Cost
+from models.database import Event, Cost, DailyAggregate, MinuteAggregate
 from models.schemas import (
     DashboardOverview,
     CostStats,
     ModelStats,
     AgentStats,
+    ModelLatencyStats,
+    AgentLatencyStats,
+    LatencyPercentiles,
+    ThroughputPercentiles,
     TimeSeriesPoint,
 )
 
 
+# Cost of an event; events without a cost row count as zero
+EVENT_COST = func.coalesce(Cost.total_cost, 0.0)
+
+# Percentiles reported for durations, and for throughput (where the slow
+# tail is at the bottom)
+LATENCY_QUANTILES = {"p50": 0.50, "p90": 0.90, "p95": 0.95, "p99": 0.99}
+THROUGHPUT_QUANTILES = {"p1": 0.01, "p5": 0.05, "p10": 0.10, "p50": 0.50}
+
+
+def _with_cost(query: Select) -> Select:
+    """Join events to their (optional) cost row"""
+    return query.select_from(Event).outerjoin(Cost, Cost.event_id == Event.id)
+
+
+def _apply_filters(
+    query: Select,
+    project: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> Select:
+    """Apply the common project/date filters to an events query"""
+    if project:
+        query = query.where(Event.project == project)
+    if start_date:
+        query = query.where(Event.timestamp >= start_date)
+    if end_date:
+        query = query.where(Event.timestamp <= end_date)
+    return query
+
+
+def _facts(
+    project: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> Subquery:
+    """
+    Every tracked call as (model, agent, requests, tokens, cost)
+    
+    Combines individual events with the per-minute rollups shipped by SDK
+    clients in aggregation mode, so statistics count both. Events are
+    scaled by their ``sample_weight`` so sampled traffic sums to unbiased
+    totals.
+    """
+    events = _apply_filters(
+        _with_cost(
+            select(
+                Event.model.label("model"),
+                Event.agent.label("agent"),
+                Event.sample_weight.label("requests"),
+                (Event.total_tokens * Event.sample_weight).label("tokens"),
+                (EVENT_COST * Event.sample_weight).label("cost"),
+            )
+        ),
+        project,
+        start_date,
+        end_date,
+    )
+    
+    rollups = select(
+        MinuteAggregate.model,
+        func.nullif(MinuteAggregate.agent, "").label("agent"),
+        MinuteAggregate.total_requests,
+        MinuteAggregate.total_tokens,
+        MinuteAggregate.total_cost,
+    )
+    if project:
+        rollups = rollups.where(MinuteAggregate.project == project)
+    if start_date:
+        rollups = rollups.where(MinuteAggregate.minute >= start_date)
+    if end_date:
+        rollups = rollups.where(MinuteAggregate.minute <= end_date)
+    
+    return union_all(events, rollups).subquery("facts")
+
+
+def _weighted_percentiles(
+    group: ColumnElement,
+    metric: ColumnElement,
+    quantiles: Dict[str, float],
+    keys: Sequence[str],
+    project: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> Select:
+    """
+    Per-group nearest-rank percentiles of an events column
+    
+    Each event counts with its ``sample_weight``: the running weight over
+    the events ordered by the metric is compared with the group's total
+    weight, and a percentile is the smallest value whose running weight
+    reaches its share. Window functions keep this portable between SQLite
+    and PostgreSQL.
+    """
+    weight = Event.sample_weight
+    ranked = _apply_filters(
+        select(
+            group.label("key"),
+            metric.label("value"),
+            func.sum(weight).over(partition_by=group, order_by=metric).label("running"),
+            func.sum(weight).over(partition_by=group).label("total"),
+        ).where(group.in_(keys), metric.isnot(None), Event.event_type == "llm_call"),
+        project,
+        start_date,
+        end_date,
+    ).subquery("ranked")
+    
+    return select(
+        ranked.c.key,
+        *[
+            func.min(case((ranked.c.running >= q * ranked.c.total, ranked.c.value))).label(name)
+            for name, q in quantiles.items()
+        ],
+    ).group_by(ranked.c.key)
+
+
+def _rollup_filters(
+    query: Select,
+    project: Optional[str] = None,
+    start_day: Optional[date] = None,
+) -> Select:
+    """Apply project/date filters to a daily rollup query"""
+    if project:
+        query = query.where(DailyAggregate.project == project)
+    if start_day:
+        query = query.where(DailyAggregate.date >= start_day)
+    return query
+
+
+def _as_date(value: Union[str, date, datetime]) -> date:
+    """Normalize a SQL date() result (a string on SQLite) to a date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _accumulate(totals: list, requests: float, tokens: float, cost: float):
+    """Add to a [requests, tokens, cost] running total"""
+    totals[0] += requests
+    totals[1] += tokens
+    totals[2] += cost
+
+
+def _fill_series(daily_costs: Dict[date, float], start: date, end: date) -> List[TimeSeriesPoint]:
+    """Daily cost series from start to end, with missing days as zero"""
+    result = []
+    current_date = start
+    while current_date <= end:
+        cost = daily_costs.get(current_date, 0.0)
+        result.append(
+            TimeSeriesPoint(
+                timestamp=datetime.combine(current_date, datetime.min.time()),
+                value=round(cost, 4),
+            )
+        )
+        current_date += timedelta(days=1)
+    return result
+
+
 class AnalyticsService:
     """Service for analytics and statistics"""
     
-    def get_overview(self, db: Session, project: Optional[str] = None) -> DashboardOverview:
-        """Get dashboard overview data"""
-        now = datetime.utcnow()
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    async def get_overview(self, db: AsyncSession, project: Optional[str] = None) -> DashboardOverview:
+        """
+        Get dashboard overview data
         
-        # Base query
-        base_query = db.query(Event)
-        if project:
-            base_query = base_query.filter(Event.project == project)
+        Computed in a single pass over the daily rollups grouped by
+        (date, model, agent): today's and this month's totals, the 30-day
+        cost series and the top models and agents all come from the same
+        result set, so the cost depends on the number of days and
+        dimensions rather than on the number of events.
+        """
+        today = datetime.utcnow().date()
+        month_start = today.replace(day=1)
+        series_start = today - timedelta(days=30)
         
-        # Today's cost
-        today_events = base_query.filter(Event.timestamp >= today_start).all()
-        today_cost = sum(e.cost.total_cost if e.cost else 0.0 for e in today_events)
+        query = _rollup_filters(
+            select(
+                DailyAggregate.date,
+                DailyAggregate.model,
+                DailyAggregate.agent,
+                func.sum(DailyAggregate.total_requests),
+                func.sum(DailyAggregate.total_tokens),
+                func.sum(DailyAggregate.total_cost),
+            ),
+            project,
+        ).group_by(DailyAggregate.date, DailyAggregate.model, DailyAggregate.agent)
         
-        # Month's cost
-        month_events = base_query.filter(Event.timestamp >= month_start).all()
-        month_cost = sum(e.cost.total_cost if e.cost else 0.0 for e in month_events)
+        today_cost = 0.0
+        month_cost = 0.0
+        month_tokens = 0.0
+        month_requests = 0.0
+        month_models = set()
+        daily_costs = defaultdict(float)
+        model_totals = defaultdict(lambda: [0.0, 0.0, 0.0])
+        agent_totals = defaultdict(lambda: [0.0, 0.0, 0.0])
         
-        # Total tokens
-        total_tokens = sum(e.total_tokens for e in month_events)
+        for day, model, agent, requests, tokens, cost in await db.execute(query):
+            day = _as_date(day)
+            
+            if day == today:
+                today_cost += cost
+            if day >= month_start:
+                month_cost += cost
+                month_tokens += tokens
+                month_requests += requests
+                month_models.add(model)
+            if day >= series_start:
+                daily_costs[day] += cost
+            
+            _accumulate(model_totals[model], requests, tokens, cost)
+            if agent:
+                _accumulate(agent_totals[agent], requests, tokens, cost)
         
         # Average cost per request
-        avg_cost = month_cost / len(month_events) if month_events else 0.0
-        
-        # Active models
-        active_models = len(set(e.model for e in month_events))
-        
-        # Cost over time (last 30 days)
-        cost_over_time = self._get_cost_over_time(db, project, days=30)
+        avg_cost = month_cost / month_requests if month_requests else 0.0
         
         # Top models
-        top_models = self.get_model_stats(db, project, limit=5)
+        top_models = [
+            ModelStats(model=model, requests=round(requests), tokens=round(tokens), cost=round(cost, 4))
+            for model, (requests, tokens, cost) in heapq.nlargest(
+                5, model_totals.items(), key=lambda item: item[1][2]
+            )
+        ]
         
         # Top agents
-        top_agents = self.get_agent_stats(db, project, limit=5)
+        top_agents = [
+            AgentStats(agent=agent, requests=round(requests), tokens=round(tokens), cost=round(cost, 4))
+            for agent, (requests, tokens, cost) in heapq.nlargest(
+                5, agent_totals.items(), key=lambda item: item[1][2]
+            )
+        ]
         
         return DashboardOverview(
             today_cost=round(today_cost, 4),
             month_cost=round(month_cost, 4),
-            total_tokens=total_tokens,
+            total_tokens=round(month_tokens),
             avg_cost_per_request=round(avg_cost, 6),
-            active_models=active_models,
-            cost_over_time=cost_over_time,
+            active_models=len(month_models),
+            cost_over_time=_fill_series(daily_costs, series_start, today),
             top_models=top_models,
             top_agents=top_agents,
         )
     
-    def get_cost_stats(
+    async def get_cost_stats(
         self,
-        db: Session,
+        db: AsyncSession,
         project: Optional[str] = None,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
     ) -> CostStats:
         """Get cost statistics"""
-        query = db.query(Event)
-        
-        if project:
-            query = query.filter(Event.project == project)
-        if start_date:
-            query = query.filter(Event.timestamp >= start_date)
-        if end_date:
-            query = query.filter(Event.timestamp <= end_date)
-        
-        events = query.all()
+        facts = _facts(project, start_date, end_date)
+        query = select(
+            func.coalesce(func.sum(facts.c.requests), 0),
+            func.coalesce(func.sum(facts.c.tokens), 0),
+            func.coalesce(func.sum(facts.c.cost), 0.0),
+        )
         
-        total_cost = sum(e.cost.total_cost if e.cost else 0.0 for e in events)
-        total_tokens = sum(e.total_tokens for e in events)
-        total_requests = len(events)
+        total_requests, total_tokens, total_cost = (await db.execute(query)).one()
         avg_cost = total_cost / total_requests if total_requests > 0 else 0.0
         
         return CostStats(
             total_cost=round(total_cost, 4),
-            total_tokens=total_tokens,
-            total_requests=total_requests,
+            total_tokens=round(total_tokens),
+            total_requests=round(total_requests),
             avg_cost_per_request=round(avg_cost, 6),
             currency="USD",
         )
     
-    def get_model_stats(
+    async def get_model_stats(
         self,
-        db: Session,
+        db: AsyncSession,
         project: Optional[str] = None,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
         limit: int = 10,
     ) -> List[ModelStats]:
         """Get model usage statistics"""
-        query = db.query(Event)
-        
-        if project:
-            query = query.filter(Event.project == project)
-        if start_date:
-            query = query.filter(Event.timestamp >= start_date)
-        if end_date:
-            query = query.filter(Event.timestamp <= end_date)
-        
-        events = query.all()
-        
-        # Group by model
-        model_data = {}
-        for event in events:
-            if event.model not in model_data:
-                model_data[event.model] = {
-                    "requests": 0,
-                    "tokens": 0,
-                    "cost": 0.0,
-                }
-            
-            model_data[event.model]["requests"] += 1
-            model_data[event.model]["tokens"] += event.total_tokens
-            model_data[event.model]["cost"] += event.cost.total_cost if event.cost else 0.0
+        facts = _facts(project, start_date, end_date)
+        cost = func.coalesce(func.sum(facts.c.cost), 0.0).label("cost")
+        query = select(
+            facts.c.model,
+            func.sum(facts.c.requests).label("requests"),
+            func.coalesce(func.sum(facts.c.tokens), 0).label("tokens"),
+            cost,
+        )
         
         # Sort by cost
-        result = [
+        query = query.group_by(facts.c.model).order_by(desc(cost)).limit(limit)
+        
+        return [
             ModelStats(
-                model=model,
-                requests=data["requests"],
-                tokens=data["tokens"],
-                cost=round(data["cost"], 4),
-            )
-            for model, data in sorted(
-                model_data.items(),
-                key=lambda x: x[1]["cost"],
-                reverse=True,
+                model=row.model,
+                requests=round(row.requests),
+                tokens=round(row.tokens),
+                cost=round(row.cost, 4),
             )
+            for row in await db.execute(query)
         ]
-        
-        return result[:limit]
     
-    def get_agent_stats(
+    async def get_agent_stats(
         self,
-        db: Session,
+        db: AsyncSession,
         project: Optional[str] = None,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
         limit: int = 10,
     ) -> List[AgentStats]:
         """Get agent usage statistics"""
-        query = db.query(Event).filter(Event.agent.isnot(None))
-        
-        if project:
-            query = query.filter(Event.project == project)
-        if start_date:
-            query = query.filter(Event.timestamp >= start_date)
-        if end_date:
-            query = query.filter(Event.timestamp <= end_date)
-        
-        events = query.all()
-        
-        # Group by agent
-        agent_data = {}
-        for event in events:
-            if event.agent not in agent_data:
-                agent_data[event.agent] = {
-                    "requests": 0,
-                    "tokens": 0,
-                    "cost": 0.0,
-                }
-            
-            agent_data[event.agent]["requests"] += 1
-            agent_data[event.agent]["tokens"] += event.total_tokens
-            agent_data[event.agent]["cost"] += event.cost.total_cost if event.cost else 0.0
+        facts = _facts(project, start_date, end_date)
+        cost = func.coalesce(func.sum(facts.c.cost), 0.0).label("cost")
+        query = select(
+            facts.c.agent,
+            func.sum(facts.c.requests).label("requests"),
+            func.coalesce(func.sum(facts.c.tokens), 0).label("tokens"),
+            cost,
+        ).where(facts.c.agent.isnot(None))
         
         # Sort by cost
-        result = [
+        query = query.group_by(facts.c.agent).order_by(desc(cost)).limit(limit)
+        
+        return [
             AgentStats(
-                agent=agent,
-                requests=data["requests"],
-                tokens=data["tokens"],
-                cost=round(data["cost"], 4),
+                agent=row.agent,
+                requests=round(row.requests),
+                tokens=round(row.tokens),
+                cost=round(row.cost, 4),
             )
-            for agent, data in sorted(
-                agent_data.items(),
-                key=lambda x: x[1]["cost"],
-                reverse=True,
+            for row in await db.execute(query)
+        ]
+    
+    async def get_model_latency_stats(
+        self,
+        db: AsyncSession,
+        project: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        limit: int = 10,
+    ) -> List[ModelLatencyStats]:
+        """Get latency, time to first token and throughput percentiles per model"""
+        return [
+            ModelLatencyStats(model=key, **breakdown)
+            for key, breakdown in await self._latency_breakdown(
+                db, Event.model, project, start_date, end_date, limit
             )
         ]
+    
+    async def get_agent_latency_stats(
+        self,
+        db: AsyncSession,
+        project: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        limit: int = 10,
+    ) -> List[AgentLatencyStats]:
+        """Get latency, time to first token and throughput percentiles per agent"""
+        return [
+            AgentLatencyStats(agent=key, **breakdown)
+            for key, breakdown in await self._latency_breakdown(
+                db, Event.agent, project, start_date, end_date, limit
+            )
+        ]
+    
+    async def _latency_breakdown(
+        self,
+        db: AsyncSession,
+        group: ColumnElement,
+        project: Optional[str],
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        limit: int,
+    ) -> List[tuple]:
+        """
+        Percentile breakdowns for the busiest groups, as (key, fields)
         
-        return result[:limit]
+        Only individual events carry timings; client-side minute rollups
+        are not included.
+        """
+        weight = Event.sample_weight
+        requests = func.sum(weight).label("requests")
+        query = _apply_filters(
+            select(
+                group.label("key"),
+                requests,
+                func.coalesce(func.sum(case((Event.ttft_ms.isnot(None), weight))), 0).label("streamed"),
+            ).where(group.isnot(None), Event.event_type == "llm_call"),
+            project,
+            start_date,
+            end_date,
+        ).group_by(group).order_by(desc(requests)).limit(limit)
+        groups = (await db.execute(query)).all()
+        keys = [row.key for row in groups]
+        if not keys:
+            return []
+        
+        metrics = {
+            "latency_ms": (Event.latency_ms, LATENCY_QUANTILES),
+            "ttft_ms": (Event.ttft_ms, LATENCY_QUANTILES),
+            "generation_ms": (Event.generation_ms, LATENCY_QUANTILES),
+            "tokens_per_second": (Event.tokens_per_second, THROUGHPUT_QUANTILES),
+        }
+        percentiles: Dict[str, Dict[Any, Dict[str, float]]] = {}
+        for name, (metric, quantiles) in metrics.items():
+            query = _weighted_percentiles(group, metric, quantiles, keys, project, start_date, end_date)
+            percentiles[name] = {
+                row.key: {q: round(getattr(row, q), 3) for q in quantiles if getattr(row, q) is not None}
+                for row in await db.execute(query)
+            }
+        
+        return [
+            (
+                row.key,
+                {
+                    "requests": round(row.requests),
+                    "streamed_requests": round(row.streamed),
+                    "latency_ms": LatencyPercentiles(**percentiles["latency_ms"].get(row.key, {})),
+                    "ttft_ms": LatencyPercentiles(**percentiles["ttft_ms"].get(row.key, {})),
+                    "generation_ms": LatencyPercentiles(**percentiles["generation_ms"].get(row.key, {})),
+                    "tokens_per_second": ThroughputPercentiles(**percentiles["tokens_per_second"].get(row.key, {})),
+                },
+            )
+            for row in groups
+        ]
     
-    def _get_cost_over_time(
+    async def _get_cost_over_time(
         self,
-        db: Session,
+        db: AsyncSession,
         project: Optional[str] = None,
         days: int = 30,
     ) -> List[TimeSeriesPoint]:
-        """Get cost over time series data"""
+        """Get cost over time series data from the daily rollups"""
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        query = db.query(Event).filter(Event.timestamp >= start_date)
-        if project:
-            query = query.filter(Event.project == project)
-        
-        events = query.all()
-        
         # Group by date
-        daily_costs = {}
-        for event in events:
-            date = event.timestamp.date()
-            if date not in daily_costs:
-                daily_costs[date] = 0.0
-            daily_costs[date] += event.cost.total_cost if event.cost else 0.0
-        
-        # Fill in missing dates
-        result = []
-        current_date = start_date.date()
-        while current_date <= end_date.date():
-            cost = daily_costs.get(current_date, 0.0)
-            result.append(
-                TimeSeriesPoint(
-                    timestamp=datetime.combine(current_date, datetime.min.time()),
-                    value=round(cost, 4),
-                )
-            )
-            current_date += timedelta(days=1)
+        query = _rollup_filters(
+            select(DailyAggregate.date, func.sum(DailyAggregate.total_cost).label("cost")),
+            project,
+            start_date.date(),
+        ).group_by(DailyAggregate.date)
+        
+        daily_costs = {
+            _as_date(row.date): row.cost
+            for row in await db.execute(query)
+        }
         
-        return result
+        return _fill_series(daily_costs, start_date.date(), end_date.date())
@@ -0,0 +1,197 @@
+"""Streaming export of raw events"""
+
+from sqlalchemy import select
+from sqlalchemy.sql import Select
+from typing import Any, AsyncIterator, Dict, List, Sequence
+import csv
+import io
+import json
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from models.database import Event, Cost
+
+# Rows fetched from the database cursor per round trip
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+EXPORT_COLUMNS = (
+    "id",
+    "timestamp",
+    "event_type",
+    "model",
+    "prompt_tokens",
+    "completion_tokens",
+    "total_tokens",
+    "latency_ms",
+    "ttft_ms",
+    "generation_ms",
+    "tokens_per_second",
+    "project",
+    "agent",
+    "step",
+    "user_id",
+    "tags",
+    "sample_weight",
+    "input_cost",
+    "output_cost",
+    "total_cost",
+)
+TAGS_COLUMN = EXPORT_COLUMNS.index("tags")
+
+
+def export_query() -> Select:
+    """Events joined to their costs, in export column order, oldest first"""
+    return (
+        select(
+            Event.id,
+            Event.timestamp,
+            Event.event_type,
+            Event.model,
+            Event.prompt_tokens,
+            Event.completion_tokens,
+            Event.total_tokens,
+            Event.latency_ms,
+            Event.ttft_ms,
+            Event.generation_ms,
+            Event.tokens_per_second,
+            Event.project,
+            Event.agent,
+            Event.step,
+            Event.user_id,
+            Event.tags,
+            Event.sample_weight,
+            Cost.input_cost,
+            Cost.output_cost,
+            Cost.total_cost,
+        )
+        .outerjoin(Cost, Cost.event_id == Event.id)
+        .order_by(Event.timestamp, Event.id)
+    )
+
+
+def _record(row: Sequence[Any]) -> Dict[str, Any]:
+    """Export row as a JSON-friendly dict"""
+    record = dict(zip(EXPORT_COLUMNS, row))
+    record["id"] = str(record["id"])
+    record["timestamp"] = record["timestamp"].isoformat()
+    return record
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to the caller"""
+    
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+    
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self.position
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+    
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+class ExportService:
+    """
+    Encode batches of export rows as a byte stream
+    
+    Each batch is encoded and yielded before the next one is pulled, so
+    memory use is bounded by the batch size rather than the export size.
+    """
+    
+    def encode(self, batches: AsyncIterator[Sequence[Sequence[Any]]], fmt: str) -> AsyncIterator[bytes]:
+        """Byte stream of the batches in the requested format"""
+        if fmt == "csv":
+            return self._csv(batches)
+        if fmt == "ndjson":
+            return self._ndjson(batches)
+        if fmt == "parquet":
+            return self._parquet(batches)
+        raise ValueError(f"Unsupported export format: {fmt}")
+    
+    async def _csv(self, batches: AsyncIterator[Sequence[Sequence[Any]]]) -> AsyncIterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        
+        async for rows in batches:
+            for row in rows:
+                record = _record(row)
+                record["tags"] = json.dumps(record["tags"]) if record["tags"] else ""
+                writer.writerow(record.values())
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        
+        # Header only when there were no rows
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+    
+    async def _ndjson(self, batches: AsyncIterator[Sequence[Sequence[Any]]]) -> AsyncIterator[bytes]:
+        async for rows in batches:
+            yield "".join(json.dumps(_record(row)) + "\n" for row in rows).encode()
+    
+    async def _parquet(self, batches: AsyncIterator[Sequence[Sequence[Any]]]) -> AsyncIterator[bytes]:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        schema = pa.schema([
+            ("id", pa.string()),
+            ("timestamp", pa.timestamp("us")),
+            ("event_type", pa.string()),
+            ("model", pa.string()),
+            ("prompt_tokens", pa.int64()),
+            ("completion_tokens", pa.int64()),
+            ("total_tokens", pa.int64()),
+            ("latency_ms", pa.int64()),
+            ("ttft_ms", pa.int64()),
+            ("generation_ms", pa.int64()),
+            ("tokens_per_second", pa.float64()),
+            ("project", pa.string()),
+            ("agent", pa.string()),
+            ("step", pa.string()),
+            ("user_id", pa.string()),
+            ("tags", pa.string()),
+            ("sample_weight", pa.float64()),
+            ("input_cost", pa.float64()),
+            ("output_cost", pa.float64()),
+            ("total_cost", pa.float64()),
+        ])
+        
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema)
+        try:
+            # One row group per database batch
+            async for rows in batches:
+                columns = [list(column) for column in zip(*rows)]
+                columns[0] = [str(value) for value in columns[0]]
+                columns[TAGS_COLUMN] = [json.dumps(value) if value else None for value in columns[TAGS_COLUMN]]
+                writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
@@ -1,6 +1,7 @@
 """Forecasting service for predicting future costs"""
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from typing import Optional
 import statistics
@@ -10,30 +11,35 @@ from pathlib import Path
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from models.database import Event
+from models.database import DailyAggregate
 from models.schemas import ForecastResponse
 
 
 class ForecastingService:
     """Service for cost forecasting"""
     
-    def get_forecast(self, db: Session, project: Optional[str] = None) -> ForecastResponse:
+    async def get_forecast(self, db: AsyncSession, project: Optional[str] = None) -> ForecastResponse:
         """
         Get cost forecast based on recent trends
         
-        Uses simple moving average and linear projection
+        Uses simple moving average and linear projection over the
+        daily rollups
         """
         # Get last 30 days of data
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=30)
         
-        query = db.query(Event).filter(Event.timestamp >= start_date)
+        # Group by date
+        query = select(
+            DailyAggregate.date,
+            func.sum(DailyAggregate.total_cost),
+        ).where(DailyAggregate.date >= start_date.date())
         if project:
-            query = query.filter(Event.project == project)
+            query = query.where(DailyAggregate.project == project)
         
-        events = query.all()
+        daily_costs = dict((await db.execute(query.group_by(DailyAggregate.date))).all())
         
-        if not events:
+        if not daily_costs:
             return ForecastResponse(
                 monthly_projection=0.0,
                 daily_average=0.0,
@@ -41,14 +47,6 @@ class ForecastingService:
                 confidence="low",
             )
         
-        # Group by date
-        daily_costs = {}
-        for event in events:
-            date = event.timestamp.date()
-            if date not in daily_costs:
-                daily_costs[date] = 0.0
-            daily_costs[date] += event.cost.total_cost if event.cost else 0.0
-        
         # Get daily averages
         sorted_dates = sorted(daily_costs.keys())
         daily_values = [daily_costs[date] for date in sorted_dates]
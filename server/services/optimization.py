@@ -1,6 +1,7 @@
 """Optimization service for suggesting cost savings"""
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from typing import Optional, List
 from collections import defaultdict
@@ -10,8 +11,9 @@ from pathlib import Path
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from models.database import Event
+from models.database import DailyAggregate
 from models.schemas import OptimizationSuggestion
+from services.rollups import LARGE_PROMPT_TOKENS
 
 
 class OptimizationService:
@@ -35,13 +37,15 @@ class OptimizationService:
         ("claude-3-5-sonnet", "claude-3-haiku"): 92.0,
     }
     
-    def get_suggestions(
+    async def get_suggestions(
         self,
-        db: Session,
+        db: AsyncSession,
         project: Optional[str] = None,
     ) -> List[OptimizationSuggestion]:
         """
         Generate optimization suggestions based on usage patterns
+        
+        Works from the daily rollups for the last 30 days.
         """
         suggestions = []
         
@@ -49,38 +53,38 @@ class OptimizationService:
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=30)
         
-        query = db.query(Event).filter(Event.timestamp >= start_date)
+        query = select(DailyAggregate).where(DailyAggregate.date >= start_date.date())
         if project:
-            query = query.filter(Event.project == project)
+            query = query.where(DailyAggregate.project == project)
         
-        events = query.all()
+        rollups = (await db.execute(query)).scalars().all()
         
-        if not events:
+        if not rollups:
             return suggestions
         
         # Analyze model usage
-        model_suggestions = self._analyze_model_usage(events)
+        model_suggestions = self._analyze_model_usage(rollups)
         suggestions.extend(model_suggestions)
         
         # Analyze prompt size
-        prompt_suggestions = self._analyze_prompt_size(events)
+        prompt_suggestions = self._analyze_prompt_size(rollups)
         suggestions.extend(prompt_suggestions)
         
         # Analyze caching opportunities
-        caching_suggestions = self._analyze_caching_opportunities(events)
+        caching_suggestions = self._analyze_caching_opportunities(rollups)
         suggestions.extend(caching_suggestions)
         
         return suggestions
     
-    def _analyze_model_usage(self, events: List[Event]) -> List[OptimizationSuggestion]:
+    def _analyze_model_usage(self, rollups: List[DailyAggregate]) -> List[OptimizationSuggestion]:
         """Suggest cheaper model alternatives"""
         suggestions = []
         
         # Group by model
-        model_stats = defaultdict(lambda: {"count": 0, "cost": 0.0})
-        for event in events:
-            model_stats[event.model]["count"] += 1
-            model_stats[event.model]["cost"] += event.cost.total_cost if event.cost else 0.0
+        model_stats = defaultdict(lambda: {"count": 0.0, "cost": 0.0})
+        for rollup in rollups:
+            model_stats[rollup.model]["count"] += rollup.total_requests
+            model_stats[rollup.model]["cost"] += rollup.total_cost
         
         # Check for expensive models with cheaper alternatives
         for model, stats in model_stats.items():
@@ -111,21 +115,21 @@ class OptimizationService:
                             estimated_savings=round(estimated_savings, 4),
                             estimated_savings_percent=savings_percent,
                             reason=f"Switch to {alternative} for {savings_percent}% cost reduction. "
-                                   f"Current monthly cost: ${stats['cost']:.2f} ({stats['count']} requests)",
+                                   f"Current monthly cost: ${stats['cost']:.2f} ({stats['count']:.0f} requests)",
                         )
                     )
         
         return suggestions
     
-    def _analyze_prompt_size(self, events: List[Event]) -> List[OptimizationSuggestion]:
+    def _analyze_prompt_size(self, rollups: List[DailyAggregate]) -> List[OptimizationSuggestion]:
         """Suggest prompt optimization based on token usage"""
         suggestions = []
         
-        # Find events with unusually large prompts
-        large_prompt_events = [e for e in events if e.prompt_tokens > 4000]
+        # Find requests with unusually large prompts
+        large_prompt_requests = sum(r.large_prompt_requests for r in rollups)
         
-        if large_prompt_events:
-            total_large_cost = sum(e.cost.total_cost if e.cost else 0.0 for e in large_prompt_events)
+        if large_prompt_requests:
+            total_large_cost = sum(r.large_prompt_cost for r in rollups)
             
             # Estimate 30% reduction from prompt optimization
             estimated_savings = total_large_cost * 0.3
@@ -134,29 +138,29 @@ class OptimizationService:
                 suggestions.append(
                     OptimizationSuggestion(
                         type="prompt",
-                        current=f"{len(large_prompt_events)} requests with >4000 prompt tokens",
+                        current=f"{large_prompt_requests:.0f} requests with >{LARGE_PROMPT_TOKENS} prompt tokens",
                         suggested="Optimize prompts: reduce context, use summarization",
                         estimated_savings=round(estimated_savings, 4),
                         estimated_savings_percent=30.0,
-                        reason=f"Large prompts detected in {len(large_prompt_events)} requests. "
+                        reason=f"Large prompts detected in {large_prompt_requests:.0f} requests. "
                                f"Consider reducing context or using prompt compression techniques.",
                     )
                 )
         
         return suggestions
     
-    def _analyze_caching_opportunities(self, events: List[Event]) -> List[OptimizationSuggestion]:
+    def _analyze_caching_opportunities(self, rollups: List[DailyAggregate]) -> List[OptimizationSuggestion]:
         """Suggest caching for repeated patterns"""
         suggestions = []
         
         # Group by project/agent to find repeated patterns
-        project_agent_stats = defaultdict(lambda: {"count": 0, "cost": 0.0})
+        project_agent_stats = defaultdict(lambda: {"count": 0.0, "cost": 0.0})
         
-        for event in events:
-            if event.project and event.agent:
-                key = f"{event.project}/{event.agent}"
-                project_agent_stats[key]["count"] += 1
-                project_agent_stats[key]["cost"] += event.cost.total_cost if event.cost else 0.0
+        for rollup in rollups:
+            if rollup.project and rollup.agent:
+                key = f"{rollup.project}/{rollup.agent}"
+                project_agent_stats[key]["count"] += rollup.total_requests
+                project_agent_stats[key]["cost"] += rollup.total_cost
         
         # Look for high-frequency patterns
         for key, stats in project_agent_stats.items():
@@ -168,11 +172,11 @@ class OptimizationService:
                     suggestions.append(
                         OptimizationSuggestion(
                             type="caching",
-                            current=f"{key}: {stats['count']} requests",
+                            current=f"{key}: {stats['count']:.0f} requests",
                             suggested="Implement response caching for repeated queries",
                             estimated_savings=round(estimated_savings, 4),
                             estimated_savings_percent=20.0,
-                            reason=f"High-frequency pattern detected ({stats['count']} requests). "
+                            reason=f"High-frequency pattern detected ({stats['count']:.0f} requests). "
                                    f"Caching could reduce costs by ~20%.",
                         )
                     )
@@ -0,0 +1,334 @@
+"""Daily rollup maintenance for dashboard queries"""
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func, case, insert
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from models.database import Event, Cost, DailyAggregate, MinuteAggregate, AppliedRollup
+
+# Prompts above this size are tracked separately for optimization suggestions
+LARGE_PROMPT_TOKENS = 4000
+
+# Columns summed when two rollups for the same key are merged
+SUM_COLUMNS = (
+    "total_requests",
+    "total_tokens",
+    "prompt_tokens",
+    "completion_tokens",
+    "total_cost",
+    "total_latency_ms",
+    "large_prompt_requests",
+    "large_prompt_cost",
+)
+
+# Columns summed when two client-side minute rollups for the same key are merged
+MINUTE_SUM_COLUMNS = (
+    "total_requests",
+    "total_tokens",
+    "prompt_tokens",
+    "completion_tokens",
+    "input_cost",
+    "output_cost",
+    "total_cost",
+    "total_latency_ms",
+    "large_prompt_requests",
+    "large_prompt_cost",
+)
+
+RollupKey = Tuple[date, str, str, str]
+MinuteKey = Tuple[datetime, str, str, str, str]
+
+
+def _key(day: date, project: Optional[str], agent: Optional[str], model: Optional[str]) -> RollupKey:
+    """Rollup key with missing dimensions stored as empty strings"""
+    return (day, project or "", agent or "", model or "")
+
+
+def _empty_rollup(key: RollupKey) -> Dict[str, Any]:
+    """Zeroed rollup row for a key"""
+    row: Dict[str, Any] = dict(zip(("date", "project", "agent", "model"), key))
+    row.update({column: 0.0 for column in SUM_COLUMNS})
+    return row
+
+
+def rollup_deltas(
+    event_rows: Iterable[dict],
+    cost_rows: Iterable[dict],
+    minute_rows: Iterable[dict] = (),
+) -> List[Dict[str, Any]]:
+    """
+    Aggregate freshly inserted event rows into per-day rollup increments
+    
+    Each event counts ``sample_weight`` times, so totals stay unbiased when
+    the SDK samples. Client-side minute rollups in ``minute_rows`` are
+    folded in as well. Returns one row per (date, project, agent, model),
+    sorted by key so concurrent upserts lock rows in the same order.
+    """
+    cost_by_event = {row["event_id"]: row["total_cost"] for row in cost_rows}
+    deltas: Dict[RollupKey, Dict[str, Any]] = {}
+    
+    for event in event_rows:
+        key = _key(event["timestamp"].date(), event["project"], event["agent"], event["model"])
+        row = deltas.get(key)
+        if row is None:
+            row = deltas[key] = _empty_rollup(key)
+        
+        weight = event["sample_weight"]
+        cost = cost_by_event.get(event["id"], 0.0) * weight
+        row["total_requests"] += weight
+        row["total_tokens"] += event["total_tokens"] * weight
+        row["prompt_tokens"] += event["prompt_tokens"] * weight
+        row["completion_tokens"] += event["completion_tokens"] * weight
+        row["total_cost"] += cost
+        row["total_latency_ms"] += event["latency_ms"] * weight
+        if event["prompt_tokens"] > LARGE_PROMPT_TOKENS:
+            row["large_prompt_requests"] += weight
+            row["large_prompt_cost"] += cost
+    
+    for minute_row in minute_rows:
+        key = _key(minute_row["minute"].date(), minute_row["project"], minute_row["agent"], minute_row["model"])
+        row = deltas.get(key)
+        if row is None:
+            row = deltas[key] = _empty_rollup(key)
+        for column in SUM_COLUMNS:
+            row[column] += minute_row[column]
+    
+    result = [deltas[key] for key in sorted(deltas)]
+    for row in result:
+        row["avg_latency_ms"] = row["total_latency_ms"] / row["total_requests"] if row["total_requests"] else 0.0
+    return result
+
+
+async def claim_minute_rows(db: AsyncSession, rows: List[dict]) -> List[Dict[str, Any]]:
+    """
+    Client-side minute rollups that have not been applied yet
+    
+    Rows whose ``rollup_id`` is already in applied_rollups, or repeated in
+    ``rows``, are left out so a rollup sent twice is counted once. The ids
+    of the rest are recorded in the current transaction. Rows without an
+    id (from older SDKs) are always applied.
+    """
+    ids = {row["rollup_id"] for row in rows if row.get("rollup_id")}
+    applied = set()
+    if ids:
+        applied = set((await db.execute(
+            select(AppliedRollup.rollup_id).where(AppliedRollup.rollup_id.in_(ids))
+        )).scalars())
+    
+    claimed = []
+    claimed_ids = []
+    for row in rows:
+        row = dict(row)
+        rollup_id = row.pop("rollup_id", None)
+        if rollup_id:
+            if rollup_id in applied:
+                continue
+            applied.add(rollup_id)
+            claimed_ids.append({"rollup_id": rollup_id})
+        claimed.append(row)
+    
+    if claimed_ids:
+        await db.execute(insert(AppliedRollup), claimed_ids)
+    return claimed
+
+
+def merge_minute_rows(rows: Iterable[dict]) -> List[Dict[str, Any]]:
+    """
+    Merge client-side minute rollups that share a key
+    
+    A single upsert statement may not touch the same row twice, so rollups
+    for the same (minute, project, agent, step, model) are combined first.
+    Returned sorted by key.
+    """
+    merged: Dict[MinuteKey, Dict[str, Any]] = {}
+    for row in rows:
+        key = (row["minute"], row["project"], row["agent"], row["step"], row["model"])
+        target = merged.get(key)
+        if target is None:
+            merged[key] = dict(row)
+            continue
+        for column in MINUTE_SUM_COLUMNS:
+            target[column] += row[column]
+        target["min_latency_ms"] = min(target["min_latency_ms"], row["min_latency_ms"])
+        target["max_latency_ms"] = max(target["max_latency_ms"], row["max_latency_ms"])
+    return [merged[key] for key in sorted(merged)]
+
+
+def _insert(dialect_name: str):
+    """Dialect-specific insert() supporting ON CONFLICT"""
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Rollup upserts are not supported on {dialect_name}")
+    return insert
+
+
+def _upsert_statement(dialect_name: str):
+    """INSERT ... ON CONFLICT DO UPDATE adding to the existing rollup"""
+    stmt = _insert(dialect_name)(DailyAggregate)
+    excluded = stmt.excluded
+    table = DailyAggregate.__table__.c
+    
+    updates = {column: table[column] + excluded[column] for column in SUM_COLUMNS}
+    updates["avg_latency_ms"] = (
+        (table.total_latency_ms + excluded.total_latency_ms) * 1.0
+        / func.nullif(table.total_requests + excluded.total_requests, 0)
+    )
+    
+    return stmt.on_conflict_do_update(
+        index_elements=[table.date, table.project, table.agent, table.model],
+        set_=updates,
+    )
+
+
+async def apply_rollups(db: AsyncSession, deltas: List[Dict[str, Any]]):
+    """Merge rollup increments into daily_aggregates in the current transaction"""
+    if not deltas:
+        return
+    
+    await db.execute(_upsert_statement(db.bind.dialect.name), deltas)
+
+
+def _minute_upsert_statement(dialect_name: str):
+    """INSERT ... ON CONFLICT DO UPDATE merging into the existing minute rollup"""
+    stmt = _insert(dialect_name)(MinuteAggregate)
+    excluded = stmt.excluded
+    table = MinuteAggregate.__table__.c
+    
+    updates = {column: table[column] + excluded[column] for column in MINUTE_SUM_COLUMNS}
+    updates["min_latency_ms"] = case(
+        (excluded.min_latency_ms < table.min_latency_ms, excluded.min_latency_ms),
+        else_=table.min_latency_ms,
+    )
+    updates["max_latency_ms"] = case(
+        (excluded.max_latency_ms > table.max_latency_ms, excluded.max_latency_ms),
+        else_=table.max_latency_ms,
+    )
+    
+    return stmt.on_conflict_do_update(
+        index_elements=[table.minute, table.project, table.agent, table.step, table.model],
+        set_=updates,
+    )
+
+
+async def apply_minute_rollups(db: AsyncSession, rows: List[Dict[str, Any]]):
+    """Merge client-side minute rollups into minute_aggregates in the current transaction"""
+    if not rows:
+        return
+    
+    await db.execute(_minute_upsert_statement(db.bind.dialect.name), rows)
+
+
+async def rebuild_rollups(db: AsyncSession, since: Optional[date] = None) -> int:
+    """
+    Recompute daily rollups from raw events
+    
+    Without ``since`` the whole table is rebuilt; otherwise only days on or
+    after ``since`` are replaced. Returns the number of rollup rows written.
+    """
+    day = func.date(Event.timestamp).label("day")
+    weight = Event.sample_weight
+    cost = func.coalesce(Cost.total_cost, 0.0) * weight
+    is_large = Event.prompt_tokens > LARGE_PROMPT_TOKENS
+    
+    query = (
+        select(
+            day,
+            Event.project,
+            Event.agent,
+            Event.model,
+            func.sum(weight).label("total_requests"),
+            func.coalesce(func.sum(Event.total_tokens * weight), 0.0).label("total_tokens"),
+            func.coalesce(func.sum(Event.prompt_tokens * weight), 0.0).label("prompt_tokens"),
+            func.coalesce(func.sum(Event.completion_tokens * weight), 0.0).label("completion_tokens"),
+            func.coalesce(func.sum(cost), 0.0).label("total_cost"),
+            func.coalesce(func.sum(Event.latency_ms * weight), 0.0).label("total_latency_ms"),
+            func.sum(case((is_large, weight), else_=0.0)).label("large_prompt_requests"),
+            func.coalesce(func.sum(case((is_large, cost), else_=0.0)), 0.0).label("large_prompt_cost"),
+        )
+        .select_from(Event)
+        .outerjoin(Cost, Cost.event_id == Event.id)
+        .group_by(day, Event.project, Event.agent, Event.model)
+    )
+    
+    # Calls shipped as client-side minute rollups have no event rows
+    minute_day = func.date(MinuteAggregate.minute).label("day")
+    minute_query = select(
+        minute_day,
+        MinuteAggregate.project,
+        MinuteAggregate.agent,
+        MinuteAggregate.model,
+        *(func.sum(getattr(MinuteAggregate, column)).label(column) for column in SUM_COLUMNS),
+    ).group_by(minute_day, MinuteAggregate.project, MinuteAggregate.agent, MinuteAggregate.model)
+    
+    clear = delete(DailyAggregate)
+    if since:
+        since_start = datetime.combine(since, datetime.min.time())
+        query = query.where(Event.timestamp >= since_start)
+        minute_query = minute_query.where(MinuteAggregate.minute >= since_start)
+        clear = clear.where(DailyAggregate.date >= since)
+    
+    merged: Dict[RollupKey, Dict[str, Any]] = {}
+    for row in [*await db.execute(query), *await db.execute(minute_query)]:
+        day_value = row.day if isinstance(row.day, date) else date.fromisoformat(str(row.day)[:10])
+        key = _key(day_value, row.project, row.agent, row.model)
+        target = merged.get(key)
+        if target is None:
+            target = merged[key] = _empty_rollup(key)
+        for column in SUM_COLUMNS:
+            target[column] += getattr(row, column) or 0
+    
+    deltas = [merged[key] for key in sorted(merged)]
+    for row in deltas:
+        row["avg_latency_ms"] = row["total_latency_ms"] / row["total_requests"] if row["total_requests"] else 0.0
+    
+    await db.execute(clear)
+    await apply_rollups(db, deltas)
+    await db.commit()
+    return len(deltas)
+
+
+async def _rebuild_command(since: Optional[date]):
+    """Entry point for ``python -m services.rollups rebuild``"""
+    from database import SessionLocal, engine, init_models
+    
+    if since is None:
+        # A full rebuild also brings the table up to the current schema
+        async with engine.begin() as conn:
+            await conn.run_sync(DailyAggregate.__table__.drop, checkfirst=True)
+    await init_models()
+    
+    async with SessionLocal() as db:
+        written = await rebuild_rollups(db, since)
+    await engine.dispose()
+    print(f"Rebuilt {written} daily rollup rows")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Maintain daily rollups")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    rebuild = subcommands.add_parser("rebuild", help="Backfill daily_aggregates from raw events")
+    rebuild.add_argument(
+        "--since",
+        type=date.fromisoformat,
+        default=None,
+        help="Only rebuild days on or after this date (YYYY-MM-DD)",
+    )
+    args = parser.parse_args(argv)
+    
+    if args.command == "rebuild":
+        asyncio.run(_rebuild_command(args.since))
+
+
+if __name__ == "__main__":
+    main()
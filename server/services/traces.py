@@ -0,0 +1,253 @@
+"""Trace service: span trees with self time and critical path"""
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from models.database import Event, Cost, Span
+from models.schemas import TraceResponse, TraceSpan, CriticalPathSegment
+
+Interval = Tuple[float, float]
+
+
+class _Node:
+    """A span while its tree is being built; times in ms from the trace start"""
+    
+    def __init__(self, span_id: str, parent_span_id: Optional[str], kind: str, start: datetime, duration_ms: float):
+        self.span_id = span_id
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.start_time = start
+        self.duration_ms = duration_ms
+        self.name: Optional[str] = None
+        self.status = "ok"
+        self.project: Optional[str] = None
+        self.agent: Optional[str] = None
+        self.step: Optional[str] = None
+        self.model: Optional[str] = None
+        self.total_tokens: Optional[int] = None
+        self.total_cost: Optional[float] = None
+        self.attributes: Dict = {}
+        self.llm: Optional[Tuple[datetime, float]] = None  # (start, duration_ms) of its own LLM call
+        self.children: List["_Node"] = []
+        
+        # Filled in by _layout(): offsets, clipped to the parent's bounds
+        self.start = 0.0
+        self.end = 0.0
+        self.self_ms = 0.0
+        self.llm_ms = 0.0
+        self.critical_ms = 0.0
+
+
+def _union(intervals: List[Interval]) -> List[Interval]:
+    """Merge overlapping intervals"""
+    merged: List[Interval] = []
+    for start, end in sorted(i for i in intervals if i[1] > i[0]):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _measure(intervals: List[Interval]) -> float:
+    return sum(end - start for start, end in intervals)
+
+
+def _subtract(interval: Interval, covered: List[Interval]) -> List[Interval]:
+    """Parts of ``interval`` outside the (merged, sorted) ``covered`` intervals"""
+    start, end = interval
+    parts = []
+    for covered_start, covered_end in covered:
+        if covered_end <= start or covered_start >= end:
+            continue
+        if covered_start > start:
+            parts.append((start, covered_start))
+        start = max(start, covered_end)
+    if start < end:
+        parts.append((start, end))
+    return parts
+
+
+def _offset(moment: datetime, origin: datetime) -> float:
+    return (moment - origin).total_seconds() * 1000
+
+
+def _layout(node: _Node, origin: datetime, lower: float, upper: float, llm_busy: List[Interval]):
+    """
+    Place a subtree on the trace's timeline and compute self and LLM time
+    
+    Children are clipped to their parent, so work a block left running
+    after it returned does not count as its time.
+    """
+    start = _offset(node.start_time, origin)
+    node.start = min(max(start, lower), upper)
+    node.end = min(max(start + node.duration_ms, node.start), upper)
+    
+    for child in node.children:
+        _layout(child, origin, node.start, node.end, llm_busy)
+    
+    covered = _union([(child.start, child.end) for child in node.children])
+    node.self_ms = (node.end - node.start) - _measure(covered)
+    
+    if node.llm is not None:
+        llm_start = _offset(node.llm[0], origin)
+        llm = (max(llm_start, node.start), min(llm_start + node.llm[1], node.end))
+        own = _subtract(llm, covered) if llm[1] > llm[0] else []
+        node.llm_ms = _measure(own)
+        llm_busy.extend(own)
+
+
+def _critical_path(node: _Node, cursor: float, segments: List[Tuple[_Node, float, float]]):
+    """
+    Walk back from ``cursor`` through what kept ``node`` from finishing
+    
+    The child that finished last before ``cursor`` is on the path; the
+    walk continues inside it and then from its start. Time between such
+    children is the node's own. Children that ran alongside one already
+    on the path are not. Segments are collected latest first.
+    """
+    for child in sorted(node.children, key=lambda c: c.end, reverse=True):
+        if child.end > cursor or child.end <= child.start:
+            continue
+        if child.end < cursor:
+            segments.append((node, child.end, cursor))
+        _critical_path(child, child.end, segments)
+        cursor = child.start
+        if cursor <= node.start:
+            break
+    if cursor > node.start:
+        segments.append((node, node.start, cursor))
+
+
+def build_trace(trace_id: str, nodes: List[_Node]) -> Optional[TraceResponse]:
+    """Link nodes into a tree and attribute the trace's latency"""
+    if not nodes:
+        return None
+    
+    by_id = {node.span_id: node for node in nodes}
+    roots = []
+    for node in nodes:
+        parent = by_id.get(node.parent_span_id) if node.parent_span_id else None
+        if parent is None or parent is node:
+            # Spans whose parent never arrived become roots
+            roots.append(node)
+        else:
+            parent.children.append(node)
+    
+    origin = min(node.start_time for node in nodes)
+    end = max(_offset(node.start_time, origin) + node.duration_ms for node in nodes)
+    
+    # A root spanning the whole trace holds the actual roots
+    trace = _Node("", None, "trace", origin, end)
+    trace.children = roots
+    llm_busy: List[Interval] = []
+    _layout(trace, origin, 0.0, end, llm_busy)
+    
+    segments: List[Tuple[_Node, float, float]] = []
+    _critical_path(trace, end, segments)
+    critical_path = []
+    for node, start, stop in reversed(segments):
+        if node is trace:
+            # Nothing recorded was running
+            continue
+        node.critical_ms += stop - start
+        critical_path.append(CriticalPathSegment(
+            span_id=node.span_id,
+            name=node.name,
+            offset_ms=round(start, 3),
+            duration_ms=round(stop - start, 3),
+        ))
+    
+    llm_ms = _measure(_union(llm_busy))
+    
+    def to_schema(node: _Node) -> TraceSpan:
+        return TraceSpan(
+            span_id=node.span_id,
+            parent_span_id=node.parent_span_id,
+            kind=node.kind,
+            name=node.name,
+            status=node.status,
+            start_time=node.start_time,
+            offset_ms=round(node.start, 3),
+            duration_ms=round(node.duration_ms, 3),
+            self_ms=round(node.self_ms, 3),
+            llm_ms=round(node.llm_ms, 3),
+            critical_ms=round(node.critical_ms, 3),
+            project=node.project,
+            agent=node.agent,
+            step=node.step,
+            model=node.model,
+            total_tokens=node.total_tokens,
+            total_cost=node.total_cost,
+            attributes=node.attributes,
+            children=[to_schema(child) for child in sorted(node.children, key=lambda c: c.start)],
+        )
+    
+    return TraceResponse(
+        trace_id=trace_id,
+        start_time=origin,
+        duration_ms=round(end, 3),
+        llm_ms=round(llm_ms, 3),
+        non_llm_ms=round(end - llm_ms, 3),
+        total_cost=sum(node.total_cost or 0.0 for node in nodes),
+        span_count=len(nodes),
+        critical_path=critical_path,
+        spans=[to_schema(root) for root in sorted(roots, key=lambda r: r.start)],
+    )
+
+
+class TraceService:
+    """Service for reading traces"""
+    
+    async def get_trace(self, db: AsyncSession, trace_id: str) -> Optional[TraceResponse]:
+        """
+        Span tree of a trace
+        
+        Spans come from the ``spans`` table and the trace's LLM call events.
+        An event whose span has a row there is that span's own LLM call;
+        any other event is a leaf span of its own, timed from its latency.
+        """
+        nodes: Dict[str, _Node] = {}
+        
+        spans = (await db.execute(select(Span).where(Span.trace_id == trace_id))).scalars()
+        for span in spans:
+            node = nodes[span.span_id] = _Node(
+                span.span_id, span.parent_span_id, span.kind, span.start_time, span.duration_ms
+            )
+            node.name = span.name
+            node.status = span.status
+            node.project = span.project
+            node.agent = span.agent
+            node.step = span.step
+            node.attributes = span.attributes or {}
+        
+        events = await db.execute(
+            select(Event, func.coalesce(Cost.total_cost, 0.0))
+            .outerjoin(Cost, Cost.event_id == Event.id)
+            .where(Event.trace_id == trace_id)
+            .order_by(Event.timestamp)
+        )
+        for event, total_cost in events:
+            span_id = event.span_id or event.id.hex[:16]
+            start = event.timestamp - timedelta(milliseconds=event.latency_ms)
+            node = nodes.get(span_id)
+            if node is None:
+                node = nodes[span_id] = _Node(span_id, event.parent_span_id, "llm_call", start, float(event.latency_ms))
+                node.name = event.step or event.agent or event.project or event.model
+                node.project = event.project
+                node.agent = event.agent
+                node.step = event.step
+            if node.llm is None:
+                node.llm = (start, float(event.latency_ms))
+            node.model = event.model
+            node.total_tokens = (node.total_tokens or 0) + event.total_tokens
+            node.total_cost = (node.total_cost or 0.0) + total_cost
+        
+        return build_trace(trace_id, list(nodes.values()))
@@ -0,0 +1,132 @@
+"""
+Adapter dispatch and pricing lookup cost
+
+Compares the previous linear implementations (``can_handle`` on every
+adapter in turn, ``startswith`` over the whole price table in insertion
+order) with ``AdapterRegistry`` type dispatch and ``PricingIndex``, as the
+number of registered adapters and priced models grows. The new lookups
+should stay flat; the old ones grow linearly, and the old pricing scan
+also picks the wrong entry for prefix collisions (``gpt-4o-mini`` priced
+as ``gpt-4o``).
+
+Usage:
+    pip install -e sdk
+    python tests/bench_adapter_dispatch.py --lookups 200000
+
+Prints a JSON summary to stdout.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "sdk"))
+
+SIZES = (1, 10, 100, 1000)
+
+
+class ChatCompletion:
+    """Stand-in response class, declared under the OpenAI SDK's name"""
+
+    def __init__(self, model):
+        self.model = model
+        self.usage = None
+
+
+ChatCompletion.__module__ = "openai.types.chat.chat_completion"
+
+
+def ns_per_lookup(lookup, args, lookups):
+    """Best of three mean nanoseconds per call"""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter_ns()
+        for _ in range(lookups):
+            lookup(args)
+        best = min(best, (time.perf_counter_ns() - start) / lookups)
+    return round(best, 1)
+
+
+def linear_adapter(adapters, response):
+    """Previous AdapterRegistry.get_adapter"""
+    for adapter in adapters:
+        if adapter.can_handle(response):
+            return adapter
+    return None
+
+
+def linear_pricing(prices, model):
+    """Previous extract_cost model matching"""
+    model_key = model
+    for key in prices.keys():
+        if model.startswith(key):
+            model_key = key
+            break
+    return prices.get(model_key)
+
+
+def uncached_lookup(index, model):
+    """PricingIndex lookup with the per-model memo emptied first"""
+    index._cache.clear()
+    return index.lookup(model)
+
+
+def run(args):
+    from ai_observer.adapters import AdapterRegistry, OpenAIAdapter, PricingIndex, ProviderAdapter
+
+    class OtherAdapter(ProviderAdapter):
+        """Custom adapter that never matches"""
+
+        def can_handle(self, response):
+            return hasattr(response, "custom_usage")
+
+        def extract_usage(self, response):
+            return {}
+
+        def extract_cost(self, usage, model):
+            return {}
+
+    dispatch = []
+    response = ChatCompletion("gpt-4o-mini")
+    for size in SIZES:
+        registry = AdapterRegistry()
+        for _ in range(size):
+            registry.register_adapter(OtherAdapter())
+        linear = list(registry.adapters)
+        dispatch.append({
+            "custom_adapters": size,
+            "linear_ns": ns_per_lookup(lambda r: linear_adapter(linear, r), response, args.lookups),
+            "indexed_ns": ns_per_lookup(registry.get_adapter, response, args.lookups),
+        })
+
+    pricing = []
+    model = "gpt-4o-mini-2024-07-18"
+    for size in SIZES:
+        # Unrelated models first, as a large custom price table would have them
+        prices = {f"custom-model-{i}": {"input": 1.0, "output": 1.0} for i in range(size)}
+        prices.update(OpenAIAdapter.PRICING)
+        index = PricingIndex(prices)
+        pricing.append({
+            "models": len(prices),
+            "linear_ns": ns_per_lookup(lambda m: linear_pricing(prices, m), model, args.lookups),
+            "indexed_ns": ns_per_lookup(index.lookup, model, args.lookups),
+            "indexed_uncached_ns": ns_per_lookup(lambda m: uncached_lookup(index, m), model, args.lookups),
+            "linear_match": linear_pricing(prices, model),
+            "indexed_match": index.lookup(model),
+        })
+
+    return {"lookups": args.lookups, "dispatch": dispatch, "pricing": pricing}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookups", type=int, default=200000)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+AnalyticsService scaling benchmark
+
+Loads synthetic events (with cost rows) into a database and times each
+AnalyticsService query at increasing table sizes. Since aggregation runs in
+SQL, Python memory should stay flat as the table grows and query time should
+follow the database's scan speed rather than ORM row materialization.
+
+Usage:
+    pip install -r server/requirements.txt
+    python tests/bench_analytics.py --sizes 100000,1000000,10000000
+
+Uses a temporary SQLite file unless DATABASE_URL is set. Rows are added
+incrementally, so each size reuses the rows loaded for the previous one.
+Prints a JSON summary to stdout.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parent.parent / "server"
+
+MODELS = ["gpt-4o", "gpt-4o-mini", "gpt-3.5-turbo", "claude-3-5-sonnet", "claude-3-haiku"]
+AGENTS = ["planner", "retriever", "executor", "synthesizer", None]
+PROJECTS = ["support", "rag", "research", "chatbot"]
+
+
+def make_rows(count, days=45):
+    """Synthetic event and cost rows"""
+    now = datetime.utcnow()
+    events, costs = [], []
+    for _ in range(count):
+        event_id = uuid.uuid4()
+        prompt_tokens = random.randint(50, 6000)
+        completion_tokens = random.randint(20, 800)
+        events.append({
+            "id": event_id,
+            "timestamp": now - timedelta(seconds=random.randint(0, days * 86400)),
+            "event_type": "llm_call",
+            "model": random.choice(MODELS),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "latency_ms": random.randint(100, 4000),
+            "project": random.choice(PROJECTS),
+            "agent": random.choice(AGENTS),
+            "tags": {},
+        })
+        costs.append({
+            "id": uuid.uuid4(),
+            "event_id": event_id,
+            "input_cost": 0.0,
+            "output_cost": 0.0,
+            "total_cost": round(random.uniform(0.0001, 0.05), 6),
+            "currency": "USD",
+        })
+    return events, costs
+
+
+async def load(session_factory, count, chunk=50000):
+    """Append ``count`` events in chunks"""
+    from sqlalchemy import insert
+    from models.database import Event, Cost
+
+    for start in range(0, count, chunk):
+        events, costs = make_rows(min(chunk, count - start))
+        async with session_factory() as db:
+            await db.execute(insert(Event), events)
+            await db.execute(insert(Cost), costs)
+            await db.commit()
+
+
+async def measure(session_factory, name, call, repeat):
+    """Best-of-N wall time and peak Python allocation for one query"""
+    timings = []
+    peak = 0
+    for _ in range(repeat):
+        async with session_factory() as db:
+            tracemalloc.start()
+            start = time.perf_counter()
+            await call(db)
+            timings.append(time.perf_counter() - start)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    return {
+        "query": name,
+        "best_s": round(min(timings), 4),
+        "peak_python_kib": round(peak / 1024, 1),
+    }
+
+
+async def run(args):
+    sys.path.insert(0, str(SERVER_DIR))
+    from database import SessionLocal, engine, init_models
+    from services.analytics import AnalyticsService
+
+    await init_models()
+    service = AnalyticsService()
+    queries = [
+        ("get_cost_stats", lambda db: service.get_cost_stats(db)),
+        ("get_model_stats", lambda db: service.get_model_stats(db)),
+        ("get_agent_stats", lambda db: service.get_agent_stats(db)),
+        ("_get_cost_over_time", lambda db: service._get_cost_over_time(db)),
+        ("get_overview", lambda db: service.get_overview(db)),
+    ]
+
+    results = []
+    loaded = 0
+    for size in sorted(args.sizes):
+        start = time.perf_counter()
+        await load(SessionLocal, size - loaded)
+        load_s = time.perf_counter() - start
+        loaded = size
+
+        results.append({
+            "rows": size,
+            "load_s": round(load_s, 2),
+            "queries": [await measure(SessionLocal, name, call, args.repeat) for name, call in queries],
+        })
+
+    await engine.dispose()
+    return {
+        "benchmark": "analytics_scaling",
+        "database": os.environ["DATABASE_URL"].split("://")[0],
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=[100_000, 1_000_000, 10_000_000],
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Import time of the ai_observer package
+
+Runs ``python -X importtime`` in fresh interpreters and reports the
+cumulative time spent importing ``ai_observer`` (median of ``--runs``),
+the package's own modules and the slowest modules it pulls in. It also
+lists which heavy or optional modules the import loads; ``requests``, the
+provider SDKs and the SDK's transport, spool, adapters and
+instrumentation should only be loaded on first use. A second scenario
+times ``import ai_observer`` plus the first ``log_event()`` call, the
+cold-start cost a serverless function pays before its handler returns.
+
+``IMPORT_BUDGET_MS`` is enforced by ``tests/test_sdk.py``.
+
+Usage:
+    pip install -e sdk
+    python tests/bench_import_time.py --runs 10
+
+Prints a JSON summary to stdout.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SDK_DIR = Path(__file__).resolve().parent.parent / "sdk"
+
+# Cumulative import time allowed for ``import ai_observer``
+IMPORT_BUDGET_MS = 100.0
+
+# Modules ``import ai_observer`` must leave for first use
+DEFERRED_MODULES = (
+    "requests",
+    "urllib3",
+    "asyncio",
+    "openai",
+    "anthropic",
+    "ai_observer.adapters",
+    "ai_observer.instrumentation",
+    "ai_observer.spool",
+    "ai_observer.streaming",
+    "ai_observer.transport",
+)
+
+FIRST_EVENT = """
+import time
+start = time.perf_counter()
+import ai_observer
+ai_observer.configure(endpoint="http://127.0.0.1:9", flush_interval=60)
+ai_observer.log_event(model="gpt-4o-mini", prompt_tokens=10, completion_tokens=5, project="bench")
+print((time.perf_counter() - start) * 1000)
+"""
+
+LOADED_MODULES = """
+import json, sys
+before = set(sys.modules)
+import ai_observer
+print(json.dumps(sorted(set(sys.modules) - before)))
+"""
+
+
+def python(*args):
+    """Run a fresh interpreter that imports the SDK from this checkout"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SDK_DIR), env.get("PYTHONPATH")]))
+    return subprocess.run(
+        [sys.executable, *args],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def importtime():
+    """Parse one ``-X importtime`` run into {module: (self_us, cumulative_us)}"""
+    stderr = python("-X", "importtime", "-c", "import ai_observer").stderr
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def import_time_ms(runs=5):
+    """Median cumulative milliseconds spent in ``import ai_observer``"""
+    return statistics.median(importtime()["ai_observer"][1] / 1000 for _ in range(runs))
+
+
+def loaded_modules():
+    """Modules loaded by ``import ai_observer`` that were not loaded before"""
+    return json.loads(python("-c", LOADED_MODULES).stdout)
+
+
+def run(args):
+    samples = [importtime() for _ in range(args.runs)]
+    cumulative = [sample["ai_observer"][1] / 1000 for sample in samples]
+
+    # Per-module self time, median over runs
+    names = set.intersection(*(set(sample) for sample in samples))
+    self_ms = {name: statistics.median(sample[name][0] / 1000 for sample in samples) for name in names}
+    package = {name: round(ms, 3) for name, ms in sorted(self_ms.items()) if name.split(".")[0] == "ai_observer"}
+    loaded = loaded_modules()
+    slowest = sorted((name for name in self_ms if name in loaded), key=self_ms.get, reverse=True)[: args.top]
+
+    first_event = [float(python("-c", FIRST_EVENT).stdout) for _ in range(args.runs)]
+
+    median = statistics.median(cumulative)
+    return {
+        "runs": args.runs,
+        "import_ms": {
+            "median": round(median, 3),
+            "min": round(min(cumulative), 3),
+            "max": round(max(cumulative), 3),
+            "budget": IMPORT_BUDGET_MS,
+            "within_budget": median <= IMPORT_BUDGET_MS,
+        },
+        "first_event_ms": {
+            "median": round(statistics.median(first_event), 3),
+            "min": round(min(first_event), 3),
+        },
+        "package_self_ms": package,
+        "slowest_modules_ms": {name: round(self_ms[name], 3) for name in slowest},
+        "modules_loaded": len(loaded),
+        "deferred_modules_loaded": [name for name in DEFERRED_MODULES if name in loaded],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10, help="number of slowest modules to list")
+    args = parser.parse_args()
+
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
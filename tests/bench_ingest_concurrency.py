@@ -0,0 +1,149 @@
+"""
+Ingest latency under concurrent analytics load
+
+Runs the FastAPI app in-process on a single event loop (the same situation
+as one uvicorn worker) and measures POST /events latency, first on its own
+and then while other clients hammer /dashboard/overview. With a blocking
+database layer every analytics query stalls ingestion for its full
+duration; with the async layer ingest p99 should stay close to baseline.
+
+Usage:
+    pip install -r server/requirements.txt httpx
+    python tests/bench_ingest_concurrency.py --seed-events 20000 --requests 500
+
+Prints a JSON summary to stdout.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parent.parent / "server"
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(latencies_ms):
+    """Latency summary in milliseconds"""
+    return {
+        "count": len(latencies_ms),
+        "mean_ms": round(statistics.mean(latencies_ms), 3) if latencies_ms else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 50), 3),
+        "p95_ms": round(percentile(latencies_ms, 95), 3),
+        "p99_ms": round(percentile(latencies_ms, 99), 3),
+        "max_ms": round(max(latencies_ms), 3) if latencies_ms else 0.0,
+    }
+
+
+def make_event(days_back=30):
+    """Random LLM call event"""
+    timestamp = datetime.utcnow() - timedelta(seconds=random.randint(0, days_back * 86400))
+    return {
+        "timestamp": timestamp.isoformat(),
+        "model": random.choice(["gpt-4o", "gpt-4o-mini", "claude-3-5-sonnet", "claude-3-haiku"]),
+        "prompt_tokens": random.randint(50, 5000),
+        "completion_tokens": random.randint(20, 500),
+        "latency_ms": random.randint(200, 3000),
+        "total_cost": round(random.uniform(0.0001, 0.05), 6),
+        "project": random.choice(["support", "rag", "research"]),
+        "agent": random.choice(["planner", "retriever", "executor", None]),
+    }
+
+
+async def seed(client, count, batch_size=1000):
+    """Load historical events through the batch endpoint"""
+    for start in range(0, count, batch_size):
+        batch = [make_event() for _ in range(min(batch_size, count - start))]
+        response = await client.post("/events/batch", json=batch)
+        response.raise_for_status()
+
+
+async def ingest(client, requests):
+    """Post events one by one and record each latency"""
+    latencies = []
+    for _ in range(requests):
+        event = make_event(days_back=0)
+        start = time.perf_counter()
+        response = await client.post("/events", json=event)
+        latencies.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+    return latencies
+
+
+async def analytics_load(client, stop):
+    """Request the dashboard overview until told to stop"""
+    completed = 0
+    while not stop.is_set():
+        response = await client.get("/dashboard/overview")
+        response.raise_for_status()
+        completed += 1
+    return completed
+
+
+async def run(args):
+    import httpx
+
+    sys.path.insert(0, str(SERVER_DIR))
+    from api.main import app
+    from database import init_models, engine
+
+    await init_models()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await seed(client, args.seed_events)
+
+        baseline = await ingest(client, args.requests)
+
+        stop = asyncio.Event()
+        readers = [asyncio.create_task(analytics_load(client, stop)) for _ in range(args.readers)]
+        writers = [ingest(client, args.requests // args.writers) for _ in range(args.writers)]
+        loaded = [latency for batch in await asyncio.gather(*writers) for latency in batch]
+        stop.set()
+        overview_requests = sum(await asyncio.gather(*readers))
+
+    await engine.dispose()
+
+    return {
+        "benchmark": "ingest_under_analytics_load",
+        "database": os.environ["DATABASE_URL"].split("://")[0],
+        "seed_events": args.seed_events,
+        "analytics_readers": args.readers,
+        "ingest_writers": args.writers,
+        "overview_requests_completed": overview_requests,
+        "ingest_baseline": summarize(baseline),
+        "ingest_under_load": summarize(loaded),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed-events", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=4)
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Per-call overhead of ai_observer.instrument()
+
+Times ``client.chat.completions.create`` on an OpenAI client whose HTTP
+layer answers from memory, in three states: never instrumented,
+instrumented with tracking enabled, and instrumented with tracking
+disabled (which must match the baseline, since the original method is
+put back). The wrapper alone is also timed around a no-op ``create`` to
+isolate its cost from the client's own. Delivery to the collector is
+stubbed out, so only the caller-side cost is measured.
+
+Usage:
+    pip install -e sdk httpx
+    python tests/bench_instrument_overhead.py --calls 2000
+
+Prints a JSON summary to stdout.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "sdk"))
+
+COMPLETION = {
+    "id": "chatcmpl-1",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o-mini",
+    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "hi"}}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+}
+
+
+def per_call_us(call, calls, repeat):
+    """Best-of-``repeat`` mean microseconds per call"""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            call()
+        runs.append((time.perf_counter() - start) / calls * 1e6)
+    return round(min(runs), 3), round(statistics.mean(runs), 3)
+
+
+def run(args):
+    import httpx
+    import openai
+    import ai_observer
+    from ai_observer import exporter
+    from ai_observer.instrumentation import _wrap_sync
+
+    http_client = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(200, json=COMPLETION)))
+    client = openai.OpenAI(api_key="bench", base_url="http://fake/v1", http_client=http_client)
+    completion = client.chat.completions.create(model="gpt-4o-mini", messages=[])
+
+    def call():
+        client.chat.completions.create(model="gpt-4o-mini", messages=[])
+
+    # Isolated wrapper: a create() that returns a canned completion
+    def noop_create(self, *args, **kwargs):
+        return completion
+
+    wrapped = _wrap_sync(noop_create)
+
+    # Large batches so the exporter thread keeps up with the benchmark
+    ai_observer.configure(batch_size=500)
+
+    results = {}
+    with patch("ai_observer.transport.requests.Session.post", return_value=Mock(status_code=200)):
+        results["client_baseline"] = per_call_us(call, args.calls, args.repeat)
+        results["wrapper_baseline"] = per_call_us(lambda: noop_create(None), args.calls, args.repeat)
+
+        ai_observer.instrument(project="bench")
+        results["client_instrumented"] = per_call_us(call, args.calls, args.repeat)
+        results["wrapper_instrumented"] = per_call_us(lambda: wrapped(None), args.calls, args.repeat)
+        ai_observer.flush()
+
+        ai_observer.configure(enabled=False)
+        results["client_disabled"] = per_call_us(call, args.calls, args.repeat)
+        ai_observer.configure(enabled=True)
+        ai_observer.uninstrument()
+        ai_observer.flush()
+
+    summary = {name: {"best_us": best, "mean_us": mean} for name, (best, mean) in results.items()}
+    summary["overhead_us"] = {
+        "enabled": round(results["client_instrumented"][0] - results["client_baseline"][0], 3),
+        "enabled_wrapper_only": round(results["wrapper_instrumented"][0] - results["wrapper_baseline"][0], 3),
+        "disabled": round(results["client_disabled"][0] - results["client_baseline"][0], 3),
+    }
+    return {
+        "calls": args.calls,
+        "repeat": args.repeat,
+        "dropped_events": exporter.get_exporter().dropped,
+        "results": summary,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
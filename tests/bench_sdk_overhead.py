@@ -0,0 +1,369 @@
+"""
+Per-call cost of the SDK's public API
+
+Times ``observe``, ``track_response``, ``log_event`` and ``traced`` against
+a fake collector: a local HTTP server on 127.0.0.1 that accepts
+``POST /events/batch`` and counts what it receives, so the real exporter
+and transport are exercised without a database behind them.
+
+Every operation runs in three delivery modes:
+
+    batched     default: events are queued for the background exporter
+    aggregate   calls are folded into per-minute rollups (aggregate=True)
+    sync_flush  flush() after every call, i.e. each call waits for its
+                event to reach the collector
+
+and under 1/8/64 threads and 1/8/64 asyncio tasks. The total number of
+calls is split evenly across the threads or tasks. For each run the
+summary has per-call wall time (mean/p50/p99), throughput, events the
+collector received and events the SDK dropped. A separate single-threaded
+pass under tracemalloc reports the peak bytes allocated during a call and
+the bytes still held per call once the exporter has drained.
+
+Usage:
+    pip install -e sdk
+    python tests/bench_sdk_overhead.py --calls 2000
+    python tests/bench_sdk_overhead.py --output bench.json
+    python tests/bench_sdk_overhead.py --baseline bench.json --tolerance 0.25
+
+Prints a JSON summary to stdout. With ``--baseline`` every run whose mean
+per-call time grew by more than ``--tolerance`` is listed under
+``regressions`` and the script exits with status 1.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "sdk"))
+
+import ai_observer  # noqa: E402
+from ai_observer import log_event, observe, traced  # noqa: E402
+from ai_observer.exporter import get_exporter  # noqa: E402
+
+OPERATIONS = ("observe", "track_response", "log_event", "traced")
+MODES = ("batched", "aggregate", "sync_flush")
+CONCURRENCY = (1, 8, 64)
+
+RESPONSE = SimpleNamespace(
+    model="gpt-4o-mini",
+    usage=SimpleNamespace(prompt_tokens=120, completion_tokens=40, total_tokens=160),
+)
+
+
+class FakeCollector:
+    """Local HTTP server standing in for the collector"""
+
+    def __init__(self):
+        self.received = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        collector = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; without this a
+            # keep-alive request waits out the client's delayed ACK
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                payloads = json.loads(body)
+                if not isinstance(payloads, list):
+                    payloads = [payloads]
+                # A rollup stands for as many calls as it sums up
+                events = sum(
+                    payload["requests"] if payload.get("event_type") == "rollup" else 1
+                    for payload in payloads
+                )
+                with collector._lock:
+                    collector.received += events
+                    collector.requests += 1
+
+                reply = json.dumps({"status": "success", "accepted": len(payloads)}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(reply)))
+                self.end_headers()
+                self.wfile.write(reply)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.endpoint = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.server.shutdown()
+        self.server.server_close()
+        return False
+
+
+@traced(project="bench", agent="traced")
+def traced_call():
+    return RESPONSE
+
+
+@traced(project="bench", agent="traced")
+async def traced_call_async():
+    return RESPONSE
+
+
+def call(operation):
+    """One call of ``operation`` from synchronous code"""
+    if operation == "observe":
+        with observe(project="bench", agent="observe"):
+            pass
+    elif operation == "track_response":
+        with observe(project="bench", agent="track_response") as obs:
+            obs.track_response(RESPONSE)
+    elif operation == "log_event":
+        log_event(model="gpt-4o-mini", prompt_tokens=120, completion_tokens=40, latency_ms=250, project="bench", agent="log_event")
+    else:
+        traced_call()
+
+
+async def acall(operation):
+    """One call of ``operation`` from a coroutine"""
+    if operation == "observe":
+        async with observe(project="bench", agent="observe"):
+            pass
+    elif operation == "track_response":
+        async with observe(project="bench", agent="track_response") as obs:
+            obs.track_response(RESPONSE)
+    elif operation == "log_event":
+        log_event(model="gpt-4o-mini", prompt_tokens=120, completion_tokens=40, latency_ms=250, project="bench", agent="log_event")
+    else:
+        await traced_call_async()
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(latencies_us):
+    """Per-call wall time summary in microseconds"""
+    return {
+        "mean_us": round(statistics.mean(latencies_us), 3) if latencies_us else 0.0,
+        "p50_us": round(percentile(latencies_us, 50), 3),
+        "p99_us": round(percentile(latencies_us, 99), 3),
+        "max_us": round(max(latencies_us), 3) if latencies_us else 0.0,
+    }
+
+
+def run_threads(operation, mode, threads, calls):
+    """Run ``calls`` calls split over ``threads`` threads; returns (latencies_us, wall_s)"""
+    per_thread = max(1, calls // threads)
+    latencies = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(out):
+        barrier.wait()
+        for _ in range(per_thread):
+            start = time.perf_counter_ns()
+            call(operation)
+            if mode == "sync_flush":
+                ai_observer.flush()
+            out.append((time.perf_counter_ns() - start) / 1000)
+
+    workers = [threading.Thread(target=worker, args=(out,)) for out in latencies]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    wall = time.perf_counter() - start
+    return [latency for out in latencies for latency in out], wall
+
+
+def run_tasks(operation, mode, tasks, calls):
+    """Run ``calls`` calls split over ``tasks`` asyncio tasks; returns (latencies_us, wall_s)"""
+    per_task = max(1, calls // tasks)
+
+    async def worker(out):
+        for _ in range(per_task):
+            start = time.perf_counter_ns()
+            await acall(operation)
+            if mode == "sync_flush":
+                await ai_observer.aflush()
+            out.append((time.perf_counter_ns() - start) / 1000)
+            # Let the other tasks interleave, as they would around real I/O
+            await asyncio.sleep(0)
+
+    async def main():
+        latencies = [[] for _ in range(tasks)]
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(out) for out in latencies))
+        return [latency for out in latencies for latency in out], time.perf_counter() - start
+
+    return asyncio.run(main())
+
+
+def set_mode(mode):
+    ai_observer.configure(aggregate=mode == "aggregate")
+
+
+def measure(collector, operation, mode, runner, concurrency, calls):
+    """One benchmark run, including the time to drain what it queued"""
+    set_mode(mode)
+    for _ in range(min(50, calls)):
+        call(operation)
+    ai_observer.flush()
+
+    received = collector.received
+    dropped = get_exporter().dropped
+
+    run = run_threads if runner == "threads" else run_tasks
+    latencies, wall = run(operation, mode, concurrency, calls)
+
+    start = time.perf_counter()
+    ai_observer.flush()
+    drain = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "operation": operation,
+        "runner": runner,
+        "concurrency": concurrency,
+        "calls": len(latencies),
+        "wall_s": round(wall, 4),
+        "calls_per_s": round(len(latencies) / wall, 1) if wall else 0.0,
+        "drain_ms": round(drain * 1000, 3),
+        "per_call": summarize(latencies),
+        "received": collector.received - received,
+        "dropped": get_exporter().dropped - dropped,
+    }
+
+
+def measure_allocations(operation, mode, calls):
+    """Peak bytes allocated during one call and bytes retained per call"""
+    set_mode(mode)
+    for _ in range(min(50, calls)):
+        call(operation)
+    ai_observer.flush()
+
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        peak_total = 0
+        for _ in range(calls):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            call(operation)
+            if mode == "sync_flush":
+                ai_observer.flush()
+            peak_total += tracemalloc.get_traced_memory()[1] - before
+        ai_observer.flush()
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "mode": mode,
+        "operation": operation,
+        "calls": calls,
+        "peak_bytes_per_call": round(peak_total / calls, 1),
+        "retained_bytes_per_call": round(retained / calls, 1),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Runs whose mean per-call time grew by more than ``tolerance`` over ``baseline``"""
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get("results", {}).get(key)
+        if not previous or not previous["per_call"]["mean_us"]:
+            continue
+        ratio = result["per_call"]["mean_us"] / previous["per_call"]["mean_us"]
+        if ratio > 1 + tolerance:
+            regressions.append({
+                "run": key,
+                "baseline_mean_us": previous["per_call"]["mean_us"],
+                "mean_us": result["per_call"]["mean_us"],
+                "ratio": round(ratio, 3),
+            })
+    return regressions
+
+
+def run(args):
+    operations = args.operations.split(",")
+    modes = args.modes.split(",")
+
+    results = {}
+    allocations = {}
+    with FakeCollector() as collector:
+        ai_observer.configure(endpoint=collector.endpoint, batch_size=args.batch_size)
+
+        for mode in modes:
+            calls = args.sync_calls if mode == "sync_flush" else args.calls
+            for operation in operations:
+                for runner in ("threads", "asyncio"):
+                    for concurrency in CONCURRENCY:
+                        result = measure(collector, operation, mode, runner, concurrency, calls)
+                        results[f"{mode}/{operation}/{runner}-{concurrency}"] = result
+                allocations[f"{mode}/{operation}"] = measure_allocations(operation, mode, args.alloc_calls)
+
+        set_mode("batched")
+        ai_observer.flush()
+
+    return {
+        "python": platform.python_version(),
+        "calls": args.calls,
+        "sync_calls": args.sync_calls,
+        "batch_size": args.batch_size,
+        "results": results,
+        "allocations": allocations,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000, help="calls per run in the batched and aggregate modes")
+    parser.add_argument("--sync-calls", type=int, default=200, help="calls per run in the sync_flush mode")
+    parser.add_argument("--alloc-calls", type=int, default=500, help="calls per allocation measurement")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--operations", default=",".join(OPERATIONS))
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--output", help="also write the JSON summary to this file")
+    parser.add_argument("--baseline", help="JSON summary of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed growth in mean per-call time")
+    args = parser.parse_args()
+
+    summary = run(args)
+    if args.baseline:
+        with open(args.baseline) as f:
+            summary["regressions"] = compare(summary["results"], json.load(f), args.tolerance)
+
+    output = json.dumps(summary, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+    if summary.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
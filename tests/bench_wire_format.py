@@ -0,0 +1,150 @@
+"""
+Wire format comparison for SDK batches
+
+Encodes batches of realistic events the way the SDK transport does for
+every supported wire format and compression, then decodes them the way
+the collector does. Reports bytes on the wire, SDK encode time, collector
+decode time and decode plus schema validation time, next to the current
+``json=payload`` path (uncompressed JSON parsed by FastAPI).
+
+Usage:
+    pip install -r server/requirements.txt -e "sdk[msgpack]"
+    python tests/bench_wire_format.py --batch-size 100 --batches 200
+
+Prints a JSON summary to stdout.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "server"))
+sys.path.insert(0, str(ROOT / "sdk"))
+
+FORMATS = [
+    ("json", "gzip"),
+    ("json", "zstd"),
+    ("msgpack", "none"),
+    ("msgpack", "gzip"),
+    ("msgpack", "zstd"),
+]
+
+
+def make_event():
+    """Event payload shaped like the SDK's"""
+    prompt_tokens = random.randint(50, 5000)
+    completion_tokens = random.randint(20, 500)
+    input_cost = prompt_tokens * 2.5e-6
+    output_cost = completion_tokens * 1e-5
+    return {
+        "event_id": str(uuid.uuid4()),
+        "timestamp": (datetime.utcnow() - timedelta(seconds=random.randint(0, 3600))).isoformat(),
+        "event_type": "llm_call",
+        "model": random.choice(["gpt-4o", "gpt-4o-mini", "claude-3-5-sonnet", "claude-3-haiku"]),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "latency_ms": random.randint(100, 8000),
+        "input_cost": round(input_cost, 6),
+        "output_cost": round(output_cost, 6),
+        "total_cost": round(input_cost + output_cost, 6),
+        "currency": "USD",
+        "project": random.choice(["support-bot", "search", "summarizer"]),
+        "agent": random.choice(["planner", "retriever", "writer", None]),
+        "step": random.choice(["plan", "retrieve", "answer"]),
+        "user_id": f"user-{random.randint(1, 5000)}",
+        "tags": {
+            "env": "production",
+            "region": random.choice(["us-east-1", "eu-west-1"]),
+            "release": "2024.06.1",
+            "session": str(uuid.uuid4()),
+        },
+        "sample_weight": 1.0,
+    }
+
+
+def timed(fn, batches):
+    """Run fn over every batch, returning results and per-batch milliseconds"""
+    results, times = [], []
+    for batch in batches:
+        start = time.perf_counter()
+        results.append(fn(batch))
+        times.append((time.perf_counter() - start) * 1000)
+    return results, times
+
+
+def summarize(bodies, encode_ms, decode_ms, validate_ms, baseline_bytes=None):
+    size = statistics.mean(len(body) for body in bodies)
+    summary = {
+        "bytes_per_batch": round(size),
+        "encode_ms": round(statistics.mean(encode_ms), 3),
+        "decode_ms": round(statistics.mean(decode_ms), 3),
+        "decode_validate_ms": round(statistics.mean(validate_ms), 3),
+    }
+    if baseline_bytes:
+        summary["size_ratio"] = round(size / baseline_bytes, 3)
+    return summary
+
+
+def run(args):
+    from ai_observer.transport import encode_body
+    from api.wire import decode_payload
+    from models.schemas import EventCreate
+
+    random.seed(args.seed)
+    batches = [[make_event() for _ in range(args.batch_size)] for _ in range(args.batches)]
+
+    def validate(items):
+        return [EventCreate.model_validate(item) for item in items]
+
+    # Current path: requests' json= encoding, parsed by FastAPI with json.loads
+    bodies, encode_ms = timed(lambda batch: json.dumps(batch, allow_nan=False).encode(), batches)
+    decoded, decode_ms = timed(json.loads, bodies)
+    _, validate_ms = timed(lambda body: validate(json.loads(body)), bodies)
+    baseline = summarize(bodies, encode_ms, decode_ms, validate_ms)
+    results = {"json (current)": baseline}
+
+    for wire_format, compression in FORMATS:
+        encoded, encode_ms = timed(lambda batch: encode_body(batch, wire_format, compression), batches)
+        bodies = [body for body, _ in encoded]
+        headers = encoded[0][1]
+        if headers["Content-Type"] != f"application/{wire_format}" or headers.get("Content-Encoding", "none") != compression:
+            raise SystemExit(f"{wire_format}+{compression} unavailable; install the sdk[msgpack] extra")
+
+        def decode(body):
+            return decode_payload(body, headers["Content-Type"], headers.get("Content-Encoding"))
+
+        decoded, decode_ms = timed(decode, bodies)
+        if decoded != batches:
+            raise SystemExit(f"{wire_format}+{compression} did not round-trip")
+        _, validate_ms = timed(lambda body: validate(decode(body)), bodies)
+        results[f"{wire_format}+{compression}"] = summarize(
+            bodies, encode_ms, decode_ms, validate_ms, baseline["bytes_per_batch"]
+        )
+
+    return {
+        "batch_size": args.batch_size,
+        "batches": args.batches,
+        "formats": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--batches", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,38 @@
 Test suite for AI Cost Observatory SDK
 """
 
+import gc
+import gzip
+import os
+import threading
+import time
+import asyncio
 import pytest
+from types import SimpleNamespace
 from unittest.mock import Mock, patch
-from ai_observer import observe, log_event, configure
-from ai_observer.adapters import OpenAIAdapter, AnthropicAdapter
+from ai_observer import observe, log_event, configure, flush, aflush, traced
+from ai_observer import instrument, uninstrument, scope
+from ai_observer import track_retrieval, current_span, propagate
+from ai_observer.config import get_config
+from ai_observer.exporter import BatchExporter
+from ai_observer.spool import DiskSpool
+from ai_observer.aggregator import Aggregator
+from ai_observer.sampling import sample_weight
+from ai_observer import transport, get_stats
+from ai_observer.transport import CircuitBreaker, CircuitOpenError
+from ai_observer.adapters import OpenAIAdapter, AnthropicAdapter, AdapterRegistry, PricingIndex
+
+
+@pytest.fixture
+def config():
+    """The global config, put back as it was before the test"""
+    config = get_config()
+    saved = dict(config.__dict__)
+    yield config
+    enabled = saved.pop("enabled")
+    config.__dict__.update(saved)
+    # Switched through configure() so that instrumentation follows
+    configure(enabled=enabled)
 
 
 class TestConfiguration:
@@ -101,10 +129,58 @@ class TestAnthropicAdapter:
         assert usage["total_tokens"] == 300
 
 
+class TestAdapterRegistry:
+    """Test adapter dispatch and pricing lookup"""
+    
+    def test_longest_prefix_pricing(self):
+        """Model versions are priced by their longest matching prefix"""
+        index = PricingIndex(OpenAIAdapter.PRICING)
+        
+        assert index.lookup("gpt-4o-mini-2024-07-18") == OpenAIAdapter.PRICING["gpt-4o-mini"]
+        assert index.lookup("gpt-4o-2024-08-06") == OpenAIAdapter.PRICING["gpt-4o"]
+        assert index.lookup("gpt-4-0613") == OpenAIAdapter.PRICING["gpt-4"]
+        assert index.lookup("gpt-4") == OpenAIAdapter.PRICING["gpt-4"]
+        assert index.lookup("llama-3") is None
+        
+        cost = AnthropicAdapter().extract_cost({"prompt_tokens": 1_000_000}, "claude-3-5-sonnet-20241022")
+        assert cost["input_cost"] == 3.00
+    
+    def test_dispatch(self):
+        """Anthropic-shaped responses are not claimed by the OpenAI adapter"""
+        registry = AdapterRegistry()
+        
+        claude = SimpleNamespace(model="claude-3-haiku", usage=SimpleNamespace(input_tokens=1, output_tokens=1))
+        gpt = SimpleNamespace(model="gpt-4o", usage=SimpleNamespace(prompt_tokens=1, completion_tokens=1))
+        
+        assert isinstance(registry.get_adapter(claude), AnthropicAdapter)
+        assert isinstance(registry.get_adapter(gpt), OpenAIAdapter)
+        assert registry.get_adapter(object()) is None
+    
+    def test_dispatch_by_type(self):
+        """Declared response types skip can_handle and are cached"""
+        class Response:
+            pass
+        
+        class SubResponse(Response):
+            pass
+        
+        adapter = OpenAIAdapter()
+        adapter.RESPONSE_TYPES = (f"{__name__}.{Response.__qualname__}",)
+        adapter.can_handle = Mock(return_value=False)
+        
+        registry = AdapterRegistry()
+        registry.register_adapter(adapter)
+        
+        assert registry.get_adapter(Response()) is adapter
+        assert registry.get_adapter(SubResponse()) is adapter
+        adapter.can_handle.assert_not_called()
+        assert registry._by_type[SubResponse] is adapter
+
+
 class TestObservationContext:
     """Test observation context manager"""
     
-    @patch('ai_observer.core.requests.post')
+    @patch('ai_observer.transport.requests.Session.post')
     def test_observe_context(self, mock_post):
         """Test observe context manager"""
         mock_post.return_value = Mock(status_code=200)
@@ -124,6 +200,8 @@ class TestObservationContext:
         ) as obs:
             obs.track_response(mock_response)
         
+        flush()
+        
         # Verify API call was made
         assert mock_post.called
         call_args = mock_post.call_args
@@ -133,7 +211,7 @@ class TestObservationContext:
 class TestLogEvent:
     """Test manual event logging"""
     
-    @patch('ai_observer.core.requests.post')
+    @patch('ai_observer.transport.requests.Session.post')
     def test_log_event(self, mock_post):
         """Test manual event logging"""
         mock_post.return_value = Mock(status_code=200)
@@ -146,7 +224,1163 @@ class TestLogEvent:
             agent="manual",
         )
         
+        flush()
+        
         assert mock_post.called
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_log_event_timings(self, mock_post):
+        """Test that streaming timings are sent with the event"""
+        log_event(
+            model="gpt-4o",
+            prompt_tokens=200,
+            completion_tokens=100,
+            latency_ms=2500,
+            ttft_ms=500,
+            generation_ms=2000,
+        )
+        flush()
+        
+        payload = mock_post.call_args[1]["json"][0]
+        assert payload["ttft_ms"] == 500
+        assert payload["generation_ms"] == 2000
+        assert payload["tokens_per_second"] is None
+
+
+class TestBatchExporter:
+    """Test background batching exporter"""
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_enqueue_does_not_block(self, mock_post):
+        """Test that enqueueing never sends on the caller's thread"""
+        mock_post.side_effect = lambda *args, **kwargs: time.sleep(0.2)
+        exporter = BatchExporter()
+        
+        start = time.perf_counter()
+        for i in range(5):
+            exporter.enqueue("http://test:8000", {"event_id": str(i)})
+        elapsed = time.perf_counter() - start
+        
+        assert elapsed < 0.1
+        exporter.shutdown()
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_flush_sends_pending_events(self, mock_post):
+        """Test that flush delivers everything queued before it"""
+        exporter = BatchExporter()
+        for i in range(3):
+            exporter.enqueue("http://test:8000", {"event_id": str(i)})
+        
+        assert exporter.flush(timeout=5) is True
+        assert mock_post.call_count == 1
+        assert mock_post.call_args[0][0] == "http://test:8000/events/batch"
+        assert len(mock_post.call_args[1]["json"]) == 3
+        exporter.shutdown()
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_batch_split_by_endpoint(self, mock_post):
+        """Test that events for different collectors are posted separately"""
+        exporter = BatchExporter()
+        exporter.enqueue("http://a:8000", {"event_id": "1"})
+        exporter.enqueue("http://b:8000", {"event_id": "2"})
+        exporter.enqueue("http://a:8000", {"event_id": "3"})
+        exporter.flush(timeout=5)
+        
+        urls = sorted(call[0][0] for call in mock_post.call_args_list)
+        assert urls == ["http://a:8000/events/batch", "http://b:8000/events/batch"]
+        exporter.shutdown()
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_flush_by_batch_size(self, mock_post, config):
+        """Test that a full batch is sent without an explicit flush"""
+        configure(batch_size=2, flush_interval=60)
+        exporter = BatchExporter()
+        try:
+            exporter.enqueue("http://test:8000", {"event_id": "1"})
+            exporter.enqueue("http://test:8000", {"event_id": "2"})
+            
+            deadline = time.time() + 5
+            while not mock_post.called and time.time() < deadline:
+                time.sleep(0.01)
+            
+            assert mock_post.call_count == 1
+            assert len(mock_post.call_args[1]["json"]) == 2
+        finally:
+            exporter.shutdown()
+    
+    def test_queue_full_drops_event(self):
+        """Test that a full queue drops instead of blocking"""
+        exporter = BatchExporter(max_queue_size=1)
+        exporter._ensure_started = lambda: None
+        
+        assert exporter.enqueue("http://test:8000", {"event_id": "1"}) is True
+        assert exporter.enqueue("http://test:8000", {"event_id": "2"}) is False
+        assert exporter.dropped == 1
+    
+    def test_concurrent_drops_are_all_counted(self):
+        """Test that drops from many threads hitting a full queue are not lost"""
+        exporter = BatchExporter(max_queue_size=1)
+        exporter._ensure_started = lambda: None
+        exporter.enqueue("http://test:8000", {"event_id": "0"})
+        
+        def produce():
+            for i in range(2000):
+                exporter.enqueue("http://test:8000", {"event_id": str(i)})
+        
+        threads = [threading.Thread(target=produce) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert exporter.stats()["dropped"] == 8 * 2000
+    
+    def test_shutdown_rejects_new_events(self):
+        """Test that events are refused after shutdown"""
+        exporter = BatchExporter()
+        exporter.shutdown()
+        
+        assert exporter.enqueue("http://test:8000", {"event_id": "1"}) is False
+    
+    def test_drop_oldest_policy(self, config):
+        """Test that a full queue makes room by dropping its oldest event"""
+        configure(queue_policy="drop_oldest")
+        exporter = BatchExporter(max_queue_size=2)
+        exporter._ensure_started = lambda: None
+        
+        for i in range(3):
+            assert exporter.enqueue("http://test:8000", {"event_id": str(i)}) is True
+        
+        assert [payload["event_id"] for _, payload in exporter._queue.queue] == ["1", "2"]
+        assert exporter.dropped == 1
+    
+    def test_block_policy_times_out(self, config):
+        """Test that a full queue blocks the caller for at most block_timeout"""
+        configure(queue_policy="block", block_timeout=0.05)
+        exporter = BatchExporter(max_queue_size=1)
+        exporter._ensure_started = lambda: None
+        exporter.enqueue("http://test:8000", {"event_id": "1"})
+        
+        start = time.perf_counter()
+        assert exporter.enqueue("http://test:8000", {"event_id": "2"}) is False
+        
+        assert 0.05 <= time.perf_counter() - start < 1
+        assert exporter.dropped == 1
+    
+    def test_spill_policy(self, tmp_path, config):
+        """Test that a full queue spills new events to the spool"""
+        configure(queue_policy="spill", spool_dir=str(tmp_path))
+        exporter = BatchExporter(max_queue_size=1)
+        exporter._ensure_started = lambda: None
+        exporter.enqueue("http://test:8000", {"event_id": "1"})
+        
+        assert exporter.enqueue("http://test:8000", {"event_id": "2"}) is True
+        
+        assert exporter.spooled == 1
+        assert exporter.dropped == 0
+        assert DiskSpool._read(next(tmp_path.glob("*.spool"))) == [("http://test:8000", {"event_id": "2"})]
+
+
+
+class _Collector:
+    """Local HTTP collector recording the events posted to /events/batch"""
+    
+    def __init__(self):
+        import json
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        
+        events = self.events = []
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                events.extend(json.loads(body))
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.endpoint = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+class TestForkSafety:
+    """Test the exporter across fork()"""
+    
+    def test_events_delivered_once_across_fork(self, config):
+        """Test that buffered and new events from parent and workers arrive exactly once"""
+        collector = _Collector()
+        # Nothing is sent unless flushed, so events are still buffered at fork()
+        configure(endpoint=collector.endpoint, batch_size=1000, flush_interval=60)
+        try:
+            for i in range(5):
+                log_event(model="gpt-4o-mini", prompt_tokens=1, completion_tokens=1, user_id=f"parent-{i}")
+            
+            workers = []
+            for worker in range(3):
+                pid = os.fork()
+                if pid == 0:
+                    # Worker: log, flush and leave without running pytest's teardown
+                    try:
+                        for i in range(5):
+                            log_event(model="gpt-4o-mini", prompt_tokens=1, completion_tokens=1, user_id=f"worker{worker}-{i}")
+                        os._exit(0 if flush(timeout=10) else 1)
+                    finally:
+                        os._exit(1)
+                workers.append(pid)
+            
+            for pid in workers:
+                assert os.waitpid(pid, 0)[1] == 0
+            
+            log_event(model="gpt-4o-mini", prompt_tokens=1, completion_tokens=1, user_id="parent-after")
+            assert flush(timeout=10) is True
+        finally:
+            collector.close()
+        
+        expected = [f"parent-{i}" for i in range(5)] + ["parent-after"]
+        expected += [f"worker{worker}-{i}" for worker in range(3) for i in range(5)]
+        assert sorted(event["user_id"] for event in collector.events) == sorted(expected)
+
+
+class TestSelfMetrics:
+    """Test the exporter's delivery stats"""
+    
+    def test_stats_count_deliveries(self):
+        """Test that sent events, bytes and flush latency are counted"""
+        collector = _Collector()
+        exporter = BatchExporter()
+        try:
+            for i in range(3):
+                exporter.enqueue(collector.endpoint, {"event_id": str(i)})
+            exporter.flush(timeout=5)
+            
+            stats = exporter.stats()
+            assert stats["sent"] == 3
+            assert stats["bytes_sent"] > 0
+            assert stats["send_failures"] == 0
+            assert stats["flush_latency_ms"]["count"] == 1
+            assert sum(stats["flush_latency_ms"]["buckets"].values()) == 1
+        finally:
+            exporter.shutdown()
+            collector.close()
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_failures_are_recorded(self, mock_post):
+        """Test that failed sends are counted instead of swallowed"""
+        mock_post.side_effect = ConnectionError("collector down")
+        exporter = BatchExporter()
+        try:
+            exporter.enqueue("http://failing:8000", {"event_id": "1"})
+            exporter.flush(timeout=5)
+            
+            stats = exporter.stats()
+            assert stats["send_failures"] == 1
+            assert stats["dropped"] == 1
+            assert stats["sent"] == 0
+            assert "collector down" in stats["last_error"]
+        finally:
+            exporter.shutdown()
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_refused_batch_is_dropped(self, mock_post):
+        """Test that a batch refused with a 4xx is counted as dropped, not sent or spooled"""
+        mock_post.return_value = Mock(status_code=400)
+        exporter = BatchExporter()
+        try:
+            exporter.enqueue("http://collector:8000", {"event_id": "1"})
+            exporter.enqueue("http://collector:8000", {"event_id": "2"})
+            exporter.flush(timeout=5)
+            
+            stats = exporter.stats()
+            assert stats["sent"] == 0
+            assert stats["dropped"] == 2
+            assert stats["spooled"] == 0
+            assert stats["send_failures"] == 1
+            assert "HTTP 400" in stats["last_error"]
+        finally:
+            exporter.shutdown()
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_rejected_items_are_dropped(self, mock_post):
+        """Test that items rejected in the batch response are not counted as sent"""
+        results = [
+            {"index": 0, "status": "success", "event_id": "1"},
+            {"index": 1, "status": "error", "error": "model: Field required"},
+            {"index": 2, "status": "success", "event_id": "3"},
+        ]
+        mock_post.return_value = Mock(
+            status_code=200,
+            json=Mock(return_value={"accepted": 2, "rejected": 1, "results": results}),
+        )
+        exporter = BatchExporter()
+        try:
+            for i in range(3):
+                exporter.enqueue("http://collector:8000", {"event_id": str(i + 1)})
+            exporter.flush(timeout=5)
+            
+            stats = exporter.stats()
+            assert stats["sent"] == 2
+            assert stats["dropped"] == 1
+            assert "Field required" in stats["last_error"]
+        finally:
+            exporter.shutdown()
+    
+    def test_spool_evictions_are_reported(self, tmp_path, config):
+        """Test that events evicted from a full spool show up in the stats"""
+        configure(spool_dir=str(tmp_path), spool_max_bytes=2500)
+        exporter = BatchExporter()
+        try:
+            spool = exporter._get_spool()
+            spool.segment_bytes = 1000
+            for i in range(10):
+                spool.append([("http://test:8000", {"event_id": str(i), "pad": "x" * 400})])
+            
+            assert exporter.stats()["evicted"] == spool.evicted > 0
+        finally:
+            exporter.shutdown()
+    
+    def test_stats_sent_as_internal_events(self, config):
+        """Test that self_metrics_interval ships stats to the collector"""
+        collector = _Collector()
+        configure(endpoint=collector.endpoint, self_metrics_interval=0.05)
+        exporter = BatchExporter()
+        try:
+            exporter.enqueue(collector.endpoint, {"event_id": "1"})
+            time.sleep(0.1)
+            exporter.flush(timeout=5)
+            
+            reports = [event for event in collector.events if event.get("event_type") == "sdk_stats"]
+            assert reports
+            assert reports[0]["client_id"].endswith(f":{os.getpid()}")
+            assert {"queue_depth", "sent", "dropped", "retried", "bytes_sent", "flush_latency_ms"} <= set(reports[0]["stats"])
+        finally:
+            exporter.shutdown()
+            collector.close()
+
+
+def _mock_openai_response():
+    """Build a mock OpenAI chat completion"""
+    response = Mock()
+    response.model = "gpt-4o-mini"
+    response.usage = Mock()
+    response.usage.prompt_tokens = 100
+    response.usage.completion_tokens = 50
+    response.usage.total_tokens = 150
+    return response
+
+
+class TestAsyncAPI:
+    """Test asyncio support"""
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_async_observe(self, mock_post):
+        """Test async with observe(...)"""
+        async def run():
+            async with observe(project="test-project", agent="async-agent") as obs:
+                await asyncio.sleep(0)
+                obs.track_response(_mock_openai_response())
+            await aflush()
+        
+        asyncio.run(run())
+        
+        payload = mock_post.call_args[1]["json"][0]
+        assert payload["agent"] == "async-agent"
+        assert payload["prompt_tokens"] == 100
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_traced_coroutine(self, mock_post):
+        """Test @traced on a coroutine function"""
+        @traced(project="test-project", agent="coro")
+        async def call_llm():
+            await asyncio.sleep(0)
+            return _mock_openai_response()
+        
+        async def run():
+            result = await call_llm()
+            await aflush()
+            return result
+        
+        result = asyncio.run(run())
+        
+        assert result.model == "gpt-4o-mini"
+        assert mock_post.call_args[1]["json"][0]["agent"] == "coro"
+    
+    def test_traced_async_generator(self):
+        """Test @traced on an async generator"""
+        @traced(project="test-project")
+        async def stream():
+            for i in range(3):
+                yield i
+        
+        async def run():
+            return [item async for item in stream()]
+        
+        assert asyncio.run(run()) == [0, 1, 2]
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_slow_collector_does_not_block_loop(self, mock_post):
+        """Test that a slow collector never stalls the event loop"""
+        mock_post.side_effect = lambda *args, **kwargs: time.sleep(0.3)
+        
+        async def run():
+            start = time.perf_counter()
+            for _ in range(10):
+                log_event(model="gpt-4o", prompt_tokens=1, completion_tokens=1)
+                await asyncio.sleep(0)
+            elapsed = time.perf_counter() - start
+            await aflush()
+            return elapsed
+        
+        assert asyncio.run(run()) < 0.1
+
+
+def _openai_chunk(content=None, usage=None):
+    """Build an OpenAI chat completion chunk"""
+    delta = SimpleNamespace(content=content, tool_calls=None)
+    choices = [SimpleNamespace(delta=delta)] if usage is None else []
+    return SimpleNamespace(model="gpt-4o-mini", choices=choices, usage=usage)
+
+
+def _anthropic_events(text_chunks):
+    """Build the raw events of an Anthropic message stream"""
+    message = SimpleNamespace(
+        model="claude-3-5-sonnet-20241022",
+        usage=SimpleNamespace(input_tokens=200, output_tokens=1),
+    )
+    yield SimpleNamespace(type="message_start", message=message)
+    for text in text_chunks:
+        yield SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(text=text))
+    yield SimpleNamespace(type="message_delta", usage=SimpleNamespace(output_tokens=40))
+    yield SimpleNamespace(type="message_stop")
+
+
+class TestStreaming:
+    """Test streaming response tracking"""
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_openai_stream_with_usage(self, mock_post):
+        """Test that chunks pass through and the final usage chunk is recorded"""
+        chunks = [_openai_chunk("Hello"), _openai_chunk(" world")]
+        chunks.append(_openai_chunk(usage=SimpleNamespace(prompt_tokens=12, completion_tokens=2)))
+        
+        def stream():
+            time.sleep(0.05)
+            for chunk in chunks:
+                yield chunk
+                time.sleep(0.02)
+        
+        with observe(project="test-project", agent="streamer") as obs:
+            received = list(obs.track_stream(stream()))
+        flush()
+        
+        assert all(a is b for a, b in zip(received, chunks))
+        payload = mock_post.call_args[1]["json"][0]
+        assert payload["model"] == "gpt-4o-mini"
+        assert payload["prompt_tokens"] == 12
+        assert payload["completion_tokens"] == 2
+        assert payload["total_cost"] > 0
+        assert 50 <= payload["ttft_ms"] < payload["latency_ms"]
+        assert payload["generation_ms"] >= 40
+        assert payload["tokens_per_second"] > 0
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_openai_stream_closed_early(self, mock_post):
+        """Test that a stream abandoned midway is recorded with counted chunks"""
+        stream = (_openai_chunk(str(i)) for i in range(10))
+        
+        with observe(project="test-project") as obs:
+            with obs.track_stream(stream) as tracked:
+                for i, _ in enumerate(tracked):
+                    if i == 2:
+                        break
+        flush()
+        
+        payloads = mock_post.call_args[1]["json"]
+        assert len(payloads) == 1
+        assert payloads[0]["completion_tokens"] == 3
+        assert payloads[0]["prompt_tokens"] == 0
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_openai_stream_abandoned_early(self, mock_post):
+        """Test that breaking out of a stream that is never closed still records it"""
+        stream = (_openai_chunk(str(i)) for i in range(10))
+        
+        with observe(project="test-project") as obs:
+            for i, _ in enumerate(obs.track_stream(stream)):
+                if i == 1:
+                    break
+            # The wrapper is unreachable once the loop is left
+            gc.collect()
+        flush()
+        
+        payloads = mock_post.call_args[1]["json"]
+        assert len(payloads) == 1
+        assert payloads[0]["completion_tokens"] == 2
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_anthropic_async_stream(self, mock_post):
+        """Test async Anthropic streams report usage from message events"""
+        async def stream():
+            for event in _anthropic_events(["Hi", " there"]):
+                await asyncio.sleep(0)
+                yield event
+        
+        async def run():
+            async with observe(project="test-project") as obs:
+                count = 0
+                async for _ in obs.track_stream(stream()):
+                    count += 1
+            await aflush()
+            return count
+        
+        assert asyncio.run(run()) == 5
+        payload = mock_post.call_args[1]["json"][0]
+        assert payload["model"] == "claude-3-5-sonnet-20241022"
+        assert payload["prompt_tokens"] == 200
+        assert payload["completion_tokens"] == 40
+        assert payload["input_cost"] == pytest.approx(200 / 1_000_000 * 3.00)
+        assert payload["ttft_ms"] is not None
+
+
+def _fake_openai_client():
+    """OpenAI client answering every chat completion from memory"""
+    openai = pytest.importorskip("openai")
+    httpx = pytest.importorskip("httpx")
+    
+    def handler(request):
+        return httpx.Response(200, json={
+            "id": "chatcmpl-1",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o-mini",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "hi"}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+        })
+    
+    http_client = httpx.Client(transport=httpx.MockTransport(handler))
+    return openai.OpenAI(api_key="test", base_url="http://fake/v1", http_client=http_client)
+
+
+class TestInstrumentation:
+    """Test automatic client instrumentation"""
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_instrumented_calls_use_scope(self, mock_post):
+        """Test that patched create() calls are tracked with the innermost scope"""
+        client = _fake_openai_client()
+        instrument(project="default-project")
+        try:
+            with scope(agent="planner"):
+                with scope(step="plan"):
+                    response = client.chat.completions.create(model="gpt-4o-mini", messages=[])
+            client.chat.completions.create(model="gpt-4o-mini", messages=[])
+        finally:
+            uninstrument()
+        flush()
+        
+        assert response.usage.total_tokens == 12
+        payloads = mock_post.call_args[1]["json"]
+        assert [(p["project"], p["agent"], p["step"]) for p in payloads] == [
+            ("default-project", "planner", "plan"),
+            ("default-project", None, None),
+        ]
+        assert payloads[0]["prompt_tokens"] == 10
+    
+    def test_disabled_restores_originals(self, config):
+        """Test that disabling tracking puts the original methods back"""
+        resources = pytest.importorskip("openai.resources.chat")
+        original = resources.Completions.__dict__["create"]
+        
+        instrument()
+        try:
+            assert resources.Completions.__dict__["create"] is not original
+            configure(enabled=False)
+            assert resources.Completions.__dict__["create"] is original
+            assert resources.AsyncCompletions.__dict__["create"].__name__ == "create"
+            configure(enabled=True)
+            assert resources.Completions.__dict__["create"] is not original
+        finally:
+            uninstrument()
+        
+        assert resources.Completions.__dict__["create"] is original
+    
+    def test_inherited_create(self):
+        """Test that a create inherited from a base class is patched and uncovered again"""
+        import sys
+        import types
+        
+        class Base:
+            def create(self, **kwargs):
+                return None
+        
+        class Completions(Base):
+            pass
+        
+        module = types.ModuleType("fake_llm_sdk")
+        module.Completions = Completions
+        with patch.dict(sys.modules, {"fake_llm_sdk": module}), \
+                patch('ai_observer.instrumentation.TARGETS', (("fake_llm_sdk", "Completions", "AsyncCompletions"),)):
+            instrument()
+            try:
+                assert "create" in Completions.__dict__
+                assert Completions().create(model="gpt-4o-mini") is None
+            finally:
+                uninstrument()
+        
+        assert "create" not in Completions.__dict__
+        assert Completions.create is Base.create
+
+
+class TestLangChain:
+    """Test the LangChain cost callback"""
+    
+    def test_usage_counted_once_per_run(self):
+        """Test that llm_output and per-generation usage are not both counted"""
+        from ai_observer.langchain import extract_usage
+        
+        generation = SimpleNamespace(generation_info={
+            "token_usage": {"prompt_tokens": 10, "completion_tokens": 5},
+            "model_name": "gpt-4o",
+        })
+        result = SimpleNamespace(
+            llm_output={"token_usage": {"prompt_tokens": 20, "completion_tokens": 10}, "model_name": "gpt-4o"},
+            generations=[[generation], [generation]],
+        )
+        assert extract_usage(result) == {"model": "gpt-4o", "prompt_tokens": 20, "completion_tokens": 10}
+        
+        # Chat models without llm_output: summed over generations
+        message = SimpleNamespace(
+            usage_metadata={"input_tokens": 7, "output_tokens": 3},
+            response_metadata={"model_name": "claude-3-haiku"},
+        )
+        result = SimpleNamespace(llm_output=None, generations=[[SimpleNamespace(generation_info=None, message=message)]] * 2)
+        assert extract_usage(result) == {"model": "claude-3-haiku", "prompt_tokens": 14, "completion_tokens": 6}
+    
+    def test_runs_and_chain_aggregation(self):
+        """Test per-run timing on a shared callback and one record per chain"""
+        pytest.importorskip("langchain")
+        import uuid
+        from ai_observer import langchain as integration
+        
+        result = SimpleNamespace(
+            llm_output={"token_usage": {"prompt_tokens": 10, "completion_tokens": 5}, "model_name": "gpt-4o"},
+            generations=[],
+        )
+        sent = []
+        with patch.object(integration, "log_event", side_effect=lambda **event: sent.append(event)):
+            callback = integration.CostCallback(project="test", aggregate_chains=True)
+            first, second, chain, nested = (uuid.uuid4() for _ in range(4))
+            
+            # Overlapping runs outside any chain are each sent once
+            callback.on_llm_start({}, ["a"], run_id=first)
+            callback.on_llm_start({}, ["b"], run_id=second)
+            callback.on_llm_end(result, run_id=second)
+            callback.on_llm_end(result, run_id=first)
+            assert len(sent) == 2
+            
+            callback.on_chain_start({}, {}, run_id=chain)
+            callback.on_chain_start({}, {}, run_id=nested, parent_run_id=chain)
+            for parent in (chain, nested):
+                run_id = uuid.uuid4()
+                callback.on_chat_model_start({}, [[]], run_id=run_id, parent_run_id=parent)
+                callback.on_llm_end(result, run_id=run_id, parent_run_id=parent)
+            callback.on_chain_end({}, run_id=nested)
+            assert len(sent) == 2
+            callback.on_chain_end({}, run_id=chain)
+        
+        assert len(sent) == 3
+        assert sent[-1]["prompt_tokens"] == 20
+        assert sent[-1]["tags"] == {"llm_calls": 2}
+
+
+class TestHTTPTransport:
+    """Test pooled HTTP transport"""
+    
+    def test_transport_is_reused(self):
+        """Test that sends share one keep-alive pool"""
+        assert transport.get_transport() is transport.get_transport()
+    
+    def test_pool_settings_from_config(self, config):
+        """Test that configure() rebuilds the pool with new settings"""
+        original = transport.get_transport()
+        configure(pool_size=4, max_retries=1)
+        rebuilt = transport.get_transport()
+        adapter = rebuilt.session.get_adapter("http://test:8000")
+        
+        assert rebuilt is not original
+        assert adapter._pool_maxsize == 4
+        assert adapter.max_retries.total == 1
+        # A request that reached the collector may have been stored, so only connecting is retried
+        assert adapter.max_retries.connect == 1
+        assert (adapter.max_retries.read, adapter.max_retries.status) == (0, 0)
+    
+    def test_new_pool_after_fork(self):
+        """Test that a child process never reuses the parent's pool"""
+        parent = transport.get_transport()
+        
+        with patch('ai_observer.transport.os.getpid', return_value=parent.pid + 1):
+            child = transport.get_transport()
+        
+        assert child is not parent
+        assert child.pid == parent.pid + 1
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_msgpack_gzip_body(self, mock_post, config):
+        """Test that batches can be sent as compressed msgpack"""
+        msgpack = pytest.importorskip("msgpack")
+        mock_post.return_value = Mock(status_code=200)
+        configure(wire_format="msgpack", compression="gzip")
+        transport.HTTPTransport().post("http://wire:8000/events/batch", [{"model": "gpt-4o"}])
+        
+        kwargs = mock_post.call_args[1]
+        assert kwargs["headers"]["Content-Type"] == "application/msgpack"
+        assert kwargs["headers"]["Content-Encoding"] == "gzip"
+        assert msgpack.unpackb(gzip.decompress(kwargs["data"])) == [{"model": "gpt-4o"}]
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_falls_back_to_json_for_old_collector(self, mock_post, config):
+        """Test that a collector rejecting the encoding gets plain JSON from then on"""
+        mock_post.side_effect = [Mock(status_code=415), Mock(status_code=200), Mock(status_code=200)]
+        client = transport.HTTPTransport()
+        configure(wire_format="msgpack", compression="gzip")
+        client.post("http://old:8000/events/batch", [{"model": "gpt-4o"}])
+        client.post("http://old:8000/events/batch", [{"model": "gpt-4o"}])
+        
+        sent = [call[1] for call in mock_post.call_args_list]
+        assert "data" in sent[0]
+        assert sent[1]["json"] == [{"model": "gpt-4o"}]
+        assert sent[2]["json"] == [{"model": "gpt-4o"}]
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_validation_error_keeps_encoding(self, mock_post, config):
+        """Test that a 422 for one malformed batch does not downgrade the collector to JSON"""
+        mock_post.side_effect = [Mock(status_code=422), Mock(status_code=200)]
+        client = transport.HTTPTransport()
+        configure(wire_format="msgpack", compression="gzip")
+        client.post("http://new:8000/events/batch", [{"model": None}])
+        client.post("http://new:8000/events/batch", [{"model": "gpt-4o"}])
+        
+        assert mock_post.call_count == 2
+        assert all("data" in call[1] for call in mock_post.call_args_list)
+        assert client.json_only == set()
+
+
+
+class TestAggregation:
+    """Test client-side pre-aggregation"""
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_calls_are_shipped_as_rollups(self, mock_post):
+        """Test that aggregated calls are sent as one rollup per key"""
+        for latency in (120, 80, 300):
+            log_event(
+                model="gpt-4o-mini",
+                prompt_tokens=100,
+                completion_tokens=10,
+                latency_ms=latency,
+                total_cost=0.001,
+                project="classifier",
+                agent="intent",
+                aggregate=True,
+            )
+        log_event(model="gpt-4o-mini", prompt_tokens=5, completion_tokens=1, project="classifier", aggregate=True)
+        flush()
+        
+        payloads = sorted(mock_post.call_args[1]["json"], key=lambda payload: -payload["requests"])
+        assert len(payloads) == 2
+        assert payloads[0]["event_type"] == "rollup"
+        assert payloads[0]["requests"] == 3
+        assert payloads[0]["prompt_tokens"] == 300
+        assert payloads[0]["total_cost"] == pytest.approx(0.003)
+        assert payloads[0]["latency_sum_ms"] == 500
+        assert (payloads[0]["latency_min_ms"], payloads[0]["latency_max_ms"]) == (80, 300)
+        assert payloads[0]["timestamp"].endswith(":00")
+        assert payloads[1]["agent"] is None
+        # Each rollup has its own id, so the collector can skip one sent twice
+        assert len({payload["rollup_id"] for payload in payloads}) == 2
+    
+    def test_calls_after_shutdown_are_dropped(self):
+        """Test that a closed exporter drops aggregated calls instead of piling them up"""
+        exporter = BatchExporter()
+        exporter.shutdown()
+        
+        with patch('ai_observer.exporter.get_aggregator') as get_aggregator:
+            assert exporter.aggregate("http://test:8000", model="gpt-4o-mini") is False
+        
+        get_aggregator.return_value.add.assert_not_called()
+        assert exporter.stats()["dropped"] == 1
+    
+    def test_only_finished_minutes_are_drained(self):
+        """Test that the current minute keeps accumulating until it is over"""
+        aggregator = Aggregator()
+        with patch('ai_observer.aggregator.time.time', return_value=600.0):
+            aggregator.add("http://test:8000", "gpt-4o-mini", 10, 1, 11, 50, 0.0, 0.0, 0.001, "p", None, None)
+            assert aggregator.drain() == []
+        
+        with patch('ai_observer.aggregator.time.time', return_value=660.0):
+            aggregator.add("http://test:8000", "gpt-4o-mini", 10, 1, 11, 50, 0.0, 0.0, 0.001, "p", None, None)
+            drained = aggregator.drain()
+            assert [payload["requests"] for _, payload in drained] == [1]
+            assert aggregator.drain(include_current=True)[0][1]["timestamp"] == "1970-01-01T00:11:00"
+
+
+class TestSampling:
+    """Test head sampling with per-event weights"""
+    
+    def test_fixed_rate_weights(self, config):
+        """Test that kept events carry the inverse of the sample rate"""
+        configure(sample_rate=0.25)
+        with patch('ai_observer.sampling.random.random', side_effect=[0.1, 0.9]):
+            assert sample_weight("bulk", 0.001, 100) == 4.0
+            assert sample_weight("bulk", 0.001, 100) is None
+    
+    def test_project_rates_and_always_keep(self, config):
+        """Test per-project rates and that expensive or slow calls are always kept"""
+        configure(
+            sample_rate=1.0,
+            project_sample_rates={"bulk": 0.0},
+            sample_keep_cost=0.05,
+            sample_keep_latency_ms=5000,
+        )
+        assert sample_weight("bulk", 0.001, 100) is None
+        assert sample_weight("bulk", 0.10, 100) == 1.0
+        assert sample_weight("bulk", 0.001, 8000) == 1.0
+        assert sample_weight("other", 0.001, 100) == 1.0
+        
+        # None turns the always-keep thresholds off again
+        configure(sample_keep_cost=None, sample_keep_latency_ms=None)
+        assert sample_weight("bulk", 0.10, 100) is None
+        assert sample_weight("bulk", 0.001, 8000) is None
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_weight_is_sent(self, mock_post, config):
+        """Test that the weight travels with the event"""
+        configure(sample_rate=0.5)
+        with patch('ai_observer.sampling.random.random', return_value=0.0):
+            log_event(model="gpt-4o-mini", prompt_tokens=10, completion_tokens=1, project="bulk")
+        flush()
+        
+        assert mock_post.call_args[1]["json"][0]["sample_weight"] == 2.0
+
+
+class TestCircuitBreaker:
+    """Test the collector circuit breaker"""
+    
+    def test_opens_after_threshold(self):
+        """Test that the circuit opens after N consecutive failures"""
+        breaker = CircuitBreaker(threshold=3, backoff=10)
+        for _ in range(2):
+            assert breaker.allow()
+            breaker.record_failure()
+        assert breaker.state == CircuitBreaker.CLOSED
+        
+        breaker.record_failure()
+        
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+        assert breaker.short_circuited == 1
+        assert 5 <= breaker.retry_after() <= 10
+    
+    def test_half_open_probe(self):
+        """Test that one probe is let through and its result decides the state"""
+        breaker = CircuitBreaker(threshold=1, backoff=0.01, max_backoff=0.04)
+        breaker.record_failure()
+        time.sleep(0.02)
+        
+        assert breaker.allow()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker.allow()
+        
+        # A failed probe reopens for longer, capped at max_backoff
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.times_opened == 2
+        assert 0.01 <= breaker.retry_after() <= 0.04
+        
+        time.sleep(0.05)
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.consecutive_failures == 0
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_open_circuit_skips_network(self, mock_post, config):
+        """Test that sends fail fast while the circuit is open"""
+        mock_post.side_effect = ConnectionError("collector down")
+        configure(breaker_threshold=2, breaker_backoff=30)
+        client = transport.HTTPTransport()
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                client.post("http://down:8000/events/batch", [])
+        
+        start = time.perf_counter()
+        with pytest.raises(CircuitOpenError):
+            client.post("http://down:8000/events/batch", [])
+        
+        assert time.perf_counter() - start < 0.01
+        assert mock_post.call_count == 2
+        assert client.breakers["http://down:8000"].state == CircuitBreaker.OPEN
+    
+    def test_get_stats(self):
+        """Test that breaker state is reported through get_stats()"""
+        transport.get_transport().breaker_for("http://stats:8000/events/batch").record_failure()
+        
+        stats = get_stats()
+        
+        assert stats["circuit_breakers"]["http://stats:8000"]["consecutive_failures"] == 1
+        assert stats["circuit_breakers"]["http://stats:8000"]["state"] == "closed"
+        assert {"queue_depth", "dropped", "spooled", "spool_bytes"} <= set(stats)
+
+
+class TestDiskSpool:
+    """Test on-disk spooling during collector outages"""
+    
+    def test_outage_spools_and_replays(self, tmp_path, config):
+        """Test that events survive an outage and are replayed in order"""
+        configure(spool_dir=str(tmp_path), breaker_threshold=1, breaker_backoff=0.2)
+        exporter = BatchExporter()
+        try:
+            with patch('ai_observer.transport.requests.Session.post') as mock_post:
+                mock_post.side_effect = ConnectionError("collector down")
+                for i in range(3):
+                    exporter.enqueue("http://test:8000", {"event_id": str(i)})
+                exporter.flush(timeout=5)
+                
+                # Later batches skip the network while the circuit is open
+                exporter.enqueue("http://test:8000", {"event_id": "3"})
+                exporter.flush(timeout=5)
+                
+                assert mock_post.call_count == 1
+                assert exporter.spooled == 4
+                assert len(list(tmp_path.glob("*.spool"))) == 1
+            
+            with patch('ai_observer.transport.requests.Session.post') as mock_post:
+                mock_post.return_value = Mock(status_code=200)
+                deadline = time.time() + 5
+                while list(tmp_path.glob("*.spool")) and time.time() < deadline:
+                    time.sleep(0.05)
+                
+                assert not list(tmp_path.glob("*.spool"))
+                sent = [payload["event_id"] for payload in mock_post.call_args[1]["json"]]
+                assert sent == ["0", "1", "2", "3"]
+        finally:
+            exporter.shutdown()
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_only_idempotent_payloads_are_spooled(self, mock_post, tmp_path, config):
+        """Test that payloads the collector cannot deduplicate are dropped, not sent again"""
+        mock_post.return_value = Mock(status_code=503)
+        configure(spool_dir=str(tmp_path))
+        exporter = BatchExporter()
+        try:
+            exporter.enqueue("http://test:8000", {"event_id": "1"})
+            exporter.enqueue("http://test:8000", {"event_type": "rollup", "rollup_id": "r1"})
+            exporter.enqueue("http://test:8000", {"event_type": "span", "span_id": "s1"})
+            exporter.enqueue("http://test:8000", {"event_type": "sdk_stats", "client_id": "host:1"})
+            exporter.flush(timeout=5)
+            
+            assert exporter.spooled == 3
+            assert exporter.dropped == 1
+        finally:
+            exporter.shutdown()
+    
+    def test_spool_dir_none_turns_spool_off(self, tmp_path, config):
+        """Test that configure(spool_dir=None) closes the spool"""
+        configure(spool_dir=str(tmp_path))
+        exporter = BatchExporter()
+        try:
+            assert exporter._get_spool() is not None
+            
+            configure(spool_dir=None)
+            
+            assert get_config().spool_dir is None
+            assert exporter._get_spool() is None
+        finally:
+            exporter.shutdown()
+    
+    def test_size_cap_evicts_oldest(self, tmp_path):
+        """Test that the oldest segments are evicted past max_bytes"""
+        spool = DiskSpool(str(tmp_path), max_bytes=2500, segment_bytes=1000)
+        for i in range(10):
+            spool.append([("http://test:8000", {"event_id": str(i), "pad": "x" * 400})])
+        
+        assert spool.size <= 2500
+        assert spool.evicted > 0
+        
+        sent = []
+        while len(spool):
+            spool.replay_oldest(lambda url, payloads: sent.extend(payloads), batch_size=100)
+        
+        assert [payload["event_id"] for payload in sent] == [str(i) for i in range(spool.evicted, 10)]
+    
+    def test_partial_replay_is_not_resent(self, tmp_path):
+        """Test that a replay failing halfway keeps only the undelivered records"""
+        spool = DiskSpool(str(tmp_path), max_bytes=10 ** 6)
+        spool.append([("http://test:8000", {"event_id": str(i)}) for i in range(4)])
+        
+        sent = []
+        
+        def flaky_send(url, payloads):
+            if sent:
+                raise ConnectionError("collector down")
+            sent.extend(payloads)
+        
+        with pytest.raises(ConnectionError):
+            spool.replay_oldest(flaky_send, batch_size=2)
+        spool.replay_oldest(lambda url, payloads: sent.extend(payloads), batch_size=2)
+        
+        assert [payload["event_id"] for payload in sent] == ["0", "1", "2", "3"]
+        assert len(spool) == 0
+    
+    def test_torn_line_is_skipped(self, tmp_path):
+        """Test that a record cut short by a crash does not block replay"""
+        spool = DiskSpool(str(tmp_path), max_bytes=10 ** 6)
+        spool.append([("http://test:8000", {"event_id": "1"})])
+        spool.close()
+        segment = next(tmp_path.glob("*.spool"))
+        with open(segment, "ab") as f:
+            f.write(b'{"endpoint": "http://test:8000", "payl')
+        
+        sent = []
+        DiskSpool(str(tmp_path), max_bytes=10 ** 6).replay_oldest(
+            lambda url, payloads: sent.extend(payloads), batch_size=10
+        )
+        
+        assert sent == [{"event_id": "1"}]
+
+
+class TestTracing:
+    """Test trace and span propagation"""
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_single_block_sends_one_record(self, mock_post):
+        """Test that a block with one LLM call is sent as that call, with trace ids"""
+        with observe(project="test-project", agent="solo") as obs:
+            obs.track_response(_mock_openai_response())
+        flush()
+        
+        payloads = mock_post.call_args[1]["json"]
+        assert len(payloads) == 1
+        assert len(payloads[0]["trace_id"]) == 32
+        assert len(payloads[0]["span_id"]) == 16
+        assert payloads[0]["parent_span_id"] is None
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_nested_blocks_form_a_tree(self, mock_post):
+        """Test that nested blocks, their calls and retrievals share a trace"""
+        with observe(project="test-project", agent="orchestrator") as outer:
+            outer.track_response(_mock_openai_response())
+            track_retrieval(chunks=4, context_tokens=800, source="pinecone", latency_ms=30)
+            with observe(project="test-project", agent="writer") as inner:
+                inner.track_response(_mock_openai_response())
+        flush()
+        
+        payloads = mock_post.call_args[1]["json"]
+        root = next(p for p in payloads if p.get("event_type") == "span")
+        retrieval = next(p for p in payloads if p.get("event_type") == "retrieval")
+        calls = {p["agent"]: p for p in payloads if p.get("event_type") == "llm_call"}
+        
+        assert {p["trace_id"] for p in payloads} == {root["trace_id"]}
+        assert root["parent_span_id"] is None
+        assert root["name"] == "orchestrator"
+        # The block's own call carries the block's span
+        assert calls["orchestrator"]["span_id"] == root["span_id"]
+        assert retrieval["parent_span_id"] == root["span_id"]
+        assert retrieval["latency_ms"] == 30
+        assert calls["writer"]["parent_span_id"] == root["span_id"]
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_error_marks_span(self, mock_post):
+        """Test that an exception leaving a block is recorded on its span"""
+        with pytest.raises(RuntimeError):
+            with observe(project="test-project", agent="outer"):
+                log_event(model="gpt-4o-mini", prompt_tokens=1, completion_tokens=1)
+                raise RuntimeError("boom")
+        flush()
+        
+        span = next(p for p in mock_post.call_args[1]["json"] if p.get("event_type") == "span")
+        assert span["status"] == "error"
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_asyncio_tasks_inherit_span(self, mock_post):
+        """Test that concurrent tasks started in a block are children of its span"""
+        async def agent(name):
+            async with observe(project="test-project", agent=name) as obs:
+                await asyncio.sleep(0)
+                obs.track_response(_mock_openai_response())
+        
+        async def run():
+            async with observe(project="test-project", agent="planner"):
+                await asyncio.gather(agent("a"), agent("b"))
+            await aflush()
+        
+        asyncio.run(run())
+        
+        payloads = mock_post.call_args[1]["json"]
+        root = next(p for p in payloads if p.get("event_type") == "span")
+        children = [p for p in payloads if p.get("agent") in ("a", "b")]
+        assert len(children) == 2
+        assert {p["parent_span_id"] for p in children} == {root["span_id"]}
+        assert len({p["span_id"] for p in children}) == 2
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_propagate_into_thread(self, mock_post):
+        """Test that propagate() carries the current span into another thread"""
+        def work():
+            log_event(model="gpt-4o-mini", prompt_tokens=1, completion_tokens=1, agent="worker")
+        
+        with observe(project="test-project", agent="parent"):
+            span = current_span()
+            thread = threading.Thread(target=propagate(work))
+            thread.start()
+            thread.join()
+        flush()
+        
+        payloads = mock_post.call_args[1]["json"]
+        worker = next(p for p in payloads if p.get("agent") == "worker")
+        assert worker["trace_id"] == span.trace_id
+        assert worker["parent_span_id"] == span.span_id
+        assert current_span() is None
+    
+    @patch('ai_observer.transport.requests.Session.post')
+    def test_tracing_disabled(self, mock_post, config):
+        """Test that no ids are sent with tracing turned off"""
+        configure(tracing=False)
+        with observe(project="test-project") as obs:
+            assert current_span() is None
+            obs.track_response(_mock_openai_response())
+        flush()
+        
+        payloads = mock_post.call_args[1]["json"]
+        assert len(payloads) == 1
+        assert payloads[0]["trace_id"] is None
+
+
+class TestImportTime:
+    """Test the cost of importing the SDK"""
+    
+    def test_heavy_modules_are_deferred(self):
+        """Test that requests, provider SDKs and optional parts load on first use"""
+        from bench_import_time import DEFERRED_MODULES, loaded_modules
+        
+        loaded = loaded_modules()
+        
+        assert "ai_observer.core" in loaded
+        assert [name for name in DEFERRED_MODULES if name in loaded] == []
+    
+    def test_import_budget(self):
+        """Test that import ai_observer stays within its time budget"""
+        from bench_import_time import IMPORT_BUDGET_MS, import_time_ms
+        
+        assert import_time_ms(runs=3) <= IMPORT_BUDGET_MS
 
 
 if __name__ == "__main__":
@@ -0,0 +1,475 @@
+"""
+Test suite for the AI Cost Observatory collector API
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("aiosqlite")
+
+# The engine is created when the server package is imported, so point it at
+# a throwaway SQLite database first
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test_server.db"
+sys.path.insert(0, str(Path(__file__).parent.parent / "server"))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from api.main import app
+from database import SessionLocal, engine
+from models.database import Base, DailyAggregate
+from services.rollups import rebuild_rollups
+
+DAY = datetime(2026, 3, 2, 12, 0, 0)
+
+
+@pytest.fixture
+def client():
+    """Test client on empty tables"""
+    async def reset():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+    
+    with TestClient(app) as test_client:
+        test_client.portal.call(reset)
+        yield test_client
+        # Pooled connections belong to the client's event loop
+        test_client.portal.call(engine.dispose)
+
+
+def _event(**fields):
+    """An llm_call item as the SDK sends it"""
+    event = {
+        "event_id": str(uuid.uuid4()),
+        "timestamp": DAY.isoformat(),
+        "model": "gpt-4o-mini",
+        "prompt_tokens": 100,
+        "completion_tokens": 20,
+        "latency_ms": 250,
+        "total_cost": 0.01,
+        "project": "rag-app",
+        "agent": "planner",
+    }
+    event.update(fields)
+    return event
+
+
+def _daily_totals(client):
+    """daily_aggregates rows keyed by (date, project, agent, model)"""
+    async def read():
+        async with SessionLocal() as db:
+            rows = (await db.execute(select(DailyAggregate))).scalars().all()
+        return {
+            (row.date, row.project, row.agent, row.model): (
+                row.total_requests,
+                row.total_tokens,
+                round(row.total_cost, 6),
+                row.total_latency_ms,
+                row.large_prompt_requests,
+            )
+            for row in rows
+        }
+    
+    return client.portal.call(read)
+
+
+class TestBatchIngestion:
+    """Test POST /events/batch"""
+    
+    def test_partial_failure_uses_savepoints(self, client):
+        """Test that an event failing at insert time only rejects itself"""
+        good = [_event(), _event(agent="writer")]
+        # Valid for the schema, but too large for an SQLite INTEGER
+        bad = _event(prompt_tokens=2 ** 70)
+        
+        response = client.post("/events/batch", json=[good[0], bad, good[1]])
+        
+        assert response.status_code == 200
+        body = response.json()
+        assert (body["accepted"], body["rejected"]) == (2, 1)
+        assert [result["status"] for result in body["results"]] == ["success", "error", "success"]
+        assert body["results"][1]["error"]
+        
+        stored = {item["id"] for item in client.get("/events").json()["items"]}
+        assert stored == {event["event_id"] for event in good}
+        # The rejected event left nothing behind in the daily rollups
+        assert sum(totals[0] for totals in _daily_totals(client).values()) == 2
+    
+    def test_schema_errors_are_reported_per_item(self, client):
+        """Test that invalid items are rejected without an insert failure"""
+        response = client.post("/events/batch", json=[_event(), {"prompt_tokens": 1}])
+        
+        body = response.json()
+        assert (body["accepted"], body["rejected"]) == (1, 1)
+        assert "model" in body["results"][1]["error"]
+    
+    def test_resent_items_are_stored_once(self, client):
+        """Test that events and spans sent twice are stored once"""
+        batch = [
+            _event(),
+            {"event_type": "span", "timestamp": DAY.isoformat(), "trace_id": "a" * 32, "span_id": "b" * 16},
+        ]
+        
+        for _ in range(2):
+            assert client.post("/events/batch", json=batch).json()["accepted"] == 2
+        
+        assert len(client.get("/events").json()["items"]) == 1
+        assert client.get(f"/traces/{'a' * 32}").json()["span_count"] == 1
+
+
+class TestRollups:
+    """Test the daily and minute aggregates maintained at ingestion"""
+    
+    def test_upserts_match_rebuild(self, client):
+        """Test that incremental daily/minute upserts equal a rebuild from scratch"""
+        next_day = (DAY + timedelta(days=1)).isoformat()
+        client.post("/events/batch", json=[
+            _event(),
+            _event(prompt_tokens=5000, total_cost=0.2),
+            _event(agent=None, model="gpt-4o"),
+            _event(timestamp=next_day, sample_weight=10.0),
+        ])
+        # Second batch updates rows created by the first
+        client.post("/events/batch", json=[
+            _event(latency_ms=750),
+            {
+                "event_type": "rollup",
+                "rollup_id": uuid.uuid4().hex,
+                "timestamp": DAY.replace(minute=0).isoformat(),
+                "model": "gpt-4o-mini",
+                "project": "rag-app",
+                "agent": "planner",
+                "requests": 4,
+                "prompt_tokens": 400,
+                "completion_tokens": 40,
+                "total_cost": 0.04,
+                "latency_sum_ms": 1000,
+            },
+        ])
+        
+        incremental = _daily_totals(client)
+        
+        async def rebuild():
+            async with SessionLocal() as db:
+                await rebuild_rollups(db)
+        
+        client.portal.call(rebuild)
+        
+        assert _daily_totals(client) == incremental
+        planner = incremental[(DAY.date(), "rag-app", "planner", "gpt-4o-mini")]
+        assert planner == (7.0, 5700.0, 0.26, 2250.0, 1.0)
+        assert incremental[((DAY + timedelta(days=1)).date(), "rag-app", "planner", "gpt-4o-mini")][0] == 10.0
+    
+    def test_replayed_rollup_is_applied_once(self, client):
+        """Test that a rollup sent twice with the same rollup_id is counted once"""
+        rollup = {
+            "event_type": "rollup",
+            "rollup_id": "c" * 32,
+            "timestamp": DAY.isoformat(),
+            "model": "gpt-4o-mini",
+            "project": "classifier",
+            "requests": 5,
+            "prompt_tokens": 50,
+        }
+        
+        for _ in range(2):
+            assert client.post("/events/batch", json=[rollup]).json()["accepted"] == 1
+        # The same id twice in one batch is also applied once
+        client.post("/events/batch", json=[dict(rollup, rollup_id="d" * 32)] * 2)
+        
+        assert _daily_totals(client)[(DAY.date(), "classifier", "", "gpt-4o-mini")][0] == 10
+
+
+class TestEventPages:
+    """Test keyset pagination of GET /events"""
+    
+    def test_tied_timestamps(self, client):
+        """Test that paging through events sharing a timestamp skips and repeats nothing"""
+        events = [_event() for _ in range(7)]
+        events += [_event(timestamp=(DAY + timedelta(seconds=i)).isoformat()) for i in (-1, 1, 1)]
+        client.post("/events/batch", json=events)
+        
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+            page = client.get("/events", params=params).json()
+            seen.extend(item["id"] for item in page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        
+        assert len(seen) == len(set(seen)) == len(events)
+        assert set(seen) == {event["event_id"] for event in events}
+    
+    def test_invalid_cursor(self, client):
+        """Test that a cursor that cannot be decoded is a client error"""
+        assert client.get("/events", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+class TestExport:
+    """Test GET /events/export"""
+    
+    def test_csv(self, client):
+        """Test that CSV exports every event with its cost, oldest first"""
+        events = [_event(tags={"env": "prod"}), _event(timestamp=(DAY - timedelta(hours=1)).isoformat())]
+        client.post("/events/batch", json=events)
+        
+        response = client.get("/events/export", params={"format": "csv"})
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert [row["id"] for row in rows] == [events[1]["event_id"], events[0]["event_id"]]
+        assert rows[1]["prompt_tokens"] == "100"
+        assert float(rows[1]["total_cost"]) == pytest.approx(0.01)
+        assert json.loads(rows[1]["tags"]) == {"env": "prod"}
+        assert rows[0]["tags"] == ""
+    
+    def test_ndjson_with_filter(self, client):
+        """Test that NDJSON exports one JSON object per matching event"""
+        client.post("/events/batch", json=[_event(), _event(project="other")])
+        
+        response = client.get("/events/export", params={"format": "ndjson", "project": "rag-app"})
+        
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert len(records) == 1
+        assert records[0]["project"] == "rag-app"
+        assert records[0]["model"] == "gpt-4o-mini"
+        assert records[0]["total_cost"] == pytest.approx(0.01)
+    
+    def test_empty_csv_has_header(self, client):
+        """Test that an export with no events still has the header row"""
+        response = client.get("/events/export", params={"format": "csv"})
+        
+        assert response.text.splitlines()[0].startswith("id,timestamp,event_type,model")
+
+
+class TestWireFormat:
+    """Test request body decoding on the ingestion endpoints"""
+    
+    def test_gzip_json(self, client):
+        """Test that a gzip-compressed JSON batch is accepted"""
+        body = gzip.compress(json.dumps([_event()]).encode())
+        
+        response = client.post(
+            "/events/batch",
+            content=body,
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+        )
+        
+        assert response.status_code == 200
+        assert response.json()["accepted"] == 1
+    
+    def test_gzip_msgpack(self, client):
+        """Test that a gzip-compressed msgpack batch is accepted"""
+        msgpack = pytest.importorskip("msgpack")
+        body = gzip.compress(msgpack.packb([_event(), _event()]))
+        
+        response = client.post(
+            "/events/batch",
+            content=body,
+            headers={"Content-Type": "application/msgpack", "Content-Encoding": "gzip"},
+        )
+        
+        assert response.json()["accepted"] == 2
+    
+    def test_unsupported_encoding(self, client):
+        """Test that an unknown Content-Type or Content-Encoding is a 415"""
+        body = json.dumps([_event()]).encode()
+        
+        as_text = client.post("/events/batch", content=body, headers={"Content-Type": "text/plain"})
+        as_brotli = client.post(
+            "/events/batch",
+            content=body,
+            headers={"Content-Type": "application/json", "Content-Encoding": "br"},
+        )
+        
+        assert as_text.status_code == 415
+        assert as_brotli.status_code == 415
+    
+    def test_malformed_body(self, client):
+        """Test that a body that does not decode is a 400"""
+        corrupt_gzip = client.post(
+            "/events/batch",
+            content=b"not gzip at all",
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+        )
+        bad_json = client.post("/events/batch", content=b"[{", headers={"Content-Type": "application/json"})
+        
+        assert corrupt_gzip.status_code == 400
+        assert bad_json.status_code == 400
+
+
+class TestTraces:
+    """Test GET /traces/{trace_id}"""
+    
+    def test_critical_path(self, client):
+        """Test self time and the critical path of a small span tree"""
+        trace_id = "f" * 32
+        
+        def span(span_id, parent, start_ms, duration_ms):
+            return {
+                "event_type": "span",
+                "timestamp": (DAY + timedelta(milliseconds=start_ms)).isoformat(),
+                "trace_id": trace_id,
+                "span_id": span_id * 16,
+                "parent_span_id": parent * 16 if parent else None,
+                "name": span_id,
+                "duration_ms": duration_ms,
+            }
+        
+        # root runs 0-1000 ms; a (100-400) overlaps b (200-900), which holds c (300-800)
+        client.post("/events/batch", json=[
+            span("r", None, 0, 1000),
+            span("a", "r", 100, 300),
+            span("b", "r", 200, 700),
+            span("c", "b", 300, 500),
+        ])
+        
+        trace = client.get(f"/traces/{trace_id}").json()
+        
+        assert trace["duration_ms"] == 1000
+        assert trace["span_count"] == 4
+        path = [(segment["name"], segment["offset_ms"], segment["duration_ms"]) for segment in trace["critical_path"]]
+        assert path == [
+            ("r", 0, 200),
+            ("b", 200, 100),
+            ("c", 300, 500),
+            ("b", 800, 100),
+            ("r", 900, 100),
+        ]
+        
+        root = trace["spans"][0]
+        a, b = root["children"]
+        assert root["self_ms"] == 200
+        assert root["critical_ms"] == 300
+        assert (a["name"], a["critical_ms"]) == ("a", 0)
+        assert (b["self_ms"], b["critical_ms"]) == (200, 200)
+        assert b["children"][0]["critical_ms"] == 500
+    
+    def test_unknown_trace(self, client):
+        """Test that a trace with no spans or events is a 404"""
+        assert client.get(f"/traces/{'0' * 32}").status_code == 404
+
+
+class TestSampling:
+    """Test that sampled events are scaled by their sample_weight"""
+    
+    def test_weights_scale_dashboards(self, client):
+        """Test that overview, cost stats, forecast and suggestions count sampled events by weight"""
+        # Three gpt-4 calls kept by 1% sampling stand for 300 calls
+        now = datetime.utcnow().isoformat()
+        client.post("/events/batch", json=[
+            _event(timestamp=now, model="gpt-4", prompt_tokens=5000, total_cost=0.5, sample_weight=100.0)
+            for _ in range(3)
+        ])
+        
+        costs = client.get("/stats/costs").json()
+        assert (costs["total_requests"], costs["total_tokens"]) == (300, 1_506_000)
+        assert costs["total_cost"] == pytest.approx(150.0)
+        
+        overview = client.get("/dashboard/overview").json()
+        assert overview["today_cost"] == pytest.approx(150.0)
+        assert overview["avg_cost_per_request"] == pytest.approx(0.5)
+        assert overview["top_models"][0]["requests"] == 300
+        assert overview["top_agents"][0]["requests"] == 300
+        
+        forecast = client.get("/forecast").json()
+        assert forecast["daily_average"] == pytest.approx(150.0)
+        assert forecast["monthly_projection"] == pytest.approx(4500.0)
+        
+        suggestions = {item["type"]: item for item in client.get("/optimize").json()}
+        assert suggestions["model"]["estimated_savings"] == pytest.approx(142.5)
+        assert "(300 requests)" in suggestions["model"]["reason"]
+        assert suggestions["prompt"]["current"].startswith("300 requests")
+        # Only the weighted count clears the high-frequency threshold
+        assert suggestions["caching"]["current"] == "rag-app/planner: 300 requests"
+
+
+class TestLatencyPercentiles:
+    """Test GET /stats/latency/*"""
+    
+    def test_known_distribution(self, client):
+        """Test nearest-rank percentiles of latency, time to first token and throughput"""
+        events = [
+            _event(latency_ms=ms, ttft_ms=ms // 2, generation_ms=ms - ms // 2, completion_tokens=ms)
+            for ms in range(1, 101)
+        ]
+        client.post("/events/batch", json=events)
+        
+        [stats] = client.get("/stats/latency/models").json()
+        
+        assert (stats["model"], stats["requests"], stats["streamed_requests"]) == ("gpt-4o-mini", 100, 100)
+        assert stats["latency_ms"] == {"p50": 50, "p90": 90, "p95": 95, "p99": 99}
+        assert stats["ttft_ms"] == {"p50": 25, "p90": 45, "p95": 47, "p99": 49}
+        # The 1 ms call generates 1 token in 1 ms, the slowest rate
+        assert stats["tokens_per_second"]["p1"] == pytest.approx(1000.0)
+    
+    def test_weighted(self, client):
+        """Test that each event counts sample_weight times towards the percentiles"""
+        client.post("/events/batch", json=[
+            _event(latency_ms=10, sample_weight=9.0),
+            _event(latency_ms=1000),
+        ])
+        
+        [stats] = client.get("/stats/latency/agents").json()
+        
+        assert (stats["agent"], stats["requests"], stats["streamed_requests"]) == ("planner", 10, 0)
+        # Unweighted, the slow call would already be the p90
+        assert stats["latency_ms"] == {"p50": 10, "p90": 10, "p95": 1000, "p99": 1000}
+        assert stats["ttft_ms"] == {"p50": None, "p90": None, "p95": None, "p99": None}
+    
+    def test_empty(self, client):
+        """Test that no events give no breakdowns"""
+        assert client.get("/stats/latency/models").json() == []
+        assert client.get("/stats/latency/agents").json() == []
+
+
+class TestSdkStats:
+    """Test sdk_stats ingestion and GET /sdk/stats"""
+    
+    def test_latest_report_per_client(self, client):
+        """Test that each client's newest report is served and kept out of the cost totals"""
+        def report(client_id, minutes, dropped):
+            return {
+                "event_type": "sdk_stats",
+                "timestamp": (DAY + timedelta(minutes=minutes)).isoformat(),
+                "client_id": client_id,
+                "stats": {"queue_depth": 0, "dropped": dropped},
+            }
+        
+        response = client.post("/events/batch", json=[
+            report("web:1", 0, 1),
+            report("web:1", 1, 5),
+            report("worker:2", 0, 3),
+            _event(),
+        ])
+        assert response.json()["accepted"] == 4
+        
+        reports = client.get("/sdk/stats").json()
+        assert [(item["client_id"], item["stats"]["dropped"]) for item in reports] == [("web:1", 5), ("worker:2", 3)]
+        
+        only_web = client.get("/sdk/stats", params={"client_id": "web:1"}).json()
+        assert [item["client_id"] for item in only_web] == ["web:1"]
+        recent = client.get("/sdk/stats", params={"since": (DAY + timedelta(seconds=30)).isoformat()}).json()
+        assert [item["client_id"] for item in recent] == ["web:1"]
+        
+        assert client.get("/stats/costs").json()["total_requests"] == 1
+        assert len(client.get("/events").json()["items"]) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -311,7 +311,7 @@ def show_request_explorer(project_filter, date_range):
         model_filter = st.text_input("Model", "")
     
     with col3:
-        limit = st.number_input("Limit", min_value=10, max_value=1000, value=100)
+        limit = st.number_input("Page size", min_value=10, max_value=1000, value=100)
     
     # Fetch events
     params = {
@@ -334,21 +334,48 @@ def show_request_explorer(project_filter, date_range):
     
     params = {k: v for k, v in params.items() if v is not None}
     
-    data = fetch_data("events", params)
+    # Cursors of the pages visited so far; reset whenever the filters change
+    filters = tuple(sorted(params.items()))
+    if st.session_state.get("explorer_filters") != filters:
+        st.session_state["explorer_filters"] = filters
+        st.session_state["explorer_cursors"] = [None]
+    cursors = st.session_state["explorer_cursors"]
     
-    if not data:
+    if cursors[-1]:
+        params["cursor"] = cursors[-1]
+    
+    page = fetch_data("events", params)
+    
+    if not page or not page["items"]:
         st.warning("No events found.")
         return
     
+    data = page["items"]
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    
+    with col1:
+        if st.button("← Previous", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    
+    with col2:
+        st.caption(f"Page {len(cursors)}")
+    
+    with col3:
+        if st.button("Next →", disabled=not page["next_cursor"]):
+            cursors.append(page["next_cursor"])
+            st.rerun()
+    
     df = pd.DataFrame(data)
     df['timestamp'] = pd.to_datetime(df['timestamp'])
     
     # Summary
-    st.subheader("Summary")
+    st.subheader("Page Summary")
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total Requests", len(df))
+        st.metric("Requests", len(df))
     
     with col2:
         st.metric("Total Tokens", df['total_tokens'].sum())